@@ -1,10 +1,80 @@
 import openai
 import os
-import json
+import asyncio
+from ai.cache import llm_cache, make_key
+from ai.streaming import stream_chat_text
+from ai.json_stream import IncrementalJSONParser
+from ai.rate_limiter import openai_limiter
+from metrics import timed
 
-def generate_brand_package(molecule, therapeutic_area, color_palette=None):
-    openai.api_key = os.getenv("OPENAI_API_KEY")
-    # 1. Generate brand names, slogans, leaflet with GPT-4
+# Logo generation settings (overridable via environment)
+LOGO_CONCURRENCY = int(os.getenv("LOGO_CONCURRENCY", "3"))  # Max DALL-E calls in flight per package
+LOGO_TIMEOUT_SECONDS = float(os.getenv("LOGO_TIMEOUT_SECONDS", "60"))  # Per DALL-E attempt, excluding rate-limit queueing
+LOGO_DEADLINE_SECONDS = float(os.getenv("LOGO_DEADLINE_SECONDS", "90"))  # Per image, including queueing, retries and backoff
+# DALL-E URLs expire after ~1 hour, so logo cache entries must expire well before that
+LOGO_CACHE_TTL_SECONDS = int(os.getenv("LOGO_CACHE_TTL_SECONDS", str(45 * 60)))
+
+BRAND_MODEL = "gpt-4o"
+BRAND_TEMPERATURE = 0.8
+BRAND_PROMPT_VERSION = "brand-package-v1"  # Bump when the prompt changes to invalidate cached responses
+LOGO_MODEL = "dall-e-3"
+
+def fallback_logo_url(name):
+    return f"https://dummy.dalle.api/logo_{name.lower()}.png"
+
+async def generate_logo(name, therapeutic_area, color_palette, semaphore=None, timeout=LOGO_TIMEOUT_SECONDS, deadline=LOGO_DEADLINE_SECONDS, regenerate=False):
+    # One DALL-E call with a per-attempt timeout and an overall deadline for the image;
+    # any failure falls back to the dummy URL so a single slow or failed image never
+    # holds up the rest of the package.
+    dalle_prompt = f"Pharmaceutical brand logo for '{name}', therapeutic area: {therapeutic_area}, color palette: {color_palette}. Minimal, modern, professional, high quality."
+    cache_key = make_key("logo", prompt=dalle_prompt, model=LOGO_MODEL, size="512x512")
+    cached = await llm_cache.get(cache_key, regenerate=regenerate)
+    if cached is not None:
+        return cached
+    try:
+        async with semaphore or asyncio.Semaphore(1):
+            with timed("logo"): # Excludes time spent waiting for the semaphore
+                dalle_resp = await asyncio.wait_for(openai_limiter.call(
+                    openai.Image.acreate,
+                    model=LOGO_MODEL,
+                    timeout=timeout, # Per attempt; queueing for the rate limit is not counted
+                    prompt=dalle_prompt,
+                    n=1,
+                    size="512x512"
+                ), deadline) # Everything, so retries under a 429 storm can't stall the package
+        logo_url = dalle_resp['data'][0]['url']
+    except Exception as e:
+        openai_limiter.record_fallback("logo", e)
+        return {"url": fallback_logo_url(name), "fallback": True}
+    await llm_cache.set(cache_key, {"url": logo_url}, ttl_seconds=LOGO_CACHE_TTL_SECONDS)
+    return {"url": logo_url}
+
+async def generate_logo_concepts(brand_names, therapeutic_area, color_palette=None, concurrency=LOGO_CONCURRENCY, timeout=LOGO_TIMEOUT_SECONDS, regenerate=False):
+    # Run all logo generations concurrently (bounded by `concurrency`), so total
+    # time is close to the slowest single image rather than the sum of all of them.
+    # Results keep the same order as brand_names.
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    return await asyncio.gather(*(
+        generate_logo(name, therapeutic_area, color_palette, semaphore=semaphore, timeout=timeout, regenerate=regenerate)
+        for name in brand_names
+    ))
+
+def fallback_brand_text():
+    return {
+        "brand_names": ["BrandX", "BrandY", "BrandZ"],
+        "slogan_en": "Innovate Health.",
+        "slogan_bn": "স্বাস্থ্য উদ্ভাবন করুন।",
+        "leaflet_json": {"sections": []},
+    }
+
+
+def brand_text_cache_key(molecule, therapeutic_area, color_palette):
+    return make_key(
+        "brand_package", molecule=molecule, therapeutic_area=therapeutic_area, color_palette=color_palette,
+        model=BRAND_MODEL, temperature=BRAND_TEMPERATURE, prompt_version=BRAND_PROMPT_VERSION
+    )
+
+def brand_text_messages(molecule, therapeutic_area, color_palette=None):
     system_prompt = (
         "You are a pharmaceutical branding AI. "
         "Given a molecule, therapeutic area, and color palette, generate: "
@@ -15,46 +85,151 @@ def generate_brand_package(molecule, therapeutic_area, color_palette=None):
         "Respond in JSON with keys: brand_names, slogan_en, slogan_bn, leaflet_json."
     )
     user_prompt = f"Molecule: {molecule}\nTherapeutic Area: {therapeutic_area}\nColor Palette: {color_palette or ''}"
-    response = openai.ChatCompletion.create(
-        model="gpt-4o",
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ],
-        temperature=0.8,
-        max_tokens=700
-    )
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
+
+async def stream_brand_text(molecule, therapeutic_area, color_palette=None, regenerate=False):
+    # Streams the GPT-4o completion through an incremental JSON parser and yields
+    # (event, data) as soon as each piece is parsed:
+    #   ("brand_name", name) per name, ("brand_names", [...]), ("slogans", [...]), ("leaflet", {...}),
+    #   plus ("fallback", field) for every field that had to use placeholder content.
+    # A malformed or truncated completion keeps whatever was parsed and fills the
+    # rest from fallback_brand_text(); only complete parses are cached.
+    cache_key = brand_text_cache_key(molecule, therapeutic_area, color_palette)
+    cached = await llm_cache.get(cache_key, regenerate=regenerate)
+    if cached is not None:
+        for name in cached["brand_names"]:
+            yield "brand_name", name
+        yield "brand_names", cached["brand_names"]
+        yield "slogans", [{"en": cached["slogan_en"], "bn": cached["slogan_bn"]}]
+        yield "leaflet", cached["leaflet_json"]
+        return
+
+    parser = IncrementalJSONParser(watch_arrays=["brand_names"])
+    emitted = set()
     try:
-        content = response.choices[0].message.content
-        data = json.loads(content)
-        brand_names = data.get("brand_names", [])
-        slogan_en = data.get("slogan_en", "")
-        slogan_bn = data.get("slogan_bn", "")
-        leaflet_json = data.get("leaflet_json", {})
-    except Exception:
-        brand_names = ["BrandX", "BrandY", "BrandZ"]
-        slogan_en = "Innovate Health."
-        slogan_bn = "স্বাস্থ্য উদ্ভাবন করুন।"
-        leaflet_json = {"sections": []}
-    # 2. Generate logo concepts with DALL-E 3
-    logo_concepts = []
-    for name in brand_names:
+        async for delta in stream_chat_text(
+            model=BRAND_MODEL,
+            messages=brand_text_messages(molecule, therapeutic_area, color_palette),
+            temperature=BRAND_TEMPERATURE,
+            max_tokens=700
+        ):
+            for kind, key, value in parser.feed(delta):
+                if kind == "item" and isinstance(value, str):
+                    yield "brand_name", value
+                elif kind == "member":
+                    emitted.add(key)
+                    if key == "brand_names":
+                        yield "brand_names", value
+                    elif key == "leaflet_json":
+                        yield "leaflet", value
+                    elif key in ("slogan_en", "slogan_bn") and {"slogan_en", "slogan_bn"} <= emitted:
+                        yield "slogans", [{"en": parser.result["slogan_en"], "bn": parser.result["slogan_bn"]}]
+    except Exception as e:
+        print(f"Streamed brand package generation failed: {e!r}")
+        parser.errors.append(repr(e))
+
+    fallback = fallback_brand_text()
+    if not parser.complete or parser.errors:
+        print(f"Brand package completion malformed or truncated, using fallbacks for missing fields: {parser.errors}")
+    if "brand_names" not in emitted:
+        partial_names = [n for n in parser.items.get("brand_names", []) if isinstance(n, str)]
+        if not partial_names:
+            for name in fallback["brand_names"]:
+                yield "brand_name", name
+            openai_limiter.record_fallback("brand_names", parser.errors)
+            yield "fallback", "brand_names"
+        yield "brand_names", partial_names or fallback["brand_names"]
+    if not {"slogan_en", "slogan_bn"} <= emitted:
+        openai_limiter.record_fallback("slogans", parser.errors)
+        yield "fallback", "slogans"
+        yield "slogans", [{"en": parser.result.get("slogan_en", fallback["slogan_en"]), "bn": parser.result.get("slogan_bn", fallback["slogan_bn"])}]
+    if "leaflet_json" not in emitted:
+        openai_limiter.record_fallback("leaflet_json", parser.errors)
+        yield "fallback", "leaflet_json"
+        yield "leaflet", fallback["leaflet_json"]
+
+    if parser.complete and not parser.errors:
+        data = parser.result
+        await llm_cache.set(cache_key, {
+            "brand_names": data.get("brand_names", []),
+            "slogan_en": data.get("slogan_en", ""),
+            "slogan_bn": data.get("slogan_bn", ""),
+            "leaflet_json": data.get("leaflet_json", {}),
+        })
+
+_TEXT_DONE = object()
+
+async def stream_brand_package(molecule, therapeutic_area, color_palette=None, regenerate=False):
+    # Yields (event, data) tuples as each piece of the package is ready:
+    #   ("brand_names", [...]), ("slogans", [...]), ("leaflet", {...}) from the LLM stream,
+    #   and one ("logo", {"index", "name", "url"[, "fallback"]}) per image in completion order,
+    #   plus ("fallback", field) whenever placeholder content was used.
+    # The DALL-E call for each brand name starts the moment that name is parsed, so
+    # image generation overlaps with the rest of the completion (slogans, leaflet).
+    queue = asyncio.Queue()
+    semaphore = asyncio.Semaphore(max(1, LOGO_CONCURRENCY))
+    logo_tasks = []
+
+    async def logo_job(index, name):
         try:
-            dalle_prompt = f"Pharmaceutical brand logo for '{name}', therapeutic area: {therapeutic_area}, color palette: {color_palette}. Minimal, modern, professional, high quality."
-            dalle_resp = openai.Image.create(
-                prompt=dalle_prompt,
-                n=1,
-                size="512x512",
-                model="dall-e-3"
-            )
-            logo_url = dalle_resp['data'][0]['url']
+            logo = await generate_logo(name, therapeutic_area, color_palette, semaphore=semaphore, regenerate=regenerate)
         except Exception:
-            logo_url = f"https://dummy.dalle.api/logo_{name.lower()}.png"
-        logo_concepts.append({"url": logo_url})
+            logo = {"url": fallback_logo_url(name), "fallback": True}
+        await queue.put(("logo", {"index": index, "name": name, **logo}))
+
+    async def produce_text():
+        try:
+            async for event, data in stream_brand_text(molecule, therapeutic_area, color_palette, regenerate=regenerate):
+                if event == "brand_name":
+                    logo_tasks.append(asyncio.create_task(logo_job(len(logo_tasks), data)))
+                else:
+                    await queue.put((event, data))
+        finally:
+            await queue.put((_TEXT_DONE, None))
+
+    producer = asyncio.create_task(produce_text())
+    text_done = False
+    logos_emitted = 0
+    try:
+        while not text_done or logos_emitted < len(logo_tasks):
+            event, data = await queue.get()
+            if event is _TEXT_DONE:
+                text_done = True
+                continue
+            if event == "logo":
+                logos_emitted += 1
+            yield event, data
+    finally:
+        # Client disconnected mid-stream: don't leave the completion or DALL-E calls running
+        producer.cancel()
+        for task in logo_tasks:
+            task.cancel()
+
+async def generate_brand_package(molecule, therapeutic_area, color_palette=None, regenerate=False):
+    # 1. Brand names, slogans, leaflet from a streamed GPT-4o completion, and
+    # 2. logo concepts with DALL-E 3, started per brand name as soon as it is parsed
+    brand_names, slogans, leaflet_json, logos, fallbacks = [], [], {}, {}, []
+    async for event, data in stream_brand_package(molecule, therapeutic_area, color_palette, regenerate=regenerate):
+        if event == "brand_names":
+            brand_names = data
+        elif event == "slogans":
+            slogans = data
+        elif event == "leaflet":
+            leaflet_json = data
+        elif event == "fallback":
+            fallbacks.append(data)
+        elif event == "logo":
+            logos[data["index"]] = {k: v for k, v in data.items() if k in ("url", "fallback")}
+            if data.get("fallback"):
+                fallbacks.append(f"logo_concepts[{data['index']}]")
     return {
         "brand_names": brand_names,
-        "logo_concepts": logo_concepts,
-        "slogans": [{"en": slogan_en, "bn": slogan_bn}],
+        "logo_concepts": [logos[i] for i in sorted(logos)],
+        "slogans": slogans,
         "color_palette": color_palette,
-        "leaflet_json": leaflet_json
+        "leaflet_json": leaflet_json,
+        "fallbacks": fallbacks # Fields that hold placeholder content instead of generated content
     }
@@ -0,0 +1,158 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Two-tier cache for LLM/image responses:
+#   - in-memory LRU (hot entries, microsecond lookups)
+#   - on-disk SQLite (survives restarts, shared by workers on the same host)
+# Entries expire after a TTL; callers pass regenerate=True to bypass lookups.
+
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(os.path.dirname(__file__), "..", ".cache", "llm_cache.sqlite3"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "512"))
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))  # 1 week
+LLM_CACHE_PURGE_EVERY_WRITES = int(os.getenv("LLM_CACHE_PURGE_EVERY_WRITES", "500"))  # 0 disables the periodic purge
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+def normalize(value):
+    # "  Empagliflozin " and "empagliflozin" should hit the same entry
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return _WHITESPACE_RE.sub(" ", value).strip().lower()
+    return value
+
+def make_key(namespace, **parts):
+    normalized = {k: normalize(v) for k, v in parts.items()}
+    raw = json.dumps(normalized, sort_keys=True, ensure_ascii=False, default=str)
+    return f"{namespace}:{hashlib.sha256(raw.encode('utf-8')).hexdigest()}"
+
+class LLMCache:
+    # get/set/purge_expired are coroutines: the in-memory LRU is used on the event
+    # loop, SQLite reads, writes and commits run in a worker thread.
+    def __init__(self, path=LLM_CACHE_PATH, max_entries=LLM_CACHE_MAX_ENTRIES, ttl_seconds=LLM_CACHE_TTL_SECONDS, purge_every=LLM_CACHE_PURGE_EVERY_WRITES):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.purge_every = purge_every
+        self._memory = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()  # Guards _memory and counters
+        self._db_lock = threading.Lock()  # Serialises use of the SQLite connection across worker threads
+        self._conn = None
+        self._writes_since_purge = 0
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0, "bypassed": 0, "purged": 0}
+
+    def _db(self):
+        # Lazily opened so importing the module never touches the filesystem; caller holds _db_lock
+        if self._conn is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_expires_at ON llm_cache(expires_at)")
+        return self._conn
+
+    def _remember(self, key, expires_at, value):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _disk_get(self, key):
+        with self._db_lock:
+            try:
+                row = self._db().execute("SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            except sqlite3.Error as e:
+                print(f"LLM cache read error: {e}")
+                return None
+        return (json.loads(row[0]), row[1]) if row is not None else None
+
+    def _disk_set(self, key, value, expires_at):
+        raw = json.dumps(value, ensure_ascii=False)
+        with self._db_lock:
+            try:
+                db = self._db()
+                db.execute("INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)", (key, raw, expires_at))
+                db.commit()
+            except sqlite3.Error as e:
+                print(f"LLM cache write error: {e}")
+
+    def _disk_purge(self, now):
+        with self._db_lock:
+            try:
+                db = self._db()
+                removed = db.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,)).rowcount
+                db.commit()
+            except sqlite3.Error as e:
+                print(f"LLM cache purge error: {e}")
+                removed = 0
+        return removed
+
+    async def get(self, key, regenerate=False):
+        if regenerate:
+            with self._lock:
+                self.counters["bypassed"] += 1
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._memory.move_to_end(key)
+                    self.counters["memory_hits"] += 1
+                    return entry[1]
+                del self._memory[key]
+        row = await asyncio.to_thread(self._disk_get, key)
+        with self._lock:
+            if row is None or row[1] <= now:
+                self.counters["misses"] += 1
+                return None
+            value, expires_at = row
+            self._remember(key, expires_at, value)
+            self.counters["disk_hits"] += 1
+            return value
+
+    async def set(self, key, value, ttl_seconds=None):
+        expires_at = time.time() + (ttl_seconds or self.ttl_seconds)
+        with self._lock:
+            self._remember(key, expires_at, value)
+            self.counters["writes"] += 1
+            self._writes_since_purge += 1
+            purge = self.purge_every and self._writes_since_purge >= self.purge_every
+            if purge:
+                self._writes_since_purge = 0
+        await asyncio.to_thread(self._disk_set, key, value, expires_at)
+        if purge:
+            await self.purge_expired()
+
+    async def purge_expired(self):
+        # Drops expired entries from both tiers; also run every `purge_every` writes
+        now = time.time()
+        with self._lock:
+            for key in [k for k, (expires_at, _) in self._memory.items() if expires_at <= now]:
+                del self._memory[key]
+        removed = await asyncio.to_thread(self._disk_purge, now)
+        with self._lock:
+            self.counters["purged"] += removed
+        return removed
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats["memory_entries"] = len(self._memory)
+        hits = stats["memory_hits"] + stats["disk_hits"]
+        lookups = hits + stats["misses"]
+        stats["hit_rate"] = round(hits / lookups, 4) if lookups else 0.0
+        return stats
+
+# Process-wide instance shared by ai/insights.py and ai/brand_package.py
+llm_cache = LLMCache()
@@ -0,0 +1,49 @@
+import openai
+from ai.cache import llm_cache, make_key
+from ai.rate_limiter import openai_limiter, estimate_tokens
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_DIM = 1536
+EMBEDDING_MAX_INPUTS = 2048  # Per request (API limit)
+EMBEDDING_MAX_REQUEST_TOKENS = 250000  # Per request; the API allows 300k, this leaves room for estimate error
+EMBEDDING_MAX_INPUT_CHARS = 8191 * 3  # 8191 tokens per input; chunks are far smaller, this only guards odd text
+QUERY_EMBEDDING_TTL_SECONDS = 30 * 24 * 3600  # Embeddings of a given text never change
+
+def _batches(texts):
+    batch, batch_tokens = [], 0
+    for text in texts:
+        tokens = estimate_tokens(text=text)
+        if batch and (len(batch) >= EMBEDDING_MAX_INPUTS or batch_tokens + tokens > EMBEDDING_MAX_REQUEST_TOKENS):
+            yield batch
+            batch, batch_tokens = [], 0
+        batch.append(text)
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
+async def embed_texts(texts):
+    # One vector (list of floats) per text, in order, from as few API calls as the limits allow.
+    # Raises on API errors: callers decide whether to fall back.
+    vectors = []
+    for batch in _batches([text[:EMBEDDING_MAX_INPUT_CHARS] for text in texts]):
+        response = await openai_limiter.call(
+            openai.Embedding.acreate,
+            model=EMBEDDING_MODEL,
+            estimated_tokens=sum(estimate_tokens(text=text) for text in batch),
+            input=batch,
+        )
+        data = sorted(response["data"], key=lambda item: item["index"])
+        if len(data) != len(batch):
+            raise RuntimeError(f"Embedding API returned {len(data)} vectors for {len(batch)} inputs")
+        vectors += [item["embedding"] for item in data]
+    return vectors
+
+async def embed_query(text):
+    # Query embeddings are cached: the same molecule / area is looked up again and again
+    cache_key = make_key("embedding", text=text, model=EMBEDDING_MODEL)
+    cached = await llm_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    vector = (await embed_texts([text]))[0]
+    await llm_cache.set(cache_key, vector, ttl_seconds=QUERY_EMBEDDING_TTL_SECONDS)
+    return vector
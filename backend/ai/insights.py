@@ -1,31 +1,97 @@
 import openai
-import os
 import json
+from ai.cache import llm_cache, make_key
+from ai.rate_limiter import openai_limiter, estimate_tokens
+from knowledge.index import knowledge_index
+from knowledge.retrieval import gather_context
 
-def generate_insights(molecule, therapeutic_area, benefits=None, prompt=None):
-    openai.api_key = os.getenv("OPENAI_API_KEY")
+INSIGHTS_MODEL = "gpt-4o"
+INSIGHTS_TEMPERATURE = 0.7
+INSIGHTS_PROMPT_VERSION = "insights-v2"  # Bump when the prompt changes to invalidate cached responses
+INSIGHTS_MAX_TOKENS = 600
+GROUNDED_MAX_TOKENS = 350  # Competitors and trials mostly come from the knowledge index
+
+def _name(item):
+    # Competitors are strings, trials {"name", "summary"}
+    return str(item.get("name") if isinstance(item, dict) else item).strip().lower()
+
+def _merge(known, generated):
+    # Index facts first, then anything the model added that isn't already there
+    seen = {_name(item) for item in known}
+    return list(known) + [item for item in generated or [] if _name(item) not in seen]
+
+def insights_messages(molecule, therapeutic_area, benefits, prompt, context):
+    user_prompt = f"Molecule: {molecule}\nTherapeutic Area: {therapeutic_area}\nBenefits: {benefits or ''}\n{prompt or ''}"
+    if not (context["snippets"] or context["trials"] or context["competitors"]):
+        # Nothing indexed for this request: the model works from memory
+        system_prompt = (
+            "You are a pharmaceutical brand strategist. "
+            "Given a molecule, therapeutic area, and product benefits, generate: "
+            "- Key competitors (list)\n"
+            "- Brand positioning (1-2 lines)\n"
+            "- Color palette (3-4 colors, each with name, hex, and reason)\n"
+            "- Clinical trials (list, each with name and 1-line summary). "
+            "Respond in JSON with keys: competitors, brand_positioning, color_palette, clinical_trials."
+        )
+        return [{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}], INSIGHTS_MAX_TOKENS
+    fields = [
+        ("brand_positioning", "Brand positioning (1-2 lines)"),
+        ("color_palette", "Color palette (3-4 colors, each with name, hex, and reason)"),
+    ]
+    if not context["competitors"]:
+        fields.append(("competitors", "Key competitors named in the reference notes (list)"))
+    if not context["trials"]:
+        fields.append(("clinical_trials", "Clinical trials from the reference notes (list, each with name and 1-line summary)"))
     system_prompt = (
         "You are a pharmaceutical brand strategist. "
-        "Given a molecule, therapeutic area, and product benefits, generate: "
-        "- Key competitors (list)\n"
-        "- Brand positioning (1-2 lines)\n"
-        "- Color palette (3-4 colors, each with name, hex, and reason)\n"
-        "- Clinical trials (list, each with name and 1-line summary). "
-        "Respond in JSON with keys: competitors, brand_positioning, color_palette, clinical_trials."
+        "Using the known facts and reference notes below, and no other claims about competitors or trials, generate:\n"
+        + "".join(f"- {description}\n" for _, description in fields)
+        + f"Respond in JSON with keys: {', '.join(key for key, _ in fields)}."
     )
-    user_prompt = f"Molecule: {molecule}\nTherapeutic Area: {therapeutic_area}\nBenefits: {benefits or ''}\n{prompt or ''}"
-    response = openai.ChatCompletion.create(
-        model="gpt-4o",
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ],
-        temperature=0.7,
-        max_tokens=600
+    if context["competitors"]:
+        user_prompt += f"\nKnown competitors: {', '.join(context['competitors'])}"
+    if context["trials"]:
+        user_prompt += "\nKnown clinical trials:\n" + "".join(f"- {t['name']}: {t['summary']}\n" for t in context["trials"])
+    if context["snippets"]:
+        user_prompt += "\nReference notes:\n" + "\n".join(
+            f"[{i}] {s['title']} ({s['kind']}): {s['text']}" for i, s in enumerate(context["snippets"], 1)
+        )
+    return [{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}], GROUNDED_MAX_TOKENS
+
+async def generate_insights(molecule, therapeutic_area, benefits=None, prompt=None, regenerate=False):
+    # Grounded in the local knowledge index (knowledge/retrieval.py) when it has
+    # anything relevant; the index version is part of the cache key, so ingesting new
+    # documents refreshes cached insights.
+    context = await gather_context(molecule, therapeutic_area, benefits, prompt)
+    cache_key = make_key(
+        "insights", molecule=molecule, therapeutic_area=therapeutic_area, benefits=benefits, prompt=prompt,
+        model=INSIGHTS_MODEL, temperature=INSIGHTS_TEMPERATURE, prompt_version=INSIGHTS_PROMPT_VERSION,
+        knowledge_version=knowledge_index.count
+    )
+    cached = await llm_cache.get(cache_key, regenerate=regenerate)
+    if cached is not None:
+        return cached
+    messages, max_tokens = insights_messages(molecule, therapeutic_area, benefits, prompt, context)
+    response = await openai_limiter.call(
+        openai.ChatCompletion.acreate,
+        model=INSIGHTS_MODEL,
+        estimated_tokens=estimate_tokens(messages, max_tokens),
+        messages=messages,
+        temperature=INSIGHTS_TEMPERATURE,
+        max_tokens=max_tokens
     )
     try:
         content = response.choices[0].message.content
         data = json.loads(content)
-        return data
-    except Exception:
-        return {"competitors": [], "brand_positioning": "", "color_palette": [], "clinical_trials": []}
+    except Exception as e:
+        openai_limiter.record_fallback("insights", e)
+        return {
+            "competitors": context["competitors"], "brand_positioning": "", "color_palette": [],
+            "clinical_trials": context["trials"], "fallback": True
+        }
+    data["competitors"] = _merge(context["competitors"], data.get("competitors"))
+    data["clinical_trials"] = _merge(context["trials"], data.get("clinical_trials"))
+    if context["snippets"]:
+        data["sources"] = [{"title": s["title"], "source": s["source"], "score": s["score"]} for s in context["snippets"]]
+    await llm_cache.set(cache_key, data)  # Only successful parses are cached
+    return data
@@ -0,0 +1,137 @@
+import json
+
+# Incremental parser for a JSON object that arrives in chunks (e.g. a streamed chat
+# completion). It does not build a full parse tree; it tracks just enough state to
+# report, as soon as the closing character arrives:
+#   ("member", key, value) for every completed top-level member, and
+#   ("item", key, value)   for every completed element of a watched top-level array.
+# Text before the first "{" (e.g. a ```json fence) and after the closing "}" is ignored.
+
+class IncrementalJSONParser:
+    def __init__(self, watch_arrays=()):
+        self.watch_arrays = set(watch_arrays)
+        self.result = {}  # Top-level members parsed so far
+        self.items = {}  # Watched array key -> elements parsed so far
+        self.complete = False  # True once the top-level object has been closed
+        self.errors = []
+        self._text = ""
+        self._pos = 0
+        self._started = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._expect = "key"  # Top-level state: key, colon, value, in_value
+        self._key_start = None
+        self._key = None
+        self._value_start = None
+        self._watching = False  # Inside a watched top-level array
+        self._item_start = None
+
+    def feed(self, chunk):
+        self._text += chunk
+        events = []
+        text = self._text
+        for i in range(self._pos, len(text)):
+            if self.complete:
+                break
+            self._step(text, i, text[i], events)
+        self._pos = len(text)
+        return events
+
+    def _step(self, text, i, c, events):
+        if not self._started:
+            if c == "{":
+                self._started = True
+                self._depth = 1
+            return
+
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif c == "\\":
+                self._escape = True
+            elif c == '"':
+                self._in_string = False
+                if self._key_start is not None:
+                    self._key = self._loads(text[self._key_start:i + 1])
+                    self._key_start = None
+                    self._expect = "colon"
+            return
+
+        if c in " \t\r\n":
+            return
+
+        if self._depth == 1:
+            if self._expect == "key":
+                if c == '"':
+                    self._in_string = True
+                    self._key_start = i
+                elif c == "}":
+                    self.complete = True
+            elif self._expect == "colon":
+                if c == ":":
+                    self._expect = "value"
+            elif self._expect == "value":
+                self._value_start = i
+                self._expect = "in_value"
+                if c == '"':
+                    self._in_string = True
+                elif c in "[{":
+                    self._depth += 1
+                    if c == "[" and self._key in self.watch_arrays:
+                        self._watching = True
+                        self.items[self._key] = []
+            elif self._expect == "in_value":
+                if c in ",}":
+                    self._finish_member(text[self._value_start:i], events)
+                    self._expect = "key"
+                    if c == "}":
+                        self.complete = True
+            return
+
+        # Nested content (depth >= 2)
+        at_item_level = self._watching and self._depth == 2
+        if c == '"':
+            self._in_string = True
+            if at_item_level and self._item_start is None:
+                self._item_start = i
+        elif c in "[{":
+            if at_item_level and self._item_start is None:
+                self._item_start = i
+            self._depth += 1
+        elif c in "]}":
+            if at_item_level:
+                self._finish_item(text, i, events)
+                self._watching = False
+            self._depth -= 1
+        elif c == ",":
+            if at_item_level:
+                self._finish_item(text, i, events)
+        elif at_item_level and self._item_start is None:
+            self._item_start = i  # Number / true / false / null element
+
+    def _finish_item(self, text, i, events):
+        if self._item_start is None:
+            return
+        raw = text[self._item_start:i]
+        self._item_start = None
+        value = self._loads(raw)
+        if value is not _INVALID:
+            self.items[self._key].append(value)
+            events.append(("item", self._key, value))
+
+    def _finish_member(self, raw, events):
+        value = self._loads(raw)
+        if value is not _INVALID:
+            self.result[self._key] = value
+            events.append(("member", self._key, value))
+        self._value_start = None
+
+    def _loads(self, raw):
+        try:
+            return json.loads(raw)
+        except ValueError as e:
+            self.errors.append(f"{raw[:40]!r}: {e}")
+            return _INVALID
+
+_INVALID = object()
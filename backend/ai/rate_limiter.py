@@ -0,0 +1,279 @@
+# Process-wide limiter for every OpenAI call (chat, streaming chat, images).
+#
+#   - Per-model token buckets for requests/minute and tokens/minute, so a burst
+#     queues locally instead of turning into 429s.
+#   - Retries for 429 / 5xx / timeouts / connection errors, with exponential
+#     backoff and full jitter (honouring Retry-After when the API sends one).
+#   - An AIMD concurrency limit: grows slowly while latency stays near its
+#     baseline, and is cut on errors or latency spikes.
+#   - Counters, including how many results were served as fallbacks, so callers'
+#     placeholder data ("BrandX", dummy logo URLs) is never silent.
+import asyncio
+import json
+import os
+import random
+import time
+
+import openai
+
+import metrics
+
+# Defaults per model; override with OPENAI_LIMITS='{"gpt-4o": {"rpm": 500, "tpm": 30000}}'
+DEFAULT_LIMITS = {
+    "gpt-4o": {"rpm": 500, "tpm": 30000},
+    "dall-e-3": {"rpm": 7, "tpm": 0},  # tpm 0 = images are not token-limited
+    "text-embedding-3-small": {"rpm": 3000, "tpm": 1000000},
+}
+FALLBACK_LIMIT = {"rpm": 60, "tpm": 10000}  # Models not listed above
+
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "4"))
+OPENAI_BACKOFF_BASE_SECONDS = float(os.getenv("OPENAI_BACKOFF_BASE_SECONDS", "0.5"))
+OPENAI_BACKOFF_MAX_SECONDS = float(os.getenv("OPENAI_BACKOFF_MAX_SECONDS", "20"))
+OPENAI_MIN_CONCURRENCY = int(os.getenv("OPENAI_MIN_CONCURRENCY", "2"))
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "64"))
+
+def load_limits():
+    limits = {model: dict(limit) for model, limit in DEFAULT_LIMITS.items()}
+    try:
+        for model, limit in json.loads(os.getenv("OPENAI_LIMITS", "{}")).items():
+            limits.setdefault(model, dict(FALLBACK_LIMIT)).update(limit)
+    except ValueError as e:
+        print(f"Ignoring invalid OPENAI_LIMITS: {e}")
+    return limits
+
+def estimate_tokens(messages=None, max_tokens=0, text=None):
+    # ~4 characters per token is close enough for budgeting purposes
+    chars = len(text or "") + sum(len(m.get("content") or "") for m in messages or [])
+    return chars // 4 + (max_tokens or 0)
+
+class TokenBucket:
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0  # Refill per second
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount=1.0):
+        if self.capacity <= 0:
+            return  # Unlimited
+        amount = min(amount, self.capacity)  # A single oversized request must still be able to run
+        async with self._lock: # FIFO: waiters queue on the lock
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def debit(self, amount):
+        # Charge usage reported after the fact (may go negative, delaying later callers)
+        if self.capacity > 0:
+            self._refill()
+            self.tokens -= amount
+
+class AdaptiveConcurrency:
+    # Additive-increase / multiplicative-decrease on a shared in-flight limit
+    def __init__(self, initial=8, minimum=OPENAI_MIN_CONCURRENCY, maximum=OPENAI_MAX_CONCURRENCY):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.in_flight = 0
+        self.latency_baseline = {}  # model -> EWMA of successful call latency
+        self._cond = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self):
+        async with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def on_success(self, model, latency):
+        baseline = self.latency_baseline.get(model)
+        self.latency_baseline[model] = latency if baseline is None else 0.9 * baseline + 0.1 * latency
+        if baseline is not None and latency > 2.5 * baseline:
+            self._decrease(0.9)  # Latency spike: back off gently
+        else:
+            self.limit = min(self.maximum, self.limit + 1.0 / max(self.limit, 1.0))
+
+    def on_error(self):
+        self._decrease(0.7)
+
+    def _decrease(self, factor):
+        self.limit = max(self.minimum, self.limit * factor)
+
+def _is_retryable(exc):
+    if isinstance(exc, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    status = getattr(exc, "http_status", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    error_module = getattr(openai, "error", None)
+    retryable = tuple(
+        cls for cls in (getattr(error_module, name, None) for name in
+                        ("RateLimitError", "ServiceUnavailableError", "APIConnectionError", "Timeout", "TryAgain"))
+        if isinstance(cls, type)
+    )
+    return bool(retryable) and isinstance(exc, retryable)
+
+def _is_congestion(exc):
+    # What the AIMD limit backs off on: rate limiting, server errors and timeouts.
+    # Client errors (bad request, auth, content policy) say nothing about load.
+    if isinstance(exc, asyncio.TimeoutError):
+        return True
+    status = getattr(exc, "http_status", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    timeout = getattr(getattr(openai, "error", None), "Timeout", None)
+    return isinstance(timeout, type) and isinstance(exc, timeout)
+
+def _retry_after(exc):
+    headers = getattr(exc, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after") or headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+def _usage(response):
+    # (prompt_tokens, completion_tokens) as reported by the API, or None (streams, images)
+    usage = response.get("usage") if isinstance(response, dict) else getattr(response, "usage", None)
+    if not usage:
+        return None
+    get = usage.get if isinstance(usage, dict) else lambda key, default=None: getattr(usage, key, default)
+    return get("prompt_tokens", 0) or 0, get("completion_tokens", 0) or 0
+
+def _image_count(response):
+    data = response.get("data") if isinstance(response, dict) else None
+    return len(data) if isinstance(data, list) else 0
+
+class OpenAILimiter:
+    def __init__(self, limits=None):
+        self.limits = limits or load_limits()
+        self._buckets = {}
+        self._concurrency = None  # Created lazily inside the running event loop
+        self.counters = {"calls": 0, "retries": 0, "errors": 0, "rate_limited": 0, "fallbacks": 0}
+        self.fallbacks_by_site = {}
+
+    def _model_buckets(self, model):
+        if model not in self._buckets:
+            limit = self.limits.get(model, FALLBACK_LIMIT)
+            self._buckets[model] = (TokenBucket(limit.get("rpm", 0)), TokenBucket(limit.get("tpm", 0)))
+        return self._buckets[model]
+
+    @property
+    def concurrency(self):
+        if self._concurrency is None:
+            self._concurrency = AdaptiveConcurrency()
+        return self._concurrency
+
+    async def call(self, fn, *, model, estimated_tokens=0, timeout=None, **kwargs):
+        # Usage: await openai_limiter.call(openai.ChatCompletion.acreate, model="gpt-4o", estimated_tokens=n, messages=...)
+        # `model` is forwarded to fn as well. `timeout` bounds each HTTP attempt (seconds),
+        # not the time spent queueing for the buckets or backing off between retries.
+        # With stream=True the returned stream holds its concurrency slot until it has
+        # been read to the end or closed.
+        openai.api_key = os.getenv("OPENAI_API_KEY")
+        requests_bucket, tokens_bucket = self._model_buckets(model)
+        attempt = 0
+        while True:
+            await requests_bucket.acquire(1)
+            await tokens_bucket.acquire(estimated_tokens)
+            await self.concurrency.acquire()
+            started = time.monotonic()
+            metrics.OPENAI_IN_FLIGHT.labels(model).inc()
+            handed_to_stream = False
+            try:
+                self.counters["calls"] += 1
+                request = fn(model=model, **kwargs)
+                response = await (asyncio.wait_for(request, timeout) if timeout else request)
+                if kwargs.get("stream"):
+                    handed_to_stream = True
+                    return self._read_stream(response, model, started)
+            except Exception as e:
+                self._record_error(model, time.monotonic() - started, e)
+                if not _is_retryable(e) or attempt >= OPENAI_MAX_RETRIES:
+                    raise
+                delay = _retry_after(e)
+                if delay is None:
+                    delay = random.uniform(0, min(OPENAI_BACKOFF_MAX_SECONDS, OPENAI_BACKOFF_BASE_SECONDS * 2 ** attempt))
+                attempt += 1
+                self.counters["retries"] += 1
+                metrics.OPENAI_RETRIES.labels(model).inc()
+                print(f"OpenAI {model} call failed ({e!r}); retry {attempt}/{OPENAI_MAX_RETRIES} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                continue
+            finally:
+                if not handed_to_stream:
+                    metrics.OPENAI_IN_FLIGHT.labels(model).dec()
+                    await self.concurrency.release()
+            self._record_success(model, time.monotonic() - started)
+            usage = _usage(response)
+            if usage is not None:
+                metrics.record_openai_usage(model, *usage)
+                if sum(usage) > estimated_tokens:
+                    tokens_bucket.debit(sum(usage) - estimated_tokens)
+            else:
+                metrics.record_openai_usage(model, images=_image_count(response))
+            return response
+
+    async def _read_stream(self, stream, model, started):
+        # Passes the chunks through, then releases the slot taken in call(). Latency is
+        # the full completion, which is what the AIMD baseline should see for streams;
+        # a stream closed early by the consumer counts as neither success nor error.
+        outcome = None
+        try:
+            async for chunk in stream:
+                yield chunk
+            outcome = "ok"
+        except Exception as e:
+            outcome = e
+            raise
+        finally:
+            metrics.OPENAI_IN_FLIGHT.labels(model).dec()
+            await self.concurrency.release()
+            if outcome == "ok":
+                self._record_success(model, time.monotonic() - started)
+            elif outcome is not None:
+                self._record_error(model, time.monotonic() - started, outcome)
+            elif hasattr(stream, "aclose"):
+                await stream.aclose()
+
+    def _record_success(self, model, latency):
+        self.concurrency.on_success(model, latency)
+        metrics.record_openai_call(model, latency, "ok")
+
+    def _record_error(self, model, latency, exc):
+        metrics.record_openai_call(model, latency, "error", getattr(exc, "http_status", None) or type(exc).__name__)
+        if _is_congestion(exc):
+            self.concurrency.on_error()
+        self.counters["errors"] += 1
+        if getattr(exc, "http_status", None) == 429:
+            self.counters["rate_limited"] += 1
+
+    def record_fallback(self, site, reason=None):
+        # Call sites report every placeholder result they return
+        self.counters["fallbacks"] += 1
+        self.fallbacks_by_site[site] = self.fallbacks_by_site.get(site, 0) + 1
+        metrics.FALLBACKS.labels(site).inc()
+        print(f"OpenAI fallback used at {site}: {reason!r}")
+
+    def stats(self):
+        concurrency = self._concurrency
+        return {
+            **self.counters,
+            "fallbacks_by_site": dict(self.fallbacks_by_site),
+            "concurrency_limit": round(concurrency.limit, 2) if concurrency else None,
+            "in_flight": concurrency.in_flight if concurrency else 0,
+        }
+
+# Process-wide instance used by every OpenAI call site
+openai_limiter = OpenAILimiter()
@@ -0,0 +1,78 @@
+import openai
+import json
+from ai.brand_package import BRAND_MODEL, BRAND_TEMPERATURE, generate_logo_concepts
+from ai.rate_limiter import openai_limiter, estimate_tokens
+
+# Partial regeneration (POST /api/projects/{project_id}/regenerate): fresh brand
+# names, slogans and/or a leaflet from one small GPT-4o call whose prompt asks only
+# for the requested fields, with the project's stored insights as context. Logos
+# are regenerated separately with DALL-E. The text call never touches the LLM
+# cache, since the caller wants content that differs from what it already has;
+# logos skip the cache lookup but still store the new URL, as any fresh image does.
+
+TEXT_FIELDS = {
+    "brand_name_suggestion": ("brand_names", "3 new creative brand names (list of strings)", 60),
+    "slogan_suggestion": ("slogan", 'one short, catchy slogan as {"en": English, "bn": Bengali translation}', 120),
+    "leaflet_draft": ("leaflet_json", "a leaflet draft (JSON with sections: Introduction, Benefits, Clinical References, Patient Info (BN), Compliance)", 700),
+}
+
+def regenerate_messages(element_types, project, insights, existing):
+    fields = [TEXT_FIELDS[t] for t in element_types if t in TEXT_FIELDS]
+    system_prompt = (
+        "You are a pharmaceutical branding AI. "
+        "Given a molecule, therapeutic area and the brand strategy below, generate:\n"
+        + "".join(f"- {key}: {description}\n" for key, description, _ in fields)
+        + "Do not repeat any of the existing suggestions. "
+        f"Respond in JSON with keys: {', '.join(key for key, _, _ in fields)}."
+    )
+    user_prompt = (
+        f"Molecule: {project.get('molecule_names') or ''}\n"
+        f"Therapeutic Area: {project.get('therapeutic_area') or ''}\n"
+        f"Benefits: {project.get('key_differentiating_benefits') or ''}\n"
+        f"Brand Positioning: {insights.get('brand_positioning') or ''}\n"
+        f"Competitors: {insights.get('competitors') or ''}\n"
+        f"Color Palette: {insights.get('color_palette') or ''}\n"
+        f"Cited Trials: {insights.get('cited_trials') or ''}\n"
+        f"Brand Name: {existing.get('brand_name') or ''}\n"
+        f"Existing Brand Names: {existing.get('brand_names') or []}\n"
+        f"Existing Slogans: {existing.get('slogans') or []}"
+    )
+    max_tokens = sum(tokens for _, _, tokens in fields)
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ], max_tokens
+
+async def regenerate_text(element_types, project, insights, existing):
+    # Returns {"brand_names": [...], "slogans": [{"en", "bn"}], "leaflet_json": {...}}, only for
+    # the requested types. Raises on an API or parse failure: regeneration never
+    # stores placeholder content.
+    messages, max_tokens = regenerate_messages(element_types, project, insights, existing)
+    response = await openai_limiter.call(
+        openai.ChatCompletion.acreate,
+        model=BRAND_MODEL,
+        estimated_tokens=estimate_tokens(messages, max_tokens),
+        messages=messages,
+        temperature=BRAND_TEMPERATURE,
+        max_tokens=max_tokens
+    )
+    data = json.loads(response.choices[0].message.content)
+    result = {}
+    if "brand_name_suggestion" in element_types:
+        result["brand_names"] = [n for n in data.get("brand_names") or [] if isinstance(n, str) and n.strip()]
+    if "slogan_suggestion" in element_types:
+        slogan = data.get("slogan") or {}
+        result["slogans"] = [{"en": slogan.get("en", ""), "bn": slogan.get("bn", "")}] if slogan.get("en") else []
+    if "leaflet_draft" in element_types:
+        result["leaflet_json"] = data.get("leaflet_json") or {}
+    missing = [key for key, value in result.items() if not value]
+    if missing:
+        raise ValueError(f"Regeneration returned no content for: {', '.join(missing)}")
+    return result
+
+async def regenerate_logos(brand_names, therapeutic_area, color_palette=None):
+    # One fresh DALL-E image per brand name (regenerate=True skips the cached URL
+    # lookup; generate_logo still caches the new one for the next normal request).
+    # Failed images are dropped rather than stored as placeholders.
+    logos = await generate_logo_concepts(brand_names, therapeutic_area, color_palette, regenerate=True)
+    return [logo for logo in logos if not logo.get("fallback")]
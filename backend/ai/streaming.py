@@ -0,0 +1,31 @@
+import openai
+import metrics
+from ai.rate_limiter import openai_limiter, estimate_tokens
+
+async def stream_chat_text(**kwargs):
+    # Yields the text deltas of a streamed chat completion as they arrive.
+    # kwargs are passed to openai.ChatCompletion.acreate through the shared limiter.
+    # Streams carry no usage block, so tokens are estimated for metrics once it ends.
+    response = await openai_limiter.call(
+        openai.ChatCompletion.acreate,
+        estimated_tokens=estimate_tokens(kwargs.get("messages"), kwargs.get("max_tokens")),
+        stream=True,
+        **kwargs
+    )
+    completion_chars = 0
+    try:
+        async for chunk in response:
+            choices = chunk.get("choices") or []
+            if not choices:
+                continue
+            delta = choices[0].get("delta", {}).get("content")
+            if delta:
+                completion_chars += len(delta)
+                yield delta
+    finally:
+        await response.aclose() # Frees the limiter's concurrency slot if we stopped early
+        metrics.record_openai_usage(
+            kwargs.get("model"),
+            prompt_tokens=estimate_tokens(kwargs.get("messages")),
+            completion_tokens=completion_chars // 4, # Same ~4 chars/token rule as estimate_tokens
+        )
@@ -0,0 +1,123 @@
+# Logo ingestion, run after generation and off the request path.
+#
+# DALL-E URLs expire and are full 512x512 images, so every logo_concept element is
+# downloaded (concurrently), deduplicated by content hash, stored with precomputed
+# thumbnails, and recorded in `assets` with its brand_element_id. The element's
+# content then points at the stored copy (url) and a small thumbnail (thumbnail_url).
+import asyncio
+import hashlib
+import io
+import os
+
+import httpx
+
+from assets.storage import storage
+from database.db import supabase, execute
+from database.project_cache import project_cache
+from metrics import timed
+
+INGEST_CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", "8"))
+INGEST_TIMEOUT_SECONDS = float(os.getenv("INGEST_TIMEOUT_SECONDS", "30"))
+THUMBNAIL_SIZES = (128, 256)
+
+_semaphore = None
+_background_tasks = set()  # Keep references so pending ingestions aren't garbage collected
+
+def _make_thumbnails(data):
+    # CPU-bound; runs in a worker thread
+    from PIL import Image
+    thumbnails = {}
+    with Image.open(io.BytesIO(data)) as image:
+        image = image.convert("RGBA")
+        for size in THUMBNAIL_SIZES:
+            thumb = image.copy()
+            thumb.thumbnail((size, size))
+            out = io.BytesIO()
+            thumb.save(out, format="WEBP", quality=85, method=4)
+            thumbnails[size] = out.getvalue()
+    return thumbnails
+
+def _keys(digest):
+    # Content-addressed keys: re-ingesting an identical image is a no-op
+    return {"original": f"logos/{digest}.png", **{size: f"logos/{digest}_{size}.webp" for size in THUMBNAIL_SIZES}}
+
+def _store(keys, data, thumbnails):
+    if not storage.exists(keys["original"]):
+        storage.put(keys["original"], data)
+    for size, thumb in thumbnails.items():
+        if not storage.exists(keys[size]):
+            storage.put(keys[size], thumb)
+
+async def _ingest_one(client, project_id, element):
+    content = element.get("content") or {}
+    source_url = content.get("source_url") or content.get("url")
+    async with _semaphore:
+        response = await client.get(source_url)
+        response.raise_for_status()
+        data = response.content
+    digest = hashlib.sha256(data).hexdigest()
+    keys = _keys(digest)
+    if not all(storage.exists(key) for key in keys.values()):
+        thumbnails = await asyncio.to_thread(_make_thumbnails, data)
+        await asyncio.to_thread(_store, keys, data, thumbnails)
+
+    assets = [{
+        "project_id": project_id, "brand_element_id": element["id"], "asset_type": "logo_png",
+        "file_name": f"{digest}.png", "storage_path": keys["original"],
+        "metadata": {"sha256": digest, "source_url": source_url, "bytes": len(data)},
+    }] + [{
+        "project_id": project_id, "brand_element_id": element["id"], "asset_type": "logo_thumbnail",
+        "file_name": f"{digest}_{size}.webp", "storage_path": keys[size],
+        "metadata": {"sha256": digest, "size": size},
+    } for size in THUMBNAIL_SIZES]
+    new_content = {
+        **content,
+        "url": storage.url(keys["original"]),
+        "thumbnail_url": storage.url(keys[THUMBNAIL_SIZES[0]]),
+        "source_url": source_url,
+        "sha256": digest,
+    }
+    return element["id"], new_content, assets
+
+async def ingest_logos(project_id, elements):
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(INGEST_CONCURRENCY)
+    logos = [
+        el for el in elements
+        if el.get("element_type") == "logo_concept" and el.get("id")
+        and (el.get("content") or {}).get("url") and not (el.get("content") or {}).get("fallback")
+        and not (el.get("content") or {}).get("sha256") # Already ingested
+    ]
+    if not logos:
+        return []
+    async with httpx.AsyncClient(timeout=INGEST_TIMEOUT_SECONDS, follow_redirects=True) as client:
+        with timed("logo_ingest"):
+            results = await asyncio.gather(*(_ingest_one(client, project_id, el) for el in logos), return_exceptions=True)
+
+    ingested, assets = [], []
+    for element, result in zip(logos, results):
+        if isinstance(result, Exception):
+            print(f"Logo ingestion failed for element {element['id']}: {result!r}")
+            continue
+        ingested.append(result)
+        assets += result[2]
+    if assets:
+        await execute(supabase.table("assets").insert(assets)) # One bulk insert for all files
+    for element_id, new_content, _ in ingested:
+        await execute(supabase.table("brand_elements").update({"content": new_content}).eq("id", element_id))
+    if ingested:
+        project_cache.invalidate(project_id) # Logo URLs now point at our own storage
+    return ingested
+
+def schedule_logo_ingestion(project_id, elements):
+    # Fire-and-forget from request handlers; failures are logged, never raised
+    async def run():
+        try:
+            await ingest_logos(project_id, elements)
+        except Exception as e:
+            print(f"Logo ingestion for project {project_id} failed: {e!r}")
+    task = asyncio.create_task(run())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
@@ -0,0 +1,39 @@
+# Storage backends for ingested files (logos, thumbnails). Keys are relative,
+# content-addressed paths such as "logos/<sha256>.png".
+import os
+import tempfile
+
+ASSET_ROOT = os.getenv("ASSET_ROOT", os.path.join(os.path.dirname(__file__), "..", ".cache", "assets"))
+ASSET_BASE_URL = os.getenv("ASSET_BASE_URL", "http://localhost:5040/assets")  # Where ASSET_ROOT is served from
+
+class LocalFilesystemStorage:
+    def __init__(self, root=ASSET_ROOT, base_url=ASSET_BASE_URL):
+        self.root = os.path.abspath(root)
+        self.base_url = base_url.rstrip("/")
+
+    def path(self, key):
+        return os.path.join(self.root, key)
+
+    def exists(self, key):
+        return os.path.exists(self.path(key))
+
+    def put(self, key, data):
+        # Write-then-rename so a concurrent reader never sees a partial file. The temp
+        # name is unique per call: ingestion threads may write the same key at once.
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.chmod(tmp_path, 0o644) # mkstemp creates 0600; assets are public
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return path
+
+    def url(self, key):
+        return f"{self.base_url}/{key}"
+
+storage = LocalFilesystemStorage()
@@ -0,0 +1,149 @@
+# Bulk project creation for portfolio launches (POST /api/projects/batch).
+#
+# Rows arrive as JSONL or CSV in the shape of CreateProjectRequest. Identical rows
+# (after normalization) are generated once; unique rows run through the insights +
+# brand-package pipeline with bounded parallelism; finished rows are written to
+# `projects` and `brand_elements` in one transactional call per flush, and per-row
+# results are yielded as each flush completes. A bad row only fails itself, never the batch:
+# a failed flush is retried one row at a time.
+import asyncio
+import csv
+import io
+import json
+import os
+
+from pydantic import ValidationError
+
+from ai.cache import make_key
+from models import CreateProjectRequest
+from pipeline import run_insights, run_brand_package, project_row, build_brand_elements, persist_projects
+from assets.ingest import schedule_logo_ingestion
+from metrics import track, record_project_cost
+
+BATCH_MAX_ROWS = int(os.getenv("BATCH_MAX_ROWS", "500"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))  # Unique rows generated in parallel
+BATCH_FLUSH_SIZE = int(os.getenv("BATCH_FLUSH_SIZE", "20"))  # Rows per transactional write
+
+class BatchParseError(ValueError):
+    pass
+
+def parse_rows(body: bytes, content_type: str):
+    # Returns a list of raw dict rows (or a BatchParseError for the whole body)
+    text = body.decode("utf-8-sig")
+    if "csv" in (content_type or ""):
+        rows = [
+            {k.strip(): (v.strip() or None) if isinstance(v, str) else v for k, v in row.items() if k}
+            for row in csv.DictReader(io.StringIO(text))
+        ]
+    else: # JSONL / NDJSON
+        rows = []
+        for line_no, line in enumerate(text.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                rows.append(json.loads(line))
+            except ValueError as e:
+                # Keep the row slot so results stay aligned with input lines
+                rows.append(BatchParseError(f"line {line_no}: invalid JSON ({e})"))
+    if len(rows) > BATCH_MAX_ROWS:
+        raise BatchParseError(f"Batch has {len(rows)} rows; the maximum is {BATCH_MAX_ROWS}.")
+    return rows
+
+def validate_row(raw):
+    if isinstance(raw, Exception):
+        raise raw
+    if not isinstance(raw, dict):
+        raise BatchParseError("row must be a JSON object")
+    request = CreateProjectRequest(**raw)
+    if not request.natural_language_prompt and (not request.molecule_names or not request.therapeutic_area):
+        raise BatchParseError("Molecule names and Therapeutic Area are required if not using a natural language prompt.")
+    return request
+
+def row_key(request: CreateProjectRequest):
+    # project_name is stored as given, so names differing only in case are different projects
+    return make_key("batch_row", **request.dict(exclude={"regenerate", "project_name"})), request.project_name
+
+async def _generate(request, semaphore):
+    async with semaphore:
+        with track() as tracker: # Runs in its own task, so each row gets its own cost
+            data = request.dict()
+            insights = await run_insights(data, regenerate=request.regenerate)
+            brand_package = await run_brand_package(data, insights, regenerate=request.regenerate)
+        record_project_cost("batch", tracker)
+        return insights, brand_package
+
+async def _flush(user_id, ready):
+    # ready: list of (row_indexes, request, insights, brand_package)
+    # One transactional call per flush: every project and all of their brand elements
+    # are stored together, or none are.
+    created = await persist_projects([
+        (project_row(user_id, request.dict()), build_brand_elements(None, insights, brand_package))
+        for _, request, insights, brand_package in ready
+    ])
+    results = []
+    for project, (indexes, *_) in zip(created, ready):
+        schedule_logo_ingestion(project["id"], project.get("brand_elements") or [])
+        for n, i in enumerate(indexes):
+            result = {"row": i, "status": "created", "project_id": str(project["id"])}
+            if n:
+                result["duplicate_of"] = indexes[0]
+            results.append(result)
+    return results
+
+async def run_batch(user_id, raw_rows):
+    # Async generator of per-row result dicts, in completion order
+    unique = {}  # row key -> (row indexes, request)
+    for i, raw in enumerate(raw_rows):
+        try:
+            request = validate_row(raw)
+        except (ValidationError, ValueError, TypeError) as e:
+            yield {"row": i, "status": "error", "detail": str(e)}
+            continue
+        key = row_key(request)
+        if key in unique:
+            unique[key][0].append(i)
+        else:
+            unique[key] = ([i], request)
+
+    semaphore = asyncio.Semaphore(max(1, BATCH_CONCURRENCY))
+
+    async def generate_row(indexes, request):
+        try:
+            return indexes, request, await _generate(request, semaphore), None
+        except Exception as e:
+            return indexes, request, None, e
+
+    tasks = [asyncio.create_task(generate_row(indexes, request)) for indexes, request in unique.values()]
+    ready = []
+    try:
+        for finished in asyncio.as_completed(tasks):
+            indexes, request, generated, error = await finished
+            if error is not None:
+                print(f"Batch row(s) {indexes} failed: {error}")
+                for i in indexes:
+                    yield {"row": i, "status": "error", "detail": f"Generation failed: {error}"}
+            else:
+                ready.append((indexes, request, *generated))
+            if len(ready) >= BATCH_FLUSH_SIZE:
+                for result in await _flush_safely(user_id, ready):
+                    yield result
+                ready = []
+        if ready:
+            for result in await _flush_safely(user_id, ready):
+                yield result
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def _flush_safely(user_id, ready):
+    try:
+        return await _flush(user_id, ready)
+    except Exception as e:
+        print(f"Batch bulk insert of {len(ready)} project(s) failed: {e}")
+        if len(ready) > 1:
+            # The whole transaction rolled back; write each row on its own so only the bad one fails
+            results = []
+            for item in ready:
+                results += await _flush_safely(user_id, [item])
+            return results
+        return [{"row": i, "status": "error", "detail": f"Database write failed: {e}"} for indexes, *_ in ready for i in indexes]
@@ -0,0 +1,174 @@
+# Stand-in for the OpenAI API used by the benchmark harness (bench/run.py).
+#
+# Serves /v1/chat/completions (plain and stream=True), /v1/images/generations and
+# /v1/embeddings with a configurable latency / error profile, and answers in the
+# shapes the app's prompts expect (insights JSON, brand package JSON, a compliance
+# verdict). Image URLs point back at this server, so logo ingestion downloads real
+# PNG bytes. Embeddings are hashed bags of words: texts sharing words score higher.
+#
+#   python -m bench.fake_openai --port 8101 --chat-latency-ms 800 --image-latency-ms 4000 --chat-error-rate 0.02
+import argparse
+import asyncio
+import base64
+import hashlib
+import itertools
+import json
+import re
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+from bench.profile import Profile, add_profile_arguments, profile_from_args
+
+# 1x1 PNG; enough for ingestion to hash, store and thumbnail
+PNG_BYTES = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=="
+)
+
+def insights_reply():
+    return {
+        "competitors": ["Competitor A", "Competitor B", "Competitor C"],
+        "brand_positioning": "Once-daily control with a favourable safety profile.",
+        "color_palette": [
+            {"name": "Deep Blue", "hex": "#1F3A93", "reason": "Trust"},
+            {"name": "Teal", "hex": "#1ABC9C", "reason": "Vitality"},
+            {"name": "White", "hex": "#FFFFFF", "reason": "Clarity"},
+        ],
+        "clinical_trials": [{"name": "BENCH-1", "summary": "Met its primary endpoint versus placebo."}],
+    }
+
+def brand_reply(n):
+    # Carries the keys of both the full brand-package prompt and the regeneration prompt
+    return {
+        "brand_names": [f"Benchra{n}", f"Benchlo{n}", f"Benchiva{n}"],
+        "slogan_en": "Steady days, every day.",
+        "slogan_bn": "প্রতিদিন স্থির দিন।",
+        "slogan": {"en": "Steady days, every day.", "bn": "প্রতিদিন স্থির দিন।"},
+        "leaflet_json": {"sections": [
+            {"title": "Introduction", "content": "A once-daily oral therapy."},
+            {"title": "Benefits", "content": "Consistent control in clinical studies."},
+            {"title": "Clinical References", "content": "BENCH-1."},
+            {"title": "Patient Info (BN)", "content": "দিনে একবার সেবন করুন।"},
+            {"title": "Compliance", "content": "Prescription only. See full prescribing information."},
+        ]},
+    }
+
+EMBEDDING_DIM = 1536
+
+def embedding_for(text):
+    vector = [0.0] * EMBEDDING_DIM
+    for word in re.findall(r"\w+", text.lower()):
+        digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+        vector[int.from_bytes(digest[:4], "little") % EMBEDDING_DIM] += 1.0 if digest[4] & 1 else -1.0
+    return vector
+
+def reply_for(messages, n):
+    system = " ".join(m.get("content") or "" for m in messages if m.get("role") == "system").lower()
+    if "compliance expert" in system:
+        return "approved"
+    if "brand strategist" in system:
+        return json.dumps(insights_reply())
+    return json.dumps(brand_reply(n), ensure_ascii=False)
+
+def create_app(chat_profile: Profile, image_profile: Profile, stream_chunk_ms=5.0, chunk_chars=16, base_url=""):
+    app = FastAPI()
+    counter = itertools.count(1)
+    stats = {"chat": 0, "chat_stream": 0, "images": 0, "embeddings": 0, "errors": 0}
+
+    def error(profile):
+        stats["errors"] += 1
+        headers = {"Retry-After": "0.1"} if profile.error_status == 429 else {}
+        return JSONResponse(
+            status_code=profile.error_status,
+            content={"error": {"message": "Injected benchmark error", "type": "server_error", "code": None}},
+            headers=headers,
+        )
+
+    @app.get("/health")
+    def health():
+        return {"ok": True, **stats}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        await chat_profile.wait() # Time to first token
+        if chat_profile.should_fail():
+            return error(chat_profile)
+        n = next(counter)
+        content = reply_for(body.get("messages") or [], n)
+        created = int(time.time())
+        if not body.get("stream"):
+            stats["chat"] += 1
+            prompt_tokens = sum(len(m.get("content") or "") for m in body.get("messages") or []) // 4
+            completion_tokens = len(content) // 4
+            return {
+                "id": f"chatcmpl-bench-{n}", "object": "chat.completion", "created": created, "model": body.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens},
+            }
+
+        stats["chat_stream"] += 1
+
+        async def chunks():
+            for start in range(0, len(content), chunk_chars):
+                chunk = {
+                    "id": f"chatcmpl-bench-{n}", "object": "chat.completion.chunk", "created": created, "model": body.get("model"),
+                    "choices": [{"index": 0, "delta": {"content": content[start:start + chunk_chars]}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+                if stream_chunk_ms:
+                    await asyncio.sleep(stream_chunk_ms / 1000.0)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(chunks(), media_type="text/event-stream")
+
+    @app.post("/v1/images/generations")
+    async def images_generations(request: Request):
+        await request.json()
+        await image_profile.wait()
+        if image_profile.should_fail():
+            return error(image_profile)
+        stats["images"] += 1
+        n = next(counter)
+        return {"created": int(time.time()), "data": [{"url": f"{base_url}/images/{n}.png"}]}
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        await chat_profile.wait()
+        if chat_profile.should_fail():
+            return error(chat_profile)
+        stats["embeddings"] += 1
+        inputs = body.get("input")
+        inputs = [inputs] if isinstance(inputs, str) else inputs or []
+        prompt_tokens = sum(len(text) for text in inputs) // 4
+        return {
+            "object": "list", "model": body.get("model"),
+            "data": [{"object": "embedding", "index": i, "embedding": embedding_for(text)} for i, text in enumerate(inputs)],
+            "usage": {"prompt_tokens": prompt_tokens, "total_tokens": prompt_tokens},
+        }
+
+    @app.get("/images/{name}")
+    def image(name: str):
+        return Response(content=PNG_BYTES, media_type="image/png")
+
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI API for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8101)
+    parser.add_argument("--stream-chunk-ms", type=float, default=5.0)
+    add_profile_arguments(parser, "chat-", latency_ms=800)
+    add_profile_arguments(parser, "image-", latency_ms=4000)
+    args = parser.parse_args()
+    app = create_app(
+        profile_from_args(args, "chat-"), profile_from_args(args, "image-"),
+        stream_chunk_ms=args.stream_chunk_ms, base_url=f"http://{args.host}:{args.port}",
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+# In-memory stand-in for Supabase's PostgREST API, used by the benchmark harness.
+#
+# Implements the subset of PostgREST the app's supabase-py queries use: select with
+# column lists and one level of embedded children (e.g. "*, brand_elements(*)"),
+# eq / neq / lt / lte / gt / gte / in / is filters, or=(...) / and(...) trees,
+# order (incl. on embedded resources), limit, single-object responses, insert,
+# update, delete, and the create_projects_with_elements RPC. Every request goes
+# through a configurable latency / error profile.
+#
+#   python -m bench.fake_postgrest --port 8102 --latency-ms 15 --seed-projects 1000
+import argparse
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+from bench.profile import Profile, add_profile_arguments, profile_from_args
+
+SINGLE_OBJECT = "application/vnd.pgrst.object+json"
+RESERVED_PARAMS = {"select", "order", "limit", "offset", "columns", "on_conflict"}
+
+# Column defaults applied on insert (the schema's DEFAULTs)
+DEFAULTS = {
+    "projects": {"status": "draft"},
+    "brand_elements": {"is_selected": False},
+    "compliance_checks": {"stale": False},
+    "generation_jobs": {"status": "queued", "attempts": 0},
+}
+
+class QueryError(ValueError):
+    pass
+
+def _now(offset_seconds=0.0):
+    return (datetime.now(timezone.utc) + timedelta(seconds=offset_seconds)).isoformat()
+
+# --- Parsing -------------------------------------------------------------------
+
+def split_top_level(text, sep=","):
+    # Splits on sep outside parentheses and double quotes
+    parts, depth, quoted, current = [], 0, False, []
+    i = 0
+    while i < len(text):
+        c = text[i]
+        if quoted:
+            current.append(c)
+            if c == "\\" and i + 1 < len(text):
+                current.append(text[i + 1])
+                i += 1
+            elif c == '"':
+                quoted = False
+        elif c == '"':
+            quoted = True
+            current.append(c)
+        elif c == "(":
+            depth += 1
+            current.append(c)
+        elif c == ")":
+            depth -= 1
+            current.append(c)
+        elif c == sep and depth == 0:
+            parts.append("".join(current))
+            current = []
+        else:
+            current.append(c)
+        i += 1
+    if current or parts:
+        parts.append("".join(current))
+    return parts
+
+def unquote(value):
+    value = value.strip()
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return value[1:-1].replace('\\"', '"').replace("\\\\", "\\")
+    return value
+
+def parse_select(select):
+    # "*, brand_elements(*)" -> (["*"], {"brand_elements": ["*"]})
+    columns, embeds = [], {}
+    for part in split_top_level(select or "*"):
+        part = part.strip()
+        if not part:
+            continue
+        if "(" in part and part.endswith(")"):
+            name = part[:part.index("(")].strip().split(":")[-1].split("!")[0]
+            embeds[name] = [c.strip() for c in split_top_level(part[part.index("(") + 1:-1]) if c.strip()] or ["*"]
+        else:
+            columns.append(part)
+    return columns or ["*"], embeds
+
+def parse_order(order):
+    # "created_at.desc,id.desc" -> [("created_at", True), ("id", True)]
+    keys = []
+    for part in split_top_level(order or ""):
+        pieces = part.strip().split(".")
+        if pieces and pieces[0]:
+            keys.append((pieces[0], len(pieces) > 1 and pieces[1] == "desc"))
+    return keys
+
+def parse_condition(column, expression):
+    # column + "op.value" (optionally "not.op.value") -> predicate(row)
+    negate = expression.startswith("not.")
+    if negate:
+        expression = expression[4:]
+    op, _, raw = expression.partition(".")
+    if op == "in":
+        values = [unquote(v) for v in split_top_level(raw.strip()[1:-1])]
+        test = lambda actual: any(_equal(actual, v) for v in values)
+    elif op == "is":
+        raw = raw.lower()
+        test = lambda actual: (actual is None) if raw == "null" else _equal(actual, raw)
+    elif op in ("eq", "neq", "lt", "lte", "gt", "gte"):
+        value = unquote(raw)
+        test = {
+            "eq": lambda actual: _equal(actual, value),
+            "neq": lambda actual: not _equal(actual, value),
+            "lt": lambda actual: _compare(actual, value) < 0,
+            "lte": lambda actual: _compare(actual, value) <= 0,
+            "gt": lambda actual: _compare(actual, value) > 0,
+            "gte": lambda actual: _compare(actual, value) >= 0,
+        }[op]
+    else:
+        raise QueryError(f"Unsupported operator: {op}")
+    return lambda row: test(row.get(column)) != negate
+
+def parse_logic(kind, tree):
+    # kind "or"/"and", tree "(a.eq.1,and(b.lt.2,c.gt.3))" -> predicate(row)
+    tree = tree.strip()
+    if not (tree.startswith("(") and tree.endswith(")")):
+        raise QueryError(f"Malformed {kind} filter: {tree}")
+    predicates = []
+    for term in split_top_level(tree[1:-1]):
+        term = term.strip()
+        if term.startswith(("and(", "or(", "not.and(", "not.or(")):
+            negate = term.startswith("not.")
+            inner_kind = term[4:] if negate else term
+            inner_kind, _, rest = inner_kind.partition("(")
+            inner = parse_logic(inner_kind, "(" + rest)
+            predicates.append((lambda p: lambda row: not p(row))(inner) if negate else inner)
+        else:
+            column, _, expression = term.partition(".")
+            predicates.append(parse_condition(column, expression))
+    combine = any if kind == "or" else all
+    return lambda row: combine(p(row) for p in predicates)
+
+def _coerce(actual, raw):
+    if isinstance(actual, bool):
+        return raw.lower() == "true"
+    if isinstance(actual, (int, float)):
+        try:
+            return float(raw)
+        except ValueError:
+            return raw
+    return raw
+
+def _equal(actual, raw):
+    if actual is None:
+        return raw == "null"
+    if isinstance(actual, str):
+        return actual == raw
+    return actual == _coerce(actual, raw)
+
+def _compare(actual, raw):
+    if actual is None:
+        return 1
+    other = raw if isinstance(actual, str) else _coerce(actual, raw)
+    try:
+        return (actual > other) - (actual < other)
+    except TypeError:
+        return (str(actual) > raw) - (str(actual) < raw)
+
+# --- Store ---------------------------------------------------------------------
+
+class Store:
+    def __init__(self):
+        self.tables = {}
+
+    def rows(self, table):
+        return self.tables.setdefault(table, [])
+
+    def insert(self, table, row):
+        stored = {**DEFAULTS.get(table, {}), **row}
+        stored.setdefault("id", str(uuid.uuid4()))
+        now = _now()
+        stored.setdefault("created_at", now)
+        stored.setdefault("updated_at", now)
+        self.rows(table).append(stored)
+        return dict(stored)
+
+    def seed(self, count, user_id):
+        # Projects spread over the last `count` minutes, each with a full set of elements
+        for i in range(count):
+            created_at = _now(-60.0 * (count - i))
+            project = self.insert("projects", {
+                "user_id": user_id, "project_name": f"Seed {i}", "molecule_names": f"seedmol-{i}",
+                "therapeutic_area": ("Cardiology", "Oncology", "Diabetes")[i % 3],
+                "status": "completed", "created_at": created_at, "updated_at": created_at,
+            })
+            for element_type, content in (
+                ("insight_competitors", {"competitors": ["Competitor A", "Competitor B"]}),
+                ("insight_brand_positioning", {"positioning": "Once-daily control."}),
+                ("insight_color_palette", [{"name": "Deep Blue", "hex": "#1F3A93", "reason": "Trust"}]),
+                ("brand_name_suggestion", {"name": f"Seedra{i}"}),
+                ("brand_name_suggestion", {"name": f"Seedlo{i}"}),
+                ("logo_concept", {"url": f"https://example.invalid/logo_{i}.png", "fallback": True}),
+                ("slogan_suggestion", {"en": "Steady days, every day.", "bn": "প্রতিদিন স্থির দিন।"}),
+                ("leaflet_draft", {"sections": [{"title": "Introduction", "content": "A once-daily oral therapy."}]}),
+            ):
+                self.insert("brand_elements", {"project_id": project["id"], "element_type": element_type, "content": content, "created_at": created_at})
+
+def _select_rows(store, table, params):
+    predicates = []
+    for key, value in params:
+        if key in RESERVED_PARAMS or "." in key:
+            continue # Embedded-resource modifiers (e.g. brand_elements.order) are applied below
+        if key in ("or", "and"):
+            predicates.append(parse_logic(key, value))
+        else:
+            predicates.append(parse_condition(key, value))
+    return [row for row in store.rows(table) if all(p(row) for p in predicates)]
+
+def _order_and_limit(rows, order, limit, offset=None):
+    for column, desc in reversed(parse_order(order)): # Stable sorts, least significant key first
+        present = sorted((r for r in rows if r.get(column) is not None), key=lambda r: r[column], reverse=desc)
+        rows = present + [r for r in rows if r.get(column) is None] # NULLs last
+    if offset:
+        rows = rows[int(offset):]
+    if limit not in (None, ""):
+        rows = rows[:int(limit)]
+    return rows
+
+def _project(row, columns):
+    if "*" in columns:
+        return dict(row)
+    return {c: row.get(c) for c in columns}
+
+def _foreign_key(table):
+    # projects -> project_id
+    return (table[:-1] if table.endswith("s") else table) + "_id"
+
+def query(store, table, params):
+    params = list(params)
+    single = dict(params)
+    columns, embeds = parse_select(single.get("select"))
+    rows = _select_rows(store, table, params)
+    rows = _order_and_limit(rows, single.get("order"), single.get("limit"), single.get("offset"))
+    result = []
+    for row in rows:
+        out = _project(row, columns)
+        for child, child_columns in embeds.items():
+            key = _foreign_key(table)
+            children = [r for r in store.rows(child) if r.get(key) == row.get("id")]
+            children = _order_and_limit(children, single.get(f"{child}.order"), single.get(f"{child}.limit"))
+            out[child] = [_project(r, child_columns) for r in children]
+        result.append(out)
+    return result
+
+def create_projects_with_elements(store, p_projects):
+    # Mirrors the SQL function in database/supabase_schemas.sql
+    created = []
+    for item in p_projects or []:
+        fields = ("user_id", "project_name", "molecule_names", "therapeutic_area", "key_differentiating_benefits", "status")
+        row = item.get("project") or {}
+        if "id" in row: # Existing project: update its status and replace its elements
+            project = next((p for p in store.rows("projects") if p["id"] == row["id"]), None)
+            if project is None:
+                raise QueryError(f"Project {row['id']} does not exist")
+            project.update({"status": row.get("status") or project.get("status"), "updated_at": _now()})
+            project = dict(project)
+            store.tables["brand_elements"] = [el for el in store.rows("brand_elements") if el.get("project_id") != project["id"]]
+        else:
+            project = store.insert("projects", {k: v for k, v in row.items() if k in fields and v is not None})
+        elements = [
+            store.insert("brand_elements", {"project_id": project["id"], "element_type": el.get("element_type"), "content": el.get("content")})
+            for el in item.get("elements") or []
+        ]
+        created.append({**project, "brand_elements": elements})
+    return created
+
+RPCS = {"create_projects_with_elements": create_projects_with_elements}
+
+# --- App -----------------------------------------------------------------------
+
+def create_app(profile: Profile, store: Store = None):
+    app = FastAPI()
+    store = store or Store()
+    stats = {"requests": 0, "errors": 0}
+
+    def pgrst_error(status, message, code="PGRST000"):
+        return JSONResponse(status_code=status, content={"code": code, "message": message, "details": None, "hint": None})
+
+    def respond(request, rows, status=200):
+        if SINGLE_OBJECT in request.headers.get("accept", ""):
+            if len(rows) != 1:
+                return pgrst_error(406, f"JSON object requested, multiple (or no) rows returned ({len(rows)})", "PGRST116")
+            return JSONResponse(status_code=status, content=rows[0])
+        if "return=minimal" in request.headers.get("prefer", ""):
+            return Response(status_code=status if status != 200 else 204)
+        return JSONResponse(status_code=status, content=rows)
+
+    @app.get("/health")
+    def health():
+        return {"ok": True, **stats, "rows": {table: len(rows) for table, rows in store.tables.items()}}
+
+    @app.post("/rest/v1/rpc/{function}")
+    async def rpc(function: str, request: Request):
+        stats["requests"] += 1
+        await profile.wait()
+        if profile.should_fail():
+            stats["errors"] += 1
+            return pgrst_error(profile.error_status, "Injected benchmark error")
+        if function not in RPCS:
+            return pgrst_error(404, f"Could not find the function {function}", "PGRST202")
+        body = await request.json()
+        try:
+            return JSONResponse(content=RPCS[function](store, **body))
+        except QueryError as e: # RAISE EXCEPTION in the SQL function
+            return pgrst_error(400, str(e), "P0001")
+
+    @app.api_route("/rest/v1/{table}", methods=["GET", "POST", "PATCH", "DELETE"])
+    async def table_endpoint(table: str, request: Request):
+        stats["requests"] += 1
+        await profile.wait()
+        if profile.should_fail():
+            stats["errors"] += 1
+            return pgrst_error(profile.error_status, "Injected benchmark error")
+        params = request.query_params.multi_items()
+        try:
+            if request.method == "GET":
+                return respond(request, query(store, table, params))
+            body = await request.body()
+            # No awaits from here on: matching and writing rows is atomic, as in Postgres,
+            # so conditional updates (job claims, fenced checkpoints) can't interleave
+            if request.method == "POST":
+                body = json.loads(body or b"[]")
+                rows = [store.insert(table, row) for row in (body if isinstance(body, list) else [body])]
+                return respond(request, rows, status=201)
+            matched = _select_rows(store, table, params)
+            if request.method == "PATCH":
+                changes = json.loads(body or b"{}")
+                for row in matched:
+                    row.update(changes)
+                return respond(request, [dict(row) for row in matched])
+            # DELETE
+            ids = {id(row) for row in matched}
+            store.tables[table] = [row for row in store.rows(table) if id(row) not in ids]
+            return respond(request, [dict(row) for row in matched])
+        except (QueryError, ValueError, KeyError) as e:
+            return pgrst_error(400, str(e), "PGRST100")
+
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake PostgREST (Supabase REST) API for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8102)
+    parser.add_argument("--seed-projects", type=int, default=0)
+    parser.add_argument("--seed-user-id", default="demo-user-fixme")
+    add_profile_arguments(parser, latency_ms=10)
+    args = parser.parse_args()
+    store = Store()
+    store.seed(args.seed_projects, args.seed_user_id)
+    uvicorn.run(create_app(profile_from_args(args), store), host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+# Latency / error profile shared by the fake OpenAI and PostgREST servers.
+import asyncio
+import random
+
+class Profile:
+    def __init__(self, latency_ms=0.0, jitter=0.0, error_rate=0.0, error_status=500, seed=None):
+        self.latency_ms = latency_ms  # Median added latency per request
+        self.jitter = jitter  # Spread as a fraction of latency_ms (log-normal, so there is a tail)
+        self.error_rate = error_rate  # Fraction of requests answered with error_status
+        self.error_status = error_status
+        self._random = random.Random(seed)
+
+    def delay_seconds(self):
+        if self.latency_ms <= 0:
+            return 0.0
+        return self.latency_ms * self._random.lognormvariate(0, self.jitter) / 1000.0
+
+    async def wait(self):
+        delay = self.delay_seconds()
+        if delay:
+            await asyncio.sleep(delay)
+
+    def should_fail(self):
+        return self.error_rate > 0 and self._random.random() < self.error_rate
+
+def add_profile_arguments(parser, prefix="", latency_ms=0.0, error_status=500):
+    # --<prefix>latency-ms / --<prefix>jitter / --<prefix>error-rate / --<prefix>error-status
+    parser.add_argument(f"--{prefix}latency-ms", type=float, default=latency_ms)
+    parser.add_argument(f"--{prefix}jitter", type=float, default=0.25)
+    parser.add_argument(f"--{prefix}error-rate", type=float, default=0.0)
+    parser.add_argument(f"--{prefix}error-status", type=int, default=error_status)
+
+def profile_from_args(args, prefix=""):
+    attr = prefix.replace("-", "_")
+    return Profile(
+        latency_ms=getattr(args, f"{attr}latency_ms"),
+        jitter=getattr(args, f"{attr}jitter"),
+        error_rate=getattr(args, f"{attr}error_rate"),
+        error_status=getattr(args, f"{attr}error_status"),
+    )
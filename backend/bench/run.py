@@ -0,0 +1,316 @@
+# Load / latency benchmark for the FastAPI app, with no real OpenAI or Supabase.
+#
+# Starts the fake OpenAI server (bench/fake_openai.py), the fake PostgREST server
+# (bench/fake_postgrest.py, seeded with projects) and the app itself under uvicorn,
+# pointed at both. Then, for every endpoint and concurrency level, it runs a
+# closed loop of `concurrency` clients for --duration seconds (after --warmup)
+# and records throughput, error counts and p50/p95/p99 latency. Results are
+# written as JSON, tagged with the git commit, so runs can be diffed:
+#
+#   cd backend
+#   python -m bench.run --endpoints create,get,list,compliance --concurrency 1,8,32 --duration 15
+#   python -m bench.run compare bench/results/<before>.json bench/results/<after>.json
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+from bench.profile import add_profile_arguments
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(BACKEND_DIR, "bench", "results")
+USER_ID = "demo-user-fixme" # The app's hard-coded user until auth lands
+
+# Generous OpenAI limits by default, so the run measures the app rather than the
+# production rate limits; pass --openai-limits to benchmark with real ones.
+BENCH_OPENAI_LIMITS = {
+    "gpt-4o": {"rpm": 1000000, "tpm": 1000000000},
+    "dall-e-3": {"rpm": 1000000, "tpm": 0},
+}
+
+# --- Endpoint drivers: (client, state, n) -> response ----------------------------
+
+async def create_project(client, state, n):
+    payload = {
+        "project_name": f"Bench {n}",
+        "molecule_names": f"benchmol-{n}" if state["unique_payloads"] else "benchmol",
+        "therapeutic_area": "Cardiology",
+        "key_differentiating_benefits": "Once-daily dosing",
+    }
+    return await client.post("/api/projects/create", json=payload)
+
+async def get_project(client, state, n):
+    return await client.get(f"/api/projects/{state['project_ids'][n % len(state['project_ids'])]}")
+
+async def list_projects(client, state, n):
+    return await client.get("/api/projects/list", params={"user_id": USER_ID, "limit": 20})
+
+async def compliance_check(client, state, n):
+    return await client.post(f"/api/projects/{state['project_ids'][n % len(state['project_ids'])]}/compliance_check")
+
+ENDPOINTS = {
+    "create": create_project,
+    "get": get_project,
+    "list": list_projects,
+    "compliance": compliance_check,
+}
+
+# --- Statistics ----------------------------------------------------------------
+
+def percentile(sorted_values, pct):
+    # Nearest-rank percentile
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+def summarize(endpoint, concurrency, latencies, statuses, errors, elapsed):
+    ok = sorted(latencies)
+    ms = lambda seconds: round(seconds * 1000.0, 2) if seconds is not None else None
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": len(latencies) + errors,
+        "ok": sum(count for status, count in statuses.items() if 200 <= int(status) < 400),
+        "errors": errors + sum(count for status, count in statuses.items() if int(status) >= 400),
+        "status_codes": statuses,
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": ms(percentile(ok, 50)),
+            "p95": ms(percentile(ok, 95)),
+            "p99": ms(percentile(ok, 99)),
+            "mean": ms(sum(ok) / len(ok)) if ok else None,
+            "max": ms(ok[-1]) if ok else None,
+        },
+    }
+
+# --- Load generation -----------------------------------------------------------
+
+async def run_level(base_url, endpoint, concurrency, duration, warmup, state, timeout):
+    # Closed loop: each of `concurrency` workers sends its next request as soon as
+    # the previous one finishes. Requests that start during warm-up are not recorded.
+    driver = ENDPOINTS[endpoint]
+    counter = itertools.count()
+    latencies, statuses, errors = [], {}, 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        started = time.monotonic()
+        measure_from = started + warmup
+        deadline = measure_from + duration
+
+        async def worker():
+            nonlocal errors
+            while time.monotonic() < deadline:
+                sent = time.monotonic()
+                try:
+                    response = await driver(client, state, next(counter))
+                    status = response.status_code
+                except httpx.HTTPError as e:
+                    status = None
+                    if sent >= measure_from:
+                        errors += 1
+                        print(f"  {endpoint}: {e!r}")
+                if sent < measure_from or status is None:
+                    continue
+                key = str(status)
+                statuses[key] = statuses.get(key, 0) + 1
+                if status < 400:
+                    latencies.append(time.monotonic() - sent)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.monotonic() - measure_from
+    return summarize(endpoint, concurrency, latencies, statuses, errors, elapsed)
+
+# --- Process management --------------------------------------------------------
+
+def start(args, env=None, log_path=None):
+    log = open(log_path, "w") if log_path else subprocess.DEVNULL
+    return subprocess.Popen([sys.executable, *args], cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+def wait_ready(url, process, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Process for {url} exited with code {process.returncode}")
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Timed out waiting for {url}")
+
+def git_commit():
+    try:
+        sha = subprocess.run(["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain"], cwd=BACKEND_DIR, capture_output=True, text=True).stdout.strip())
+        return {"sha": sha, "dirty": dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {"sha": None, "dirty": None}
+
+def profile_args(args, prefix, flag_prefix=""):
+    attr = prefix.replace("-", "_")
+    return [
+        f"--{flag_prefix}latency-ms", str(getattr(args, f"{attr}latency_ms")),
+        f"--{flag_prefix}jitter", str(getattr(args, f"{attr}jitter")),
+        f"--{flag_prefix}error-rate", str(getattr(args, f"{attr}error_rate")),
+        f"--{flag_prefix}error-status", str(getattr(args, f"{attr}error_status")),
+    ]
+
+async def fetch_project_ids(base_url, count):
+    async with httpx.AsyncClient(base_url=base_url, timeout=30.0) as client:
+        res = await client.get("/api/projects/list", params={"user_id": USER_ID, "limit": min(count, 100)})
+        res.raise_for_status()
+        return [p["id"] for p in res.json()["projects"]]
+
+def run(args):
+    endpoints = [e.strip() for e in args.endpoints.split(",") if e.strip()]
+    unknown = [e for e in endpoints if e not in ENDPOINTS]
+    if unknown:
+        sys.exit(f"Unknown endpoint(s): {', '.join(unknown)} (choose from {', '.join(ENDPOINTS)})")
+    levels = [int(c) for c in args.concurrency.split(",")]
+
+    workdir = tempfile.mkdtemp(prefix="pharmabrand-bench-")
+    openai_url = f"http://127.0.0.1:{args.openai_port}"
+    db_url = f"http://127.0.0.1:{args.db_port}"
+    app_url = f"http://127.0.0.1:{args.app_port}"
+    env = {
+        **os.environ,
+        "SUPABASE_URL": db_url,
+        "SUPABASE_SERVICE_ROLE_KEY": "bench-service-role-key",
+        "OPENAI_API_KEY": "bench",
+        "OPENAI_API_BASE": f"{openai_url}/v1",
+        "OPENAI_LIMITS": args.openai_limits or json.dumps(BENCH_OPENAI_LIMITS),
+        "LLM_CACHE_PATH": os.path.join(workdir, "llm_cache.sqlite3"),
+        "ASSET_ROOT": os.path.join(workdir, "assets"),
+        "ASSET_BASE_URL": f"{app_url}/assets",
+        "EXPORT_CACHE_DIR": os.path.join(workdir, "exports"),
+    }
+    processes = []
+    try:
+        processes.append(start(
+            ["-m", "bench.fake_openai", "--port", str(args.openai_port), "--stream-chunk-ms", str(args.stream_chunk_ms),
+             *profile_args(args, "chat-", "chat-"), *profile_args(args, "image-", "image-")],
+            log_path=os.path.join(workdir, "fake_openai.log"),
+        ))
+        wait_ready(f"{openai_url}/health", processes[-1])
+        processes.append(start(
+            ["-m", "bench.fake_postgrest", "--port", str(args.db_port), "--seed-projects", str(args.seed_projects),
+             "--seed-user-id", USER_ID, *profile_args(args, "db-")],
+            log_path=os.path.join(workdir, "fake_postgrest.log"),
+        ))
+        wait_ready(f"{db_url}/health", processes[-1])
+        processes.append(start(
+            ["-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(args.app_port), "--log-level", "warning",
+             "--workers", str(args.app_workers)],
+            env=env, log_path=os.path.join(workdir, "app.log"),
+        ))
+        wait_ready(f"{app_url}/api/cache/stats", processes[-1])
+
+        state = {"unique_payloads": not args.repeat_payloads, "project_ids": asyncio.run(fetch_project_ids(app_url, args.seed_projects))}
+        if not state["project_ids"] and {"get", "compliance"} & set(endpoints):
+            sys.exit("No seeded projects to read; use --seed-projects > 0")
+
+        results = []
+        for endpoint in endpoints:
+            for concurrency in levels:
+                print(f"{endpoint} @ concurrency {concurrency} ...", flush=True)
+                result = asyncio.run(run_level(app_url, endpoint, concurrency, args.duration, args.warmup, state, args.timeout))
+                latency = result["latency_ms"]
+                print(f"  {result['throughput_rps']} req/s, p50 {latency['p50']} ms, p95 {latency['p95']} ms, "
+                      f"p99 {latency['p99']} ms, errors {result['errors']}/{result['requests']}")
+                results.append(result)
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    report = {
+        "commit": git_commit(),
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        "results": results,
+    }
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"{stamp}-{(report['commit']['sha'] or 'nogit')[:10]}.json")
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output} (server logs in {workdir})")
+
+def compare(args):
+    # Prints per endpoint/concurrency deltas; exits 1 if any p95 regressed by more than --max-regression
+    with open(args.baseline) as f:
+        baseline = {(r["endpoint"], r["concurrency"]): r for r in json.load(f)["results"]}
+    with open(args.candidate) as f:
+        candidate = {(r["endpoint"], r["concurrency"]): r for r in json.load(f)["results"]}
+    regressed = False
+    print(f"{'endpoint':<12}{'conc':>5}{'rps':>20}{'p50 ms':>22}{'p95 ms':>22}{'p99 ms':>22}")
+    for key in sorted(set(baseline) & set(candidate)):
+        before, after = baseline[key], candidate[key]
+
+        def cell(b, a):
+            if b is None or a is None:
+                return f"{b} -> {a}"
+            change = (a - b) / b * 100 if b else 0.0
+            return f"{b:.1f} -> {a:.1f} ({change:+.0f}%)"
+
+        p95_before, p95_after = before["latency_ms"]["p95"], after["latency_ms"]["p95"]
+        if p95_before and p95_after and (p95_after - p95_before) / p95_before > args.max_regression:
+            regressed = True
+        print(f"{key[0]:<12}{key[1]:>5}{cell(before['throughput_rps'], after['throughput_rps']):>20}"
+              + "".join(f"{cell(before['latency_ms'][p], after['latency_ms'][p]):>22}" for p in ("p50", "p95", "p99")))
+    for key in sorted(set(baseline) ^ set(candidate)):
+        print(f"{key[0]:<12}{key[1]:>5}  only in {'baseline' if key in baseline else 'candidate'}")
+    sys.exit(1 if regressed else 0)
+
+def add_run_arguments(parser):
+    parser.add_argument("--endpoints", default="create,get,list,compliance")
+    parser.add_argument("--concurrency", default="1,8,32", help="Comma-separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=10.0, help="Measured seconds per endpoint and level")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Unmeasured seconds before each level")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request client timeout")
+    parser.add_argument("--seed-projects", type=int, default=1000)
+    parser.add_argument("--repeat-payloads", action="store_true", help="Send identical create payloads (exercises the LLM cache)")
+    parser.add_argument("--openai-limits", default=None, help="OPENAI_LIMITS JSON for the app (default: effectively unlimited)")
+    parser.add_argument("--app-port", type=int, default=5050)
+    parser.add_argument("--app-workers", type=int, default=1)
+    parser.add_argument("--openai-port", type=int, default=8101)
+    parser.add_argument("--db-port", type=int, default=8102)
+    parser.add_argument("--stream-chunk-ms", type=float, default=5.0)
+    parser.add_argument("--output", default=None, help="Result file (default: bench/results/<timestamp>-<commit>.json)")
+    add_profile_arguments(parser, "chat-", latency_ms=800.0, error_status=429)
+    add_profile_arguments(parser, "image-", latency_ms=4000.0, error_status=429)
+    add_profile_arguments(parser, "db-", latency_ms=10.0, error_status=503)
+
+def main():
+    argv = sys.argv[1:]
+    if argv and argv[0] == "compare":
+        parser = argparse.ArgumentParser(prog="python -m bench.run compare", description="Compare two benchmark result files")
+        parser.add_argument("baseline")
+        parser.add_argument("candidate")
+        parser.add_argument("--max-regression", type=float, default=0.15, help="Allowed relative p95 increase")
+        compare(parser.parse_args(argv[1:]))
+    else:
+        parser = argparse.ArgumentParser(prog="python -m bench.run", description="Benchmark the API against fake OpenAI and PostgREST servers")
+        add_run_arguments(parser)
+        run(parser.parse_args(argv[1:] if argv and argv[0] == "run" else argv))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# Local DGDA compliance pre-screen.
+#
+# All banned-claim rules are compiled into a single alternation regex (one pass over
+# each text, whichever rule matches is identified by its named group), and the
+# leaflet is checked for the mandatory sections. A report is "rejected" when any
+# error-severity rule fires; otherwise it is "undecided" and the LLM check decides.
+import re
+import unicodedata
+
+RULES_VERSION = "dgda-rules-v2"  # Bump whenever rules change so stored verdicts are re-evaluated
+
+# (rule_id, severity, message, patterns). English patterns are matched on word
+# boundaries; Bengali patterns are matched as plain substrings because vowel signs
+# are not word characters for the regex engine. Patterns and texts are both NFC-normalised,
+# so e.g. precomposed য় (U+09DF) and য + nukta (U+09AF U+09BC) match alike.
+BANNED_CLAIMS = [
+    ("superlative_claim", "error", "Superlative or comparative-superiority claims are not permitted.",
+     [r"best", r"most effective", r"number one", r"no\.?\s?1", r"safest", r"strongest", r"unmatched",
+      r"unbeatable", r"superior to all", r"world'?s leading"]),
+    ("cure_claim", "error", "Claims that the product cures a disease are not permitted.",
+     [r"cures?", r"cured", r"curing", r"eradicates?", r"heals? completely", r"permanent(?:ly)? (?:relief|solution)"]),
+    ("absolute_safety_claim", "error", "Absolute safety or efficacy guarantees are not permitted.",
+     [r"100\s?% (?:safe|effective|guaranteed)", r"completely safe", r"totally safe", r"no side[- ]effects?",
+      r"risk[- ]free", r"guaranteed(?: results?| relief)?", r"harmless"]),
+    ("miracle_claim", "error", "Miracle or magic claims are not permitted.",
+     [r"miracle", r"magic(?:al)?", r"wonder drug", r"instant(?:ly)? (?:relief|cure|results?)"]),
+    ("unqualified_endorsement", "warning", "Endorsement claims need a verifiable source.",
+     [r"doctors? recommend(?:ed)?", r"recommended by doctors", r"approved by (?:all|every)", r"clinically proven"]),
+]
+BANNED_CLAIMS_BN = [
+    ("superlative_claim", "error", "Superlative claims (Bengali) are not permitted.", ["সেরা", "সর্বশ্রেষ্ঠ", "এক নম্বর"]),
+    ("cure_claim", "error", "Cure claims (Bengali) are not permitted.", ["নিরাময়", "সম্পূর্ণ আরোগ্য", "রোগমুক্তি"]),
+    ("absolute_safety_claim", "error", "Absolute safety claims (Bengali) are not permitted.", ["পার্শ্বপ্রতিক্রিয়াহীন", "শতভাগ নিরাপদ", "১০০% নিরাপদ"]),
+    ("miracle_claim", "error", "Miracle claims (Bengali) are not permitted.", ["অলৌকিক", "জাদুকরী"]),
+]
+
+REQUIRED_LEAFLET_SECTIONS = ["Introduction", "Benefits", "Clinical References", "Patient Info (BN)", "Compliance"]
+
+def _nfc(text):
+    return unicodedata.normalize("NFC", text)
+
+def _compile(rule_sets, prefix):
+    parts, groups = [], {}
+    for index, (rule_id, severity, message, patterns) in enumerate(rule_sets):
+        group = f"{prefix}{index}"
+        groups[group] = (rule_id, severity, message)
+        parts.append(f"(?P<{group}>{'|'.join(_nfc(pattern) for pattern in patterns)})")
+    return parts, groups
+
+_en_parts, _en_groups = _compile(BANNED_CLAIMS, "en")
+_bn_parts, _bn_groups = _compile([(r, s, m, [re.escape(p) for p in ps]) for r, s, m, ps in BANNED_CLAIMS_BN], "bn")
+CLAIMS_RE = re.compile(r"\b(?:" + "|".join(_en_parts) + r")\b|" + "|".join(_bn_parts), re.IGNORECASE)
+_GROUPS = {**_en_groups, **_bn_groups}
+
+def _section_key(title):
+    return re.sub(r"[^a-z0-9]+", "", str(title).lower())
+
+def leaflet_section_titles(leaflet):
+    # Accepts {"sections": [{"title": ...}, ...]}, a list of sections, or a dict keyed by section title
+    if isinstance(leaflet, dict):
+        sections = leaflet.get("sections")
+        if sections is None:
+            return [key for key in leaflet.keys()]
+    else:
+        sections = leaflet
+    titles = []
+    for section in sections or []:
+        if isinstance(section, dict):
+            titles.append(section.get("title") or section.get("name") or "")
+        elif isinstance(section, str):
+            titles.append(section)
+    return titles
+
+def leaflet_text(leaflet):
+    # Flatten every string in the leaflet structure for claim scanning
+    if isinstance(leaflet, str):
+        return [leaflet]
+    if isinstance(leaflet, dict):
+        return [text for value in leaflet.values() for text in leaflet_text(value)]
+    if isinstance(leaflet, list):
+        return [text for value in leaflet for text in leaflet_text(value)]
+    return []
+
+def scan_claims(field, text):
+    findings = []
+    for match in CLAIMS_RE.finditer(_nfc(text or "")):
+        rule_id, severity, message = _GROUPS[match.lastgroup]
+        findings.append({"rule": rule_id, "severity": severity, "field": field, "message": message, "match": match.group(0)})
+    return findings
+
+def check_leaflet_sections(leaflet):
+    present = {_section_key(title) for title in leaflet_section_titles(leaflet)}
+    missing = [title for title in REQUIRED_LEAFLET_SECTIONS if _section_key(title) not in present]
+    # "Patient Info (BN)" is often titled just "Patient Info"; accept that spelling too
+    if "Patient Info (BN)" in missing and any(key.startswith("patientinfo") for key in present):
+        missing.remove("Patient Info (BN)")
+    return [
+        {"rule": "missing_leaflet_section", "severity": "error", "field": "leaflet_json",
+         "message": f"Mandatory leaflet section '{title}' is missing.", "match": None}
+        for title in missing
+    ]
+
+def evaluate(brand_name=None, slogan_en=None, slogan_bn=None, leaflet=None):
+    findings = []
+    findings += scan_claims("brand_name", brand_name)
+    findings += scan_claims("slogan_en", slogan_en)
+    findings += scan_claims("slogan_bn", slogan_bn)
+    for text in leaflet_text(leaflet):
+        findings += scan_claims("leaflet_json", text)
+    findings += check_leaflet_sections(leaflet)
+    verdict = "rejected" if any(f["severity"] == "error" for f in findings) else "undecided"
+    return {"verdict": verdict, "findings": findings, "rules_version": RULES_VERSION}
@@ -0,0 +1,240 @@
+# Compliance check for a project: local rules first, GPT-4o only for content the
+# rules can't decide. Used by POST /api/projects/{project_id}/compliance_check.
+import asyncio
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+import openai
+
+from ai.cache import normalize
+from ai.rate_limiter import openai_limiter, estimate_tokens
+from compliance.rules import evaluate, RULES_VERSION
+from database.db import supabase, execute
+from database.elements import pick
+from database.pagination import apply_keyset, page
+from database.project_cache import project_cache
+from metrics import timed
+
+COMPLIANCE_MODEL = "gpt-4o"
+COMPLIANCE_PROMPT_VERSION = "compliance-v1"  # Bump when the LLM prompt changes so stored verdicts are re-evaluated
+RECHECK_CONCURRENCY = int(os.getenv("COMPLIANCE_RECHECK_CONCURRENCY", "4"))
+RECHECK_PAGE_SIZE = 50  # Projects per candidate page, and per brand_elements query
+POSTGREST_MAX_ROWS = int(os.getenv("POSTGREST_MAX_ROWS", "1000"))  # Must not exceed the API's max-rows setting (Supabase default 1000)
+CONTENT_ELEMENT_TYPES = ["brand_name_suggestion", "slogan_suggestion", "leaflet_draft"]
+VERDICT_MEMO_SIZE = 2048
+
+# content_hash -> stored result, in front of the compliance_checks lookup
+_verdict_memo = OrderedDict()
+
+def extract_content(elements):
+    # The selected (otherwise newest) brand name, slogan and leaflet; see database/elements.py
+    slogan = pick(elements, "slogan_suggestion")
+    return {
+        "brand_name": pick(elements, "brand_name_suggestion").get("name", ""),
+        "slogan_en": slogan.get("en") or slogan.get("english") or "",
+        "slogan_bn": slogan.get("bn") or slogan.get("bengali") or "",
+        "leaflet": pick(elements, "leaflet_draft"),
+    }
+
+async def load_content(project_id):
+    res = await execute(
+        supabase.table("brand_elements").select("element_type, content, is_selected, created_at")
+        .eq("project_id", project_id)
+        .in_("element_type", CONTENT_ELEMENT_TYPES)
+        .order("created_at")
+    )
+    if not res.data:
+        return None
+    return extract_content(res.data)
+
+async def llm_verdict(content):
+    # Returns (status, fallback)
+    system_prompt = (
+        "You are a pharmaceutical regulatory compliance expert for Bangladesh DGDA. "
+        "Given the following brand name, slogan, and leaflet sections, check if the content is compliant with DGDA rules for pharmaceutical marketing. "
+        "Respond ONLY with one word: 'approved' or 'rejected'."
+    )
+    user_prompt = f"Brand: {content['brand_name']}\nSlogan: {content['slogan_en']}\nLeaflet: {content['leaflet']}"
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
+    try:
+        response = await openai_limiter.call(
+            openai.ChatCompletion.acreate,
+            model=COMPLIANCE_MODEL,
+            estimated_tokens=estimate_tokens(messages, 10),
+            messages=messages,
+            temperature=0.0,
+            max_tokens=10
+        )
+        result = response.choices[0].message.content.strip().lower()
+    except Exception as e:
+        openai_limiter.record_fallback("compliance_check", e)
+        return "pending", True # The LLM was not reachable; 'pending' is a placeholder, not a verdict
+    if "approved" in result:
+        return "approved", False
+    if "rejected" in result:
+        return "rejected", False
+    return "pending", False
+
+def content_hash(content):
+    # Stable across key order / whitespace / case, and tied to the rule + prompt versions
+    normalized = {
+        "brand_name": normalize(content.get("brand_name")),
+        "slogan_en": normalize(content.get("slogan_en")),
+        "slogan_bn": normalize(content.get("slogan_bn")),
+        "leaflet": content.get("leaflet") or {},
+        "rules_version": RULES_VERSION,
+        "prompt_version": COMPLIANCE_PROMPT_VERSION,
+    }
+    raw = json.dumps(normalized, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def _remember(digest, result):
+    _verdict_memo[digest] = result
+    _verdict_memo.move_to_end(digest)
+    while len(_verdict_memo) > VERDICT_MEMO_SIZE:
+        _verdict_memo.popitem(last=False)
+
+async def _stored_verdict(digest):
+    if digest in _verdict_memo:
+        _verdict_memo.move_to_end(digest)
+        return _verdict_memo[digest]
+    res = await execute(
+        supabase.table("compliance_checks").select("status, decided_by, findings")
+        .eq("content_hash", digest).eq("stale", False).in_("status", ["approved", "rejected"])
+        .order("created_at", desc=True).limit(1)
+    )
+    if not res.data:
+        return None
+    row = res.data[0]
+    result = {"status": row["status"], "decided_by": row["decided_by"], "findings": row.get("findings") or [], "fallback": False}
+    _remember(digest, result)
+    return result
+
+async def invalidate(project_id):
+    # Called after any edit of the project's brand name, slogan or leaflet
+    res = await execute(
+        supabase.table("compliance_checks").update({"stale": True})
+        .eq("project_id", project_id).eq("stale", False)
+    )
+    for row in res.data or []:
+        _verdict_memo.pop(row.get("content_hash"), None)
+
+async def run_compliance_check(project_id, content, use_stored=True):
+    digest = content_hash(content)
+    stored = await _stored_verdict(digest) if use_stored else None
+    if stored is not None:
+        result, cached = stored, True
+    else:
+        with timed("compliance_rules"):
+            report = evaluate(content["brand_name"], content["slogan_en"], content["slogan_bn"], content["leaflet"])
+        fallback = False
+        if report["verdict"] == "rejected":
+            status, decided_by = "rejected", "rules"
+        else:
+            with timed("compliance_llm"):
+                status, fallback = await llm_verdict(content)
+            decided_by = "llm"
+        result = {"status": status, "decided_by": decided_by, "findings": report["findings"], "fallback": fallback}
+        cached = False
+    # A reused verdict is still recorded against this project, so its latest check
+    # (shown by GET /api/projects/{id}, compared by recheck_stale) is current.
+    record = {
+        "project_id": project_id,
+        "status": result["status"],
+        "decided_by": result["decided_by"],
+        "findings": result["findings"],
+        "rules_version": RULES_VERSION,
+        "content_hash": digest,
+    }
+    res = await execute(supabase.table("compliance_checks").insert(record))
+    if not res.data:
+        raise RuntimeError(f"Failed to store compliance result: {getattr(res, 'error', None)}")
+    project_cache.invalidate(project_id)
+    if not cached and result["status"] in ("approved", "rejected"): # 'pending' is not a verdict and is never reused
+        _remember(digest, result)
+    return {**result, "content_hash": digest, "cached": cached}
+
+async def _checked_projects(limit):
+    # Pages of [(project_id, latest compliance check)] for up to `limit` previously
+    # checked projects, newest project first. Keyset-paged over projects, so projects
+    # whose last check is old are reached too.
+    cursor, found = None, 0
+    while found < limit:
+        query = (
+            supabase.table("projects").select("id, created_at, compliance_checks(content_hash, stale, created_at)")
+            .order("created_at", desc=True, foreign_table="compliance_checks")
+            .limit(1, foreign_table="compliance_checks")
+        )
+        res = await execute(apply_keyset(query, cursor, RECHECK_PAGE_SIZE))
+        rows, cursor = page(res.data, RECHECK_PAGE_SIZE)
+        batch = [(row["id"], row["compliance_checks"][0]) for row in rows if row.get("compliance_checks")][:limit - found]
+        found += len(batch)
+        if batch:
+            yield batch
+        if cursor is None:
+            return
+
+async def _complete_elements(project_ids):
+    # project_id -> content elements, only for projects whose rows all came back.
+    # PostgREST cuts responses off at max-rows; rows are ordered by project so a full
+    # response can only have truncated its last project, which is fetched again
+    # (with any projects not reached yet) instead of being judged on partial content.
+    complete, remaining = {}, list(project_ids)
+    while remaining:
+        res = await execute(
+            supabase.table("brand_elements").select("project_id, element_type, content, is_selected, created_at")
+            .in_("project_id", remaining)
+            .in_("element_type", CONTENT_ELEMENT_TYPES)
+            .order("project_id").order("created_at")
+            .limit(POSTGREST_MAX_ROWS)
+        )
+        rows = res.data or []
+        by_project = {}
+        for el in rows:
+            by_project.setdefault(el["project_id"], []).append(el)
+        if len(rows) < POSTGREST_MAX_ROWS:
+            complete.update(by_project)
+            break
+        last = rows[-1]["project_id"]
+        del by_project[last]
+        if not by_project:
+            print(f"Skipping compliance recheck of project {last}: over {POSTGREST_MAX_ROWS} content elements")
+            remaining.remove(last)
+            continue
+        complete.update(by_project)
+        remaining = [project_id for project_id in remaining if project_id not in by_project]
+    return complete
+
+async def recheck_stale(limit=500):
+    # Re-run compliance only for previously checked projects whose content changed
+    # since their latest stored verdict (or whose verdict was invalidated by an edit).
+    semaphore = asyncio.Semaphore(max(1, RECHECK_CONCURRENCY))
+
+    async def recheck(project_id, content):
+        async with semaphore:
+            try:
+                return {"project_id": project_id, **await run_compliance_check(project_id, content)}
+            except Exception as e:
+                return {"project_id": project_id, "error": str(e)}
+
+    unchanged, skipped, results = 0, 0, []
+    async for batch in _checked_projects(limit):
+        elements_by_project = await _complete_elements([project_id for project_id, _ in batch])
+        todo = []
+        for project_id, check in batch:
+            elements = elements_by_project.get(project_id)
+            if not elements: # No content, or it could not be loaded completely
+                skipped += 1
+                continue
+            content = extract_content(elements)
+            if check.get("stale") or check.get("content_hash") != content_hash(content):
+                todo.append((project_id, content))
+            else:
+                unchanged += 1
+        results += await asyncio.gather(*(recheck(project_id, content) for project_id, content in todo))
+    return {"checked": len(results), "unchanged": unchanged, "skipped": skipped, "results": results}
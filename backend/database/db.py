@@ -0,0 +1,27 @@
+from supabase import create_client, Client
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+import asyncio
+import os
+
+from metrics import timed_db
+
+load_dotenv()
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+
+# The supabase-py client is synchronous (blocking HTTP under the hood). All DB calls
+# from async endpoints go through this bounded pool so they never stall the event
+# loop, and so a burst of requests can't open an unbounded number of connections.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "16"))
+_db_executor = ThreadPoolExecutor(max_workers=DB_POOL_SIZE, thread_name_prefix="supabase")
+
+async def run_in_db_pool(fn, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_db_executor, fn, *args)
+
+async def execute(query):
+    # Usage: res = await execute(supabase.table("projects").insert(row))
+    with timed_db(query): # Latency / error metrics per table and method (see metrics.py)
+        return await run_in_db_pool(query.execute)
@@ -0,0 +1,22 @@
+# Choosing among a project's brand_elements rows of one type. Regeneration and
+# edits append rows rather than replacing them, so the current row is the one the
+# user selected or, failing that, the newest. Used by the project view, the
+# compliance check and the PDF export so they always agree on the content.
+
+def by_preference(elements, element_type):
+    # Rows of element_type, best first: selected rows, then newest first
+    rows = [el for el in elements if el.get("element_type") == element_type]
+    rows.reverse()  # Among equal (or missing) timestamps, later rows are newer
+    rows.sort(key=lambda el: el.get("created_at") or "", reverse=True)
+    rows.sort(key=lambda el: not el.get("is_selected"))
+    return rows
+
+def chosen(elements, element_type):
+    # The selected rows if the user selected any, otherwise all of them; best first
+    rows = by_preference(elements, element_type)
+    return [el for el in rows if el.get("is_selected")] or rows
+
+def pick(elements, element_type):
+    # Content of the current row of element_type, or {} when there is none
+    rows = by_preference(elements, element_type)
+    return (rows[0].get("content") or {}) if rows else {}
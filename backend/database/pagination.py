@@ -0,0 +1,44 @@
+import base64
+import json
+
+# Keyset (cursor) pagination over (created_at DESC, id DESC). The cursor is the
+# sort key of the last row on a page, so fetching page N costs the same index
+# range scan as page 1 instead of an OFFSET that reads and discards N pages.
+
+class InvalidCursor(ValueError):
+    pass
+
+def encode_cursor(row):
+    raw = json.dumps([row["created_at"], str(row["id"])], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {e}")
+    if not isinstance(created_at, str) or not isinstance(row_id, str):
+        raise InvalidCursor("Invalid cursor")
+    return created_at, row_id
+
+def _quote(value):
+    # PostgREST logic-tree values containing ',', ':' or '+' (timestamps) must be quoted
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+def apply_keyset(query, cursor, limit):
+    # Orders newest first and, given the previous page's cursor, continues after it.
+    # Fetches one extra row so the caller can tell whether another page exists.
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        ts, rid = _quote(created_at), _quote(row_id)
+        query = query.or_(f"created_at.lt.{ts},and(created_at.eq.{ts},id.lt.{rid})")
+    return query.order("created_at", desc=True).order("id", desc=True).limit(limit + 1)
+
+def page(rows, limit):
+    # Returns (rows for this page, next_cursor or None)
+    rows = rows or []
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1])
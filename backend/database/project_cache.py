@@ -0,0 +1,79 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Read-through cache of the assembled GET /api/projects/{project_id} response.
+# Every write path that changes a project or its brand elements calls
+# invalidate(project_id); the TTL only bounds staleness for writes made outside
+# this process (other workers, direct SQL).
+
+PROJECT_CACHE_MAX_ENTRIES = int(os.getenv("PROJECT_CACHE_MAX_ENTRIES", "1024"))
+PROJECT_CACHE_TTL_SECONDS = float(os.getenv("PROJECT_CACHE_TTL_SECONDS", "60"))
+
+def etag_for(body):
+    raw = json.dumps(body, sort_keys=True, ensure_ascii=False, default=str)
+    return f'W/"{hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]}"'
+
+def etag_matches(if_none_match, etag):
+    # Weak comparison, as If-None-Match requires
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or any(tag.removeprefix("W/") == etag.removeprefix("W/") for tag in candidates)
+
+class ProjectReadCache:
+    def __init__(self, max_entries=PROJECT_CACHE_MAX_ENTRIES, ttl_seconds=PROJECT_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # project_id -> (expires_at, etag, body)
+        self._versions = {}  # project_id -> invalidation count, guards against racing reads
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def get(self, project_id):
+        # Returns (etag, body) or None
+        key = str(project_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.counters["hits"] += 1
+                return entry[1], entry[2]
+            self._entries.pop(key, None)
+            self.counters["misses"] += 1
+            return None
+
+    def version(self, project_id):
+        # Read before loading from the database and pass to set()
+        with self._lock:
+            return self._versions.get(str(project_id), 0)
+
+    def set(self, project_id, body, version):
+        # Stores body unless the project was invalidated while it was being loaded;
+        # returns its ETag either way.
+        key = str(project_id)
+        etag = etag_for(body)
+        with self._lock:
+            if self._versions.get(key, 0) == version:
+                self._entries[key] = (time.monotonic() + self.ttl_seconds, etag, body)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return etag
+
+    def invalidate(self, project_id):
+        key = str(project_id)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._versions[key] = self._versions.get(key, 0) + 1
+            self.counters["invalidations"] += 1
+
+    def stats(self):
+        with self._lock:
+            return {**self.counters, "entries": len(self._entries)}
+
+# Process-wide instance; write paths call project_cache.invalidate(project_id)
+project_cache = ProjectReadCache()
@@ -52,11 +52,47 @@ CREATE TABLE assets (
     updated_at TIMESTAMPTZ DEFAULT NOW()
 );
 
+-- Compliance Checks Table
+-- One row per compliance run. `decided_by` is 'rules' when the local DGDA rule engine
+-- rejected the content outright, or 'llm' when GPT-4o gave the verdict.
+CREATE TABLE compliance_checks (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    project_id UUID REFERENCES projects(id) ON DELETE CASCADE,
+    status VARCHAR(50) NOT NULL, -- approved, rejected, pending
+    decided_by VARCHAR(20) NOT NULL, -- rules, llm
+    findings JSONB, -- Per-rule findings, e.g. [{"rule": "cure_claim", "severity": "error", "field": "slogan_en", ...}]
+    rules_version VARCHAR(50),
+    content_hash CHAR(64), -- sha256 of the normalized content + rules/prompt version; identical content reuses the verdict
+    stale BOOLEAN DEFAULT FALSE, -- Set when the project's brand name, slogan or leaflet is edited
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Generation Jobs Table
+-- Background project generation (POST /api/projects/create?mode=job).
+-- `stage` is the last completed pipeline stage and `outputs` holds the results of
+-- every completed stage, so workers can resume a job after a restart.
+CREATE TABLE generation_jobs (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    project_id UUID REFERENCES projects(id) ON DELETE CASCADE,
+    request JSONB NOT NULL, -- The CreateProjectRequest payload
+    status VARCHAR(50) DEFAULT 'queued', -- queued, running, completed, failed
+    stage VARCHAR(50), -- Last completed stage: insights, brand_package, persist
+    progress JSONB, -- Per-stage status and timestamps, e.g. {"insights": {"status": "completed", ...}}
+    outputs JSONB, -- Checkpointed stage outputs, e.g. {"insights": {...}, "brand_package": {...}}
+    error TEXT,
+    attempts INTEGER DEFAULT 0, -- Incremented by each claim; workers fence their writes on it
+    lease_expires_at TIMESTAMPTZ, -- While running: renewed by the claiming worker; once past, the job may be reclaimed
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
 -- Enable Row Level Security (RLS) - IMPORTANT for multi-tenant SaaS
 ALTER TABLE users ENABLE ROW LEVEL SECURITY;
 ALTER TABLE projects ENABLE ROW LEVEL SECURITY;
 ALTER TABLE brand_elements ENABLE ROW LEVEL SECURITY;
 ALTER TABLE assets ENABLE ROW LEVEL SECURITY;
+ALTER TABLE generation_jobs ENABLE ROW LEVEL SECURITY;
+ALTER TABLE compliance_checks ENABLE ROW LEVEL SECURITY;
 
 -- Policies for RLS (Example: Users can only see their own data)
 CREATE POLICY "Allow individual user access" ON users
@@ -73,12 +109,82 @@ CREATE POLICY "Allow individual user brand_elements access" ON brand_elements
 CREATE POLICY "Allow individual user assets access" ON assets
     FOR ALL USING (EXISTS (SELECT 1 FROM projects WHERE projects.id = project_id AND projects.user_id = auth.uid()));
 
+CREATE POLICY "Allow individual user compliance_checks access" ON compliance_checks
+    FOR SELECT USING (EXISTS (SELECT 1 FROM projects WHERE projects.id = project_id AND projects.user_id = auth.uid()));
+
+CREATE POLICY "Allow individual user generation_jobs access" ON generation_jobs
+    FOR SELECT USING (EXISTS (SELECT 1 FROM projects WHERE projects.id = project_id AND projects.user_id = auth.uid()));
+
 -- Indexes for performance
-CREATE INDEX idx_projects_user_id ON projects(user_id);
+-- Dashboard list (keyset pagination on created_at, id); each also serves plain user_id lookups
+CREATE INDEX idx_projects_user_created ON projects(user_id, created_at DESC, id DESC);
+CREATE INDEX idx_projects_user_status_created ON projects(user_id, status, created_at DESC, id DESC);
+CREATE INDEX idx_projects_user_area_created ON projects(user_id, therapeutic_area, created_at DESC, id DESC);
+CREATE INDEX idx_projects_created ON projects(created_at DESC, id DESC); -- Unfiltered (admin) listing
 CREATE INDEX idx_brand_elements_project_id ON brand_elements(project_id);
 CREATE INDEX idx_brand_elements_type ON brand_elements(element_type);
 CREATE INDEX idx_assets_project_id ON assets(project_id);
 CREATE INDEX idx_assets_type ON assets(asset_type);
+CREATE INDEX idx_compliance_checks_project_id ON compliance_checks(project_id, created_at DESC);
+CREATE INDEX idx_compliance_checks_content_hash ON compliance_checks(content_hash, created_at DESC) WHERE NOT stale;
+CREATE INDEX idx_generation_jobs_project_id ON generation_jobs(project_id);
+CREATE INDEX idx_generation_jobs_unfinished ON generation_jobs(created_at) WHERE status IN ('queued', 'running'); -- Periodic resume scan
+
+-- Functions
+-- Projects and their brand elements are written in one transaction (one RPC round
+-- trip): either every row lands or none does, so a failed element insert can no
+-- longer leave an orphaned project. Used by pipeline.persist_projects().
+-- A project with an "id" already exists (a generation job's persist stage): its
+-- status is updated and its brand elements are replaced, so re-running the stage
+-- after a restart stores one set of elements.
+--   p_projects: [{"project": {<projects columns>}, "elements": [{"element_type": ..., "content": ...}, ...]}, ...]
+--   returns:    [{<projects row>, "brand_elements": [<brand_elements rows>]}, ...] in input order
+CREATE OR REPLACE FUNCTION create_projects_with_elements(p_projects JSONB)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    item JSONB;
+    new_project projects;
+    stored JSONB;
+    created JSONB := '[]'::JSONB;
+BEGIN
+    FOR item IN SELECT value FROM jsonb_array_elements(p_projects) WITH ORDINALITY ORDER BY ordinality LOOP
+        IF item->'project' ? 'id' THEN
+            UPDATE projects
+            SET status = COALESCE(item->'project'->>'status', status), updated_at = NOW()
+            WHERE id = (item->'project'->>'id')::UUID
+            RETURNING * INTO new_project;
+            IF NOT FOUND THEN
+                RAISE EXCEPTION 'Project % does not exist', item->'project'->>'id';
+            END IF;
+            DELETE FROM brand_elements WHERE project_id = new_project.id;
+        ELSE
+            INSERT INTO projects (user_id, project_name, molecule_names, therapeutic_area, key_differentiating_benefits, status)
+            VALUES (
+                (item->'project'->>'user_id')::UUID,
+                item->'project'->>'project_name',
+                item->'project'->>'molecule_names',
+                item->'project'->>'therapeutic_area',
+                item->'project'->>'key_differentiating_benefits',
+                COALESCE(item->'project'->>'status', 'draft')
+            )
+            RETURNING * INTO new_project;
+        END IF;
+
+        WITH inserted AS (
+            INSERT INTO brand_elements (project_id, element_type, content)
+            SELECT new_project.id, element->>'element_type', element->'content'
+            FROM jsonb_array_elements(COALESCE(item->'elements', '[]'::JSONB)) AS element
+            RETURNING *
+        )
+        SELECT COALESCE(jsonb_agg(to_jsonb(inserted)), '[]'::JSONB) INTO stored FROM inserted;
+
+        created := created || jsonb_build_array(to_jsonb(new_project) || jsonb_build_object('brand_elements', stored));
+    END LOOP;
+    RETURN created;
+END;
+$$;
 
 -- Comments for integration points:
 -- - `users.id` will be linked to Supabase Auth users (auth.uid()).
@@ -86,7 +192,8 @@ CREATE INDEX idx_assets_type ON assets(asset_type);
 -- - `brand_elements.content` is JSONB to allow flexibility. Consider validating its structure based on `element_type` in application logic.
 -- - `assets.storage_path` will store URLs to files in Supabase Storage. For DALL-E, this might initially be the temporary URL from OpenAI.
 -- - Vector search capabilities (pgvector) would typically involve another table or extending existing ones, e.g., for embedding document chunks related to market data or clinical trials. This schema focuses on core project data.
---   A separate `knowledge_base_embeddings` table might look like:
+--   For now the knowledge base is a local NumPy index (backend/knowledge/, filled by `python -m knowledge.ingest`).
+--   Moving it into Postgres would mean a separate `knowledge_base_embeddings` table, e.g.:
 --   CREATE TABLE knowledge_base_embeddings (
 --       id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
 --       document_source VARCHAR(255), -- e.g., 'EMPA-REG_summary.pdf', 'Bangladesh_pharma_report_2023.docx'
@@ -0,0 +1,184 @@
+# Leaflet PDF export.
+#
+# The stored leaflet_draft JSON, the chosen brand name, slogans (EN + BN), colour
+# palette and logo are rendered to HTML and then to PDF with WeasyPrint, whose
+# HarfBuzz text shaping renders Bengali conjuncts correctly. Rendered files are
+# cached on disk under a hash of their inputs, so re-exporting an unchanged leaflet
+# is just a file read. Rendering runs in a process pool (it is CPU-bound), which
+# also lets a whole portfolio render in parallel.
+import asyncio
+import hashlib
+import html
+import json
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from assets.storage import storage
+from database.db import supabase, execute
+from database.elements import chosen
+from metrics import timed
+
+TEMPLATE_VERSION = "leaflet-pdf-v1"  # Bump when the template changes so cached PDFs are re-rendered
+EXPORT_CACHE_DIR = os.getenv("EXPORT_CACHE_DIR", os.path.join(os.path.dirname(__file__), "..", ".cache", "exports"))
+EXPORT_PROCESSES = int(os.getenv("EXPORT_PROCESSES", str(max(1, (os.cpu_count() or 2) - 1))))
+# Path to a Bengali-capable font (e.g. NotoSansBengali-Regular.ttf). Without it the
+# system fontconfig fallback is used, which must have a Bengali font installed.
+LEAFLET_BENGALI_FONT = os.getenv("LEAFLET_BENGALI_FONT")
+
+_executor = None
+_rendering = {}  # render key -> in-flight render future, so concurrent exports render once
+
+def _pool():
+    global _executor
+    if _executor is None:
+        # spawn, not fork: the API process has live threads (to_thread workers, HTTP
+        # clients) whose locks a forked child would inherit in whatever state they were in
+        _executor = ProcessPoolExecutor(max_workers=EXPORT_PROCESSES, mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+def _pick(elements, element_type):
+    # Contents of the selected rows (otherwise all rows), current one first; see database/elements.py
+    return [el.get("content") or {} for el in chosen(elements, element_type)]
+
+def build_render_context(project, elements, logo_src=None):
+    brand_names = _pick(elements, "brand_name_suggestion")
+    logos = [logo for logo in _pick(elements, "logo_concept") if logo.get("url") and not logo.get("fallback")]
+    if logos and not logo_src and logos[0].get("sha256"):
+        # Ingested logo: render from the local file instead of fetching over HTTP
+        logo_src = "file://" + storage.path(f"logos/{logos[0]['sha256']}.png")
+    palette = (_pick(elements, "insight_color_palette") or [None])[0]
+    if isinstance(palette, dict): # {"primary": "#...", "secondary": "#...", "reasoning": "..."}
+        palette = [{"name": k, "hex": v} for k, v in palette.items() if isinstance(v, str) and v.startswith("#")]
+    return {
+        "project_name": project.get("project_name") or project.get("molecule_names") or "",
+        "molecule_names": project.get("molecule_names") or "",
+        "therapeutic_area": project.get("therapeutic_area") or "",
+        "brand_name": (brand_names or [{}])[0].get("name", ""),
+        "slogans": [
+            {"en": s.get("en") or s.get("english") or "", "bn": s.get("bn") or s.get("bengali") or ""}
+            for s in _pick(elements, "slogan_suggestion")
+        ],
+        "palette": [c for c in palette or [] if isinstance(c, dict) and c.get("hex")],
+        "leaflet": (_pick(elements, "leaflet_draft") or [{}])[0],
+        "logo_src": logo_src or (logos[0]["url"] if logos else None),
+    }
+
+def render_key(context):
+    raw = json.dumps({"context": context, "template": TEMPLATE_VERSION}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def _sections(leaflet):
+    if isinstance(leaflet, dict) and isinstance(leaflet.get("sections"), list):
+        return [(s.get("title", ""), s.get("content") or s.get("text") or "") for s in leaflet["sections"] if isinstance(s, dict)]
+    if isinstance(leaflet, dict):
+        return [(k, v) for k, v in leaflet.items()]
+    return []
+
+def _text(value):
+    if isinstance(value, (list, tuple)):
+        return "<ul>" + "".join(f"<li>{_text(v)}</li>" for v in value) + "</ul>"
+    if isinstance(value, dict):
+        return "".join(f"<p><b>{html.escape(str(k))}:</b> {_text(v)}</p>" for k, v in value.items())
+    return html.escape(str(value)).replace("\n", "<br>")
+
+def render_html(context):
+    esc = html.escape
+    primary = context["palette"][0]["hex"] if context["palette"] else "#1f4e79"
+    font_face = ""
+    if LEAFLET_BENGALI_FONT:
+        font_face = f"@font-face {{ font-family: 'Leaflet Bengali'; src: url('file://{esc(os.path.abspath(LEAFLET_BENGALI_FONT))}'); }}"
+    swatches = "".join(
+        f"<span class='swatch' style='background:{esc(c['hex'])}'>{esc(c.get('name', ''))}</span>" for c in context["palette"]
+    )
+    slogans = "".join(
+        f"<p class='slogan'>{esc(s['en'])}</p><p class='slogan bn' lang='bn'>{esc(s['bn'])}</p>" for s in context["slogans"]
+    )
+    sections = "".join(
+        f"<section><h2>{esc(str(title))}</h2><div lang='bn'>{_text(body)}</div></section>" for title, body in _sections(context["leaflet"])
+    )
+    logo = f"<img class='logo' src='{esc(context['logo_src'])}'>" if context["logo_src"] else ""
+    return f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><style>
+{font_face}
+@page {{ size: A4; margin: 18mm; }}
+body {{ font-family: 'Noto Sans', 'Leaflet Bengali', 'Noto Sans Bengali', sans-serif; font-size: 10.5pt; color: #222; }}
+[lang=bn], .bn {{ font-family: 'Leaflet Bengali', 'Noto Sans Bengali', 'Noto Serif Bengali', sans-serif; }}
+header {{ border-bottom: 3px solid {esc(primary)}; padding-bottom: 8px; margin-bottom: 12px; }}
+h1 {{ color: {esc(primary)}; margin: 0; font-size: 24pt; }}
+h2 {{ color: {esc(primary)}; font-size: 13pt; margin: 14px 0 4px; }}
+.logo {{ float: right; width: 32mm; height: 32mm; object-fit: contain; }}
+.meta {{ color: #555; margin: 2px 0; }}
+.slogan {{ font-size: 13pt; font-style: italic; margin: 4px 0; }}
+.swatch {{ display: inline-block; color: #fff; padding: 2px 8px; margin-right: 6px; border-radius: 3px; font-size: 9pt; }}
+</style></head><body>
+<header>{logo}<h1>{esc(context['brand_name'] or context['project_name'])}</h1>
+<p class="meta">{esc(context['molecule_names'])} &middot; {esc(context['therapeutic_area'])}</p>
+{slogans}<div>{swatches}</div></header>
+{sections}
+</body></html>"""
+
+def render_leaflet_pdf(context, out_path):
+    # Runs in a worker process. Writes to a temp file first so readers never see a partial
+    # PDF; the temp name is unique per render, as two requests may render the same file.
+    from weasyprint import HTML # Imported in the worker only; heavy native dependency
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(out_path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            HTML(string=render_html(context), base_url=os.path.dirname(out_path)).write_pdf(f)
+        os.replace(tmp_path, out_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return out_path
+
+async def _load(project_id):
+    project_res = await execute(supabase.table("projects").select("*").eq("id", project_id).single())
+    if not project_res.data:
+        return None, []
+    elements_res = await execute(supabase.table("brand_elements").select("element_type, content, is_selected, created_at").eq("project_id", project_id).order("created_at"))
+    return project_res.data, elements_res.data or []
+
+async def export_pdf(project_id):
+    # Returns (path, cached) or None if the project doesn't exist
+    project, elements = await _load(project_id)
+    if project is None:
+        return None
+    context = build_render_context(project, elements)
+    key = render_key(context)
+    os.makedirs(EXPORT_CACHE_DIR, exist_ok=True)
+    path = os.path.abspath(os.path.join(EXPORT_CACHE_DIR, f"{key}.pdf"))
+    if os.path.exists(path):
+        return path, True
+    if key in _rendering:
+        await asyncio.shield(_rendering[key])
+        return path, True
+    loop = asyncio.get_running_loop()
+    _rendering[key] = loop.run_in_executor(_pool(), render_leaflet_pdf, context, path)
+    try:
+        with timed("pdf_render"):
+            await _rendering[key]
+    finally:
+        _rendering.pop(key, None)
+    await execute(supabase.table("assets").insert({
+        "project_id": project_id,
+        "asset_type": "leaflet_pdf",
+        "file_name": f"{context['brand_name'] or 'leaflet'}.pdf",
+        "storage_path": path,
+        "metadata": {"render_key": key, "template_version": TEMPLATE_VERSION},
+    }))
+    return path, False
+
+async def export_portfolio(project_ids):
+    # Renders every project's leaflet concurrently; the process pool bounds parallelism
+    async def one(project_id):
+        try:
+            exported = await export_pdf(project_id)
+        except Exception as e:
+            print(f"PDF export failed for project {project_id}: {e}")
+            return {"project_id": project_id, "status": "error", "detail": str(e)}
+        if exported is None:
+            return {"project_id": project_id, "status": "error", "detail": "Project not found"}
+        return {"project_id": project_id, "status": "ok", "cached": exported[1], "url": f"/api/projects/{project_id}/export/pdf"}
+    return await asyncio.gather(*(one(project_id) for project_id in project_ids))
@@ -0,0 +1,129 @@
+# Single-flight coalescing and short-lived idempotency records for project creation
+# (POST /api/projects/create and /api/projects/create/stream).
+#
+# Requests are keyed on the client's Idempotency-Key header or, without one, on the
+# normalised payload. The first request for a key starts the generation as its own
+# task; identical requests that arrive while it runs wait for that task instead of
+# starting another pipeline, and get the same result. A successful result is kept
+# for a short while so a retry returns the existing project rather than generating
+# a new one. Failures are not kept: retrying after an error runs again.
+#
+# Records live in this process only, like the project read cache: duplicates that
+# land on different workers are not coalesced.
+import asyncio
+import os
+import time
+from collections import OrderedDict
+
+from ai.cache import make_key
+import metrics
+
+IDEMPOTENCY_KEY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_KEY_TTL_SECONDS", "600"))  # Requests with an Idempotency-Key
+IDEMPOTENCY_PAYLOAD_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_PAYLOAD_TTL_SECONDS", "30"))  # Without: double-clicks and quick retries only
+IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "4096"))
+
+class IdempotencyConflict(Exception):
+    pass
+
+def request_key(user_id, route, payload, idempotency_key=None):
+    # (key, payload fingerprint, seconds to keep a successful result)
+    fingerprint = make_key("create_payload", **payload.dict())
+    if idempotency_key:
+        return make_key("idempotency_key", user_id=user_id, route=route, key=idempotency_key), fingerprint, IDEMPOTENCY_KEY_TTL_SECONDS
+    return make_key("idempotency_payload", user_id=user_id, route=route, payload=fingerprint), fingerprint, IDEMPOTENCY_PAYLOAD_TTL_SECONDS
+
+class _Flight:
+    def __init__(self, fingerprint):
+        self.fingerprint = fingerprint
+        self.task = None
+        self.expires_at = None  # Set once the task has succeeded
+        self.events = []  # Streamed flights: everything yielded so far
+        self.changed = asyncio.Event()  # Replaced after each event; set when events grows or the task ends
+
+    def notify(self):
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+class IdempotencyStore:
+    def __init__(self, max_entries=IDEMPOTENCY_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._flights = OrderedDict()  # key -> _Flight, running or finished and unexpired
+
+    def _lookup(self, key, fingerprint):
+        flight = self._flights.get(key)
+        if flight is not None and flight.expires_at is not None and flight.expires_at <= time.monotonic():
+            del self._flights[key]
+            flight = None
+        if flight is None:
+            return None
+        if flight.fingerprint != fingerprint:
+            metrics.IDEMPOTENT_REQUESTS.labels("conflict").inc()
+            raise IdempotencyConflict("Idempotency-Key was already used for a different request.")
+        metrics.IDEMPOTENT_REQUESTS.labels("replayed" if flight.task.done() else "coalesced").inc()
+        return flight
+
+    def _start(self, key, fingerprint, ttl_seconds, work, failed=None):
+        # work(flight) -> coroutine. It runs as its own task, not awaited by any one
+        # request, so a client disconnecting doesn't cancel the generation the other
+        # requests are waiting for.
+        flight = _Flight(fingerprint)
+        flight.task = asyncio.ensure_future(work(flight))
+
+        def finished(task):
+            if task.cancelled() or task.exception() is not None or (failed and failed(flight.events)):
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            else:
+                flight.expires_at = time.monotonic() + ttl_seconds
+            flight.notify()
+
+        flight.task.add_done_callback(finished)
+        self._flights[key] = flight
+        self._evict()
+        metrics.IDEMPOTENT_REQUESTS.labels("started").inc()
+        return flight
+
+    def _evict(self):
+        # Oldest finished records first; running flights are never dropped
+        now = time.monotonic()
+        for key in [k for k, f in self._flights.items() if f.expires_at is not None and f.expires_at <= now]:
+            del self._flights[key]
+        for key in [k for k, f in self._flights.items() if f.expires_at is not None][:max(0, len(self._flights) - self.max_entries)]:
+            del self._flights[key]
+
+    async def run(self, key, fingerprint, ttl_seconds, fn):
+        # Returns (result of fn(), replayed); replayed is True when another request's
+        # generation (running or finished) was reused. Raises IdempotencyConflict.
+        flight = self._lookup(key, fingerprint)
+        replayed = flight is not None
+        if flight is None:
+            flight = self._start(key, fingerprint, ttl_seconds, lambda flight: fn())
+        return await asyncio.shield(flight.task), replayed
+
+    def stream(self, key, fingerprint, ttl_seconds, events_fn, failed=None):
+        # Returns an async iterator over the events of events_fn(). Every request for
+        # the key gets the full sequence from the start, then follows the shared
+        # generation live. failed(events) -> True keeps the result from being reused.
+        # Raises IdempotencyConflict before anything is streamed.
+        async def consume(flight):
+            async for event in events_fn():
+                flight.events.append(event)
+                flight.notify()
+
+        flight = self._lookup(key, fingerprint)
+        if flight is None:
+            flight = self._start(key, fingerprint, ttl_seconds, consume, failed=failed)
+        return self._follow(flight)
+
+    async def _follow(self, flight):
+        position = 0
+        while True:
+            if position < len(flight.events):
+                yield flight.events[position]
+                position += 1
+            elif flight.task.done():
+                return
+            else:
+                await flight.changed.wait()
+
+idempotency_store = IdempotencyStore()
@@ -0,0 +1,220 @@
+# Background generation jobs for POST /api/projects/create?mode=job
+#
+# The endpoint records the project (status 'in_progress') and a generation_jobs row,
+# then returns 202 with the job id. An in-process pool of asyncio workers pulls job
+# ids from a bounded queue and runs the pipeline stage by stage. After every stage
+# the job row is checkpointed (stage outputs + progress), so a job interrupted by a
+# restart resumes from its last completed stage instead of starting over.
+#
+# Several API processes can share the table. A worker claims a job with a
+# conditional update (status 'queued', or 'running' with an expired lease, and the
+# attempts count it read) and renews lease_expires_at while it runs. Every write it
+# makes is fenced on that attempts value, so a worker whose lease was taken over
+# stops at its next checkpoint. Each process periodically re-queues queued jobs and
+# jobs whose lease expired (their worker or process died).
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+
+from database.db import supabase, execute
+from database.project_cache import project_cache
+from pipeline import run_insights, run_brand_package, build_brand_elements, persist_projects
+from assets.ingest import schedule_logo_ingestion
+from metrics import track, record_project_cost
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "100"))
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "120"))  # Renewed every third of this while a job runs
+JOB_RESUME_INTERVAL_SECONDS = float(os.getenv("JOB_RESUME_INTERVAL_SECONDS", "60"))  # Scan for orphaned jobs
+
+# Ordered pipeline stages; a job's "stage" column holds the last completed one
+STAGES = ["insights", "brand_package", "persist"]
+
+class JobQueueFull(Exception):
+    pass
+
+class JobLeaseLost(Exception):
+    # Another worker claimed the job after our lease expired
+    pass
+
+def _now(offset_seconds=0.0):
+    return (datetime.now(timezone.utc) + timedelta(seconds=offset_seconds)).isoformat()
+
+def initial_progress():
+    return {stage: {"status": "pending"} for stage in STAGES}
+
+async def _update_job(job_id, fields, attempt):
+    # Only applies while we still hold the job (attempt = the attempts value we claimed it with)
+    fields["updated_at"] = _now()
+    res = await execute(supabase.table("generation_jobs").update(fields).eq("id", job_id).eq("attempts", attempt))
+    if not res.data:
+        raise JobLeaseLost(f"Job {job_id} was claimed by another worker")
+
+async def _claim_job(job):
+    # Atomic: at most one worker's update matches the attempts value read here
+    attempt = (job.get("attempts") or 0) + 1
+    res = await execute(
+        supabase.table("generation_jobs")
+        .update({"status": "running", "attempts": attempt, "lease_expires_at": _now(JOB_LEASE_SECONDS), "updated_at": _now()})
+        .eq("id", job["id"])
+        .eq("attempts", job.get("attempts") or 0)
+        .or_(f'status.eq.queued,and(status.eq.running,or(lease_expires_at.is.null,lease_expires_at.lt."{_now()}"))')
+    )
+    return attempt if res.data else None
+
+async def _keep_lease(job_id, attempt):
+    while True:
+        await asyncio.sleep(JOB_LEASE_SECONDS / 3)
+        try:
+            res = await execute(
+                supabase.table("generation_jobs").update({"lease_expires_at": _now(JOB_LEASE_SECONDS)})
+                .eq("id", job_id).eq("attempts", attempt).eq("status", "running")
+            )
+        except Exception as e:
+            print(f"Could not renew lease of job {job_id}: {e}")
+            continue
+        if not res.data:
+            return # Finished, or taken over (the job's next checkpoint then raises JobLeaseLost)
+
+async def _run_stage(job, stage):
+    request = job["request"]
+    outputs = job.get("outputs") or {}
+    regenerate = bool(request.get("regenerate"))
+    if stage == "insights":
+        outputs["insights"] = await run_insights(request, regenerate=regenerate)
+    elif stage == "brand_package":
+        outputs["brand_package"] = await run_brand_package(request, outputs["insights"], regenerate=regenerate)
+    elif stage == "persist":
+        project_id = job["project_id"]
+        elements = build_brand_elements(project_id, outputs["insights"], outputs["brand_package"])
+        # One transaction replaces the project's elements and completes it, so a
+        # restart between this and the checkpoint below re-runs it without duplicates.
+        stored = (await persist_projects([({"id": project_id, "status": "completed"}, elements)]))[0]
+        schedule_logo_ingestion(project_id, stored.get("brand_elements") or [])
+        project_cache.invalidate(project_id)
+    return outputs
+
+async def run_job(job_id):
+    res = await execute(supabase.table("generation_jobs").select("*").eq("id", job_id).single())
+    job = res.data
+    if not job or job.get("status") in ("completed", "failed"):
+        return
+    attempt = await _claim_job(job)
+    if attempt is None:
+        return # Running elsewhere under a live lease, or already claimed by another worker
+    heartbeat = asyncio.create_task(_keep_lease(job_id, attempt))
+    try:
+        await _run_claimed(job, attempt)
+    except JobLeaseLost as e:
+        print(f"Stopping job {job_id}: {e}")
+    finally:
+        heartbeat.cancel()
+
+async def _run_claimed(job, attempt):
+    job_id = job["id"]
+    progress = job.get("progress") or initial_progress()
+    done = STAGES.index(job["stage"]) + 1 if job.get("stage") in STAGES else 0
+
+    for stage in STAGES[done:]:
+        progress[stage] = {"status": "running", "started_at": _now()}
+        await _update_job(job_id, {"progress": progress}, attempt)
+        try:
+            job["outputs"] = await _run_stage(job, stage)
+        except Exception as e:
+            print(f"Job {job_id} failed at stage '{stage}': {e}")
+            progress[stage].update({"status": "failed", "finished_at": _now()})
+            await _update_job(job_id, {"status": "failed", "progress": progress, "error": f"{stage}: {e}", "lease_expires_at": None}, attempt)
+            await execute(supabase.table("projects").update({"status": "failed", "updated_at": _now()}).eq("id", job["project_id"]))
+            project_cache.invalidate(job["project_id"])
+            return
+        progress[stage].update({"status": "completed", "finished_at": _now()})
+        # Checkpoint: outputs of every completed stage, so a restart can resume here
+        await _update_job(job_id, {"stage": stage, "progress": progress, "outputs": job["outputs"]}, attempt)
+
+    await _update_job(job_id, {"status": "completed", "lease_expires_at": None}, attempt)
+    record_project_cost("job") # Spend of this run (a resumed job only counts the stages it ran)
+
+class JobManager:
+    def __init__(self, workers=JOB_WORKERS, queue_size=JOB_QUEUE_SIZE):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.queue = None
+        self._queued = set()  # Job ids in the queue or being run by this process
+        self._tasks = []
+
+    async def start(self):
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        # Re-enqueue jobs left unfinished by a previous process, then keep watching for expired leases
+        self._tasks.append(asyncio.create_task(self._resume_unfinished()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def has_capacity(self):
+        return self.queue is not None and not self.queue.full()
+
+    def submit(self, job_id):
+        if self.queue is None:
+            raise JobQueueFull("Job workers are not running")
+        try:
+            self.queue.put_nowait(job_id)
+        except asyncio.QueueFull:
+            raise JobQueueFull("Generation queue is full")
+        self._queued.add(job_id)
+
+    async def _put(self, job_id):
+        self._queued.add(job_id)
+        await self.queue.put(job_id)
+
+    async def _resume_unfinished(self):
+        # Queued jobs (possibly submitted to a process that died before running them) and
+        # running jobs whose lease expired. Jobs already in a live queue are claimed once.
+        while True:
+            try:
+                res = await execute(
+                    supabase.table("generation_jobs").select("id")
+                    .in_("status", ["queued", "running"])
+                    .or_(f'status.eq.queued,lease_expires_at.is.null,lease_expires_at.lt."{_now()}"')
+                    .order("created_at")
+                )
+                rows = res.data or []
+            except Exception as e:
+                print(f"Could not load unfinished jobs: {e}")
+                rows = []
+            for row in rows:
+                if row["id"] not in self._queued:
+                    print(f"Resuming generation job {row['id']}")
+                    await self._put(row["id"]) # Waits for room instead of dropping resumed jobs
+            await asyncio.sleep(JOB_RESUME_INTERVAL_SECONDS)
+
+    async def _worker(self, index):
+        while True:
+            job_id = await self.queue.get()
+            try:
+                with track(): # Per-job timings and cost, separate from other jobs on this worker
+                    await run_job(job_id)
+            except Exception as e:
+                # Leave the row as-is ('running'); it is resumed once its lease expires
+                print(f"Job worker {index} crashed on job {job_id}: {e}")
+            finally:
+                self._queued.discard(job_id)
+                self.queue.task_done()
+
+async def create_job(project_id, request):
+    row = {
+        "project_id": project_id,
+        "request": request,
+        "status": "queued",
+        "progress": initial_progress(),
+        "outputs": {},
+    }
+    res = await execute(supabase.table("generation_jobs").insert(row))
+    if not res.data:
+        raise RuntimeError(f"Failed to create generation job: {getattr(res, 'error', None)}")
+    return res.data[0]
+
+job_manager = JobManager()
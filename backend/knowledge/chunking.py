@@ -0,0 +1,111 @@
+# Turns source documents into index chunks.
+#
+# Supported inputs:
+#   - .txt / .md: free text (market reports, notes). The title is the first "# "
+#     heading, or the file name; the kind comes from the caller (default "market").
+#   - .json / .jsonl: structured records, one per object:
+#       {"kind": "trial", "title": "EMPA-REG OUTCOME", "summary": "...", "text": "...",
+#        "molecules": ["empagliflozin"], "therapeutic_area": "Type 2 diabetes",
+#        "competitors": ["Dapagliflozin"]}
+#     kind defaults to the caller's; "text" defaults to "summary".
+#
+# Every chunk is {"id", "source", "kind", "title", "text", "meta"}. The id is a hash
+# of source, kind and text, so re-ingesting an unchanged document adds nothing.
+import hashlib
+import json
+import os
+import re
+
+CHUNK_MAX_CHARS = int(os.getenv("KNOWLEDGE_CHUNK_MAX_CHARS", "1200"))  # ~300 tokens
+CHUNK_OVERLAP_CHARS = int(os.getenv("KNOWLEDGE_CHUNK_OVERLAP_CHARS", "200"))
+TEXT_EXTENSIONS = (".txt", ".md")
+RECORD_EXTENSIONS = (".json", ".jsonl")
+META_KEYS = ("summary", "molecules", "therapeutic_area", "competitors", "url", "year")
+
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+_SENTENCE_RE = re.compile(r"(?<=[.!?।])\s+")
+_HEADING_RE = re.compile(r"^#\s+(.+)$", re.MULTILINE)
+
+def _pieces(text, max_chars):
+    # Paragraphs, with any paragraph over max_chars split on sentences (and, failing that, hard-split)
+    for paragraph in _PARAGRAPH_RE.split(text):
+        paragraph = " ".join(paragraph.split())
+        if not paragraph:
+            continue
+        if len(paragraph) <= max_chars:
+            yield paragraph
+            continue
+        for sentence in _SENTENCE_RE.split(paragraph):
+            for start in range(0, len(sentence), max_chars):
+                yield sentence[start:start + max_chars]
+
+def _tail(text, chars):
+    # The last `chars` characters, starting at a word boundary
+    if chars <= 0 or len(text) <= chars:
+        return "" if chars <= 0 else text
+    tail = text[-chars:]
+    space = tail.find(" ")
+    return tail[space + 1:] if space != -1 else tail
+
+def split_text(text, max_chars=CHUNK_MAX_CHARS, overlap_chars=CHUNK_OVERLAP_CHARS):
+    # Packs paragraphs greedily into chunks of up to max_chars; each chunk after the
+    # first starts with the tail of the previous one so a fact split across the
+    # boundary is still retrievable from one chunk.
+    chunks, current = [], ""
+    for piece in _pieces(text or "", max_chars):
+        candidate = f"{current}\n\n{piece}" if current else piece
+        if len(candidate) <= max_chars:
+            current = candidate
+            continue
+        chunks.append(current)
+        overlap = _tail(current, min(overlap_chars, max_chars - len(piece) - 2))
+        current = f"{overlap}\n\n{piece}" if overlap else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+def chunk_id(source, kind, text):
+    return hashlib.sha256(f"{source}\x00{kind}\x00{text}".encode("utf-8")).hexdigest()[:32]
+
+def chunk_record(record, source, kind):
+    kind = record.get("kind") or kind
+    title = record.get("title") or record.get("name") or os.path.basename(source)
+    text = record.get("text") or record.get("summary") or ""
+    meta = {key: record[key] for key in META_KEYS if record.get(key)}
+    return [
+        {"id": chunk_id(source, kind, piece), "source": source, "kind": kind, "title": title, "text": piece, "meta": meta}
+        for piece in split_text(text)
+    ]
+
+def read_records(path, kind="market"):
+    # Yields the records of one file in the shape chunk_record() expects
+    with open(path, encoding="utf-8") as f:
+        raw = f.read()
+    if path.endswith(".jsonl"):
+        for line in raw.splitlines():
+            if line.strip():
+                yield json.loads(line)
+    elif path.endswith(".json"):
+        data = json.loads(raw)
+        yield from (data if isinstance(data, list) else [data])
+    else:
+        heading = _HEADING_RE.search(raw)
+        yield {"kind": kind, "title": heading.group(1).strip() if heading else os.path.splitext(os.path.basename(path))[0], "text": raw}
+
+def chunk_file(path, kind="market", source=None):
+    source = source or os.path.basename(path)
+    chunks = []
+    for record in read_records(path, kind):
+        chunks += chunk_record(record, source, kind)
+    return chunks
+
+def find_documents(paths):
+    # Files under the given files/directories that chunk_file() can read, in a stable order
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                found += [os.path.join(root, name) for name in files if name.endswith(TEXT_EXTENSIONS + RECORD_EXTENSIONS)]
+        elif path.endswith(TEXT_EXTENSIONS + RECORD_EXTENSIONS):
+            found.append(path)
+    return sorted(found)
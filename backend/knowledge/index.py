@@ -0,0 +1,167 @@
+# Local vector index for the knowledge base (trial summaries, market reports).
+#
+# On disk, under KNOWLEDGE_INDEX_DIR:
+#   vectors.f32    float32 rows, L2-normalised, memory-mapped for search
+#   chunks.jsonl   one chunk per row, same order (see knowledge/chunking.py)
+#   manifest.json  {"model", "dim", "count", "chunks_bytes"}; written last
+#
+# The manifest is the commit point: adds append to both files and then replace the
+# manifest, and readers only look at the first `count` rows / `chunks_bytes` bytes,
+# so a crashed add leaves the previous index intact. A running API process notices
+# a newer manifest (e.g. after `python -m knowledge.ingest`) on its next search.
+# One writer at a time.
+import json
+import os
+import tempfile
+import threading
+
+import numpy as np
+
+from ai.cache import normalize
+from ai.embeddings import EMBEDDING_MODEL, EMBEDDING_DIM
+
+KNOWLEDGE_INDEX_DIR = os.getenv("KNOWLEDGE_INDEX_DIR", os.path.join(os.path.dirname(__file__), "..", ".cache", "knowledge"))
+SEARCH_BLOCK_ROWS = 65536  # Rows scored per matmul, bounds memory for large indexes
+
+def normalize_rows(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, EMBEDDING_DIM) if len(vectors) else np.zeros((0, EMBEDDING_DIM), np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+class VectorIndex:
+    def __init__(self, root=KNOWLEDGE_INDEX_DIR, model=EMBEDDING_MODEL, dim=EMBEDDING_DIM):
+        self.root = os.path.abspath(root)
+        self.model = model
+        self.dim = dim
+        self._lock = threading.Lock()
+        self._manifest_mtime = None
+        self._vectors = None  # np.memmap (count x dim) or None when empty
+        self.chunks = []
+        self._ids = set()
+        self._kinds = np.zeros(0, dtype=object)
+        self._by_molecule = {}  # normalised molecule name -> chunk rows whose metadata lists it
+        self.chunks_bytes = 0
+
+    def _path(self, name):
+        return os.path.join(self.root, name)
+
+    def _read_manifest(self):
+        try:
+            with open(self._path("manifest.json")) as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return {"model": self.model, "dim": self.dim, "count": 0, "chunks_bytes": 0}
+        if manifest.get("model") != self.model or manifest.get("dim") != self.dim:
+            raise ValueError(
+                f"Knowledge index at {self.root} was built with {manifest.get('model')} ({manifest.get('dim')} dims), "
+                f"expected {self.model} ({self.dim}); re-ingest into an empty KNOWLEDGE_INDEX_DIR"
+            )
+        return manifest
+
+    def _load(self):
+        # (Re)maps the committed part of the index; caller holds the lock
+        manifest = self._read_manifest()
+        count, chunks_bytes = manifest["count"], manifest["chunks_bytes"]
+        chunks = []
+        if count:
+            with open(self._path("chunks.jsonl"), "rb") as f:
+                chunks = [json.loads(line) for line in f.read(chunks_bytes).splitlines()]
+        if len(chunks) != count:
+            raise ValueError(f"Knowledge index at {self.root} is inconsistent: {len(chunks)} chunks for {count} vectors")
+        self._vectors = np.memmap(self._path("vectors.f32"), dtype=np.float32, mode="r", shape=(count, self.dim)) if count else None
+        self.chunks = chunks
+        self._ids = {chunk["id"] for chunk in chunks}
+        self._kinds = np.array([chunk["kind"] for chunk in chunks], dtype=object)
+        self._by_molecule = {}
+        for row, chunk in enumerate(chunks):
+            for molecule in chunk["meta"].get("molecules") or []:
+                self._by_molecule.setdefault(normalize(molecule), []).append(row)
+        self.chunks_bytes = chunks_bytes
+
+    def refresh(self):
+        # Cheap when nothing changed: one stat() of the manifest
+        try:
+            mtime = os.stat(self._path("manifest.json")).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        with self._lock:
+            if mtime != self._manifest_mtime:
+                self._load()
+                self._manifest_mtime = mtime
+
+    @property
+    def count(self):
+        return len(self.chunks)
+
+    def version(self):
+        # Changes whenever chunks are added; part of the insights cache key
+        self.refresh()
+        return self.count
+
+    def missing(self, chunks):
+        # The chunks not in the index yet (incremental ingestion)
+        self.refresh()
+        return [chunk for chunk in chunks if chunk["id"] not in self._ids]
+
+    def add(self, chunks, vectors):
+        # Appends chunks (dicts from knowledge/chunking.py) and their embeddings; returns how many were new
+        vectors = normalize_rows(vectors)
+        if len(chunks) != len(vectors):
+            raise ValueError(f"{len(chunks)} chunks but {len(vectors)} vectors")
+        self.refresh()
+        with self._lock:
+            new = [(chunk, vector) for chunk, vector in zip(chunks, vectors) if chunk["id"] not in self._ids]
+            if not new:
+                return 0
+            os.makedirs(self.root, exist_ok=True)
+            count = self.count
+            rows = np.stack([vector for _, vector in new])
+            lines = b"".join(json.dumps(chunk, ensure_ascii=False).encode("utf-8") + b"\n" for chunk, _ in new)
+            # Start writing where the committed data ends, dropping leftovers of a crashed add
+            with open(self._path("vectors.f32"), "ab") as f:
+                f.truncate(count * self.dim * 4)
+                f.write(rows.tobytes())
+            with open(self._path("chunks.jsonl"), "ab") as f:
+                f.truncate(self.chunks_bytes)
+                f.write(lines)
+            manifest = {"model": self.model, "dim": self.dim, "count": count + len(new), "chunks_bytes": self.chunks_bytes + len(lines)}
+            fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix="manifest.json.", suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(manifest, f)
+            os.replace(tmp_path, self._path("manifest.json"))
+            self._load()
+            self._manifest_mtime = os.stat(self._path("manifest.json")).st_mtime_ns
+            return len(new)
+
+    def for_molecules(self, molecules, kinds=None):
+        # Exact metadata lookup, no embedding needed: chunks whose "molecules" list one of these names
+        self.refresh()
+        with self._lock:
+            rows = sorted({row for molecule in molecules for row in self._by_molecule.get(normalize(molecule), [])})
+            return [self.chunks[row] for row in rows if not kinds or self.chunks[row]["kind"] in kinds]
+
+    def search(self, query_vector, k=8, kinds=None):
+        # Top-k chunks by cosine similarity: [(score, chunk)], best first.
+        # kinds: optional set of chunk kinds to consider ("trial", "market", ...)
+        self.refresh()
+        with self._lock:
+            vectors, chunks, chunk_kinds = self._vectors, self.chunks, self._kinds
+        if vectors is None or k <= 0:
+            return []
+        query = normalize_rows([query_vector])[0]
+        mask = np.isin(chunk_kinds, list(kinds)) if kinds else None
+        best_scores, best_rows = np.zeros(0, np.float32), np.zeros(0, np.int64)
+        for start in range(0, len(chunks), SEARCH_BLOCK_ROWS):
+            scores = vectors[start:start + SEARCH_BLOCK_ROWS] @ query
+            if mask is not None:
+                scores = np.where(mask[start:start + SEARCH_BLOCK_ROWS], scores, -np.inf)
+            best_scores = np.concatenate([best_scores, scores])
+            best_rows = np.concatenate([best_rows, np.arange(start, start + len(scores))])
+            if len(best_scores) > k:
+                keep = np.argpartition(-best_scores, k)[:k]
+                best_scores, best_rows = best_scores[keep], best_rows[keep]
+        order = np.argsort(-best_scores)
+        return [(float(best_scores[i]), chunks[best_rows[i]]) for i in order if np.isfinite(best_scores[i])]
+
+# Process-wide instance used by knowledge/retrieval.py and the ingestion CLI
+knowledge_index = VectorIndex()
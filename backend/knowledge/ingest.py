@@ -0,0 +1,51 @@
+# Builds or extends the knowledge index from documents on disk:
+#
+#   python -m knowledge.ingest data/trials/ --kind trial
+#   python -m knowledge.ingest reports/bd_market_2023.md
+#
+# Only chunks that are not in the index yet are embedded, so re-running over the
+# same directory after adding one report embeds just that report. Chunks are
+# committed in batches: an interrupted run keeps what it had already added.
+import argparse
+import asyncio
+
+from dotenv import load_dotenv
+
+from ai.embeddings import embed_texts
+from knowledge.chunking import chunk_file, find_documents
+from knowledge.index import knowledge_index
+
+INGEST_BATCH_CHUNKS = 512  # Chunks embedded and committed per step
+
+def embedding_text(chunk):
+    return f"{chunk['title']}\n{chunk['text']}"
+
+async def ingest_paths(paths, kind="market", index=knowledge_index, dry_run=False):
+    files = find_documents(paths)
+    chunks = []
+    for path in files:
+        chunks += chunk_file(path, kind)
+    new = list({chunk["id"]: chunk for chunk in index.missing(chunks)}.values())
+    added = 0
+    if not dry_run:
+        for start in range(0, len(new), INGEST_BATCH_CHUNKS):
+            batch = new[start:start + INGEST_BATCH_CHUNKS]
+            vectors = await embed_texts([embedding_text(chunk) for chunk in batch])
+            added += index.add(batch, vectors)
+    return {"files": len(files), "chunks": len(chunks), "new": len(new), "added": added, "total": index.count}
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Add trial summaries and market reports to the knowledge index")
+    parser.add_argument("paths", nargs="+", help="Files or directories (.txt, .md, .json, .jsonl)")
+    parser.add_argument("--kind", default="market", help="Kind for plain-text files and records without one (e.g. trial, market)")
+    parser.add_argument("--dry-run", action="store_true", help="Chunk and count, without embedding or writing")
+    args = parser.parse_args()
+    result = asyncio.run(ingest_paths(args.paths, kind=args.kind, dry_run=args.dry_run))
+    print(
+        f"{result['files']} files, {result['chunks']} chunks, {result['new']} new, "
+        f"{result['added']} added; index now has {result['total']} chunks ({knowledge_index.root})"
+    )
+
+if __name__ == "__main__":
+    main()
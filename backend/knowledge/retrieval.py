@@ -0,0 +1,74 @@
+# Grounding context for generate_insights from the local knowledge index.
+#
+#   - trials / competitors: exact lookup of chunks whose metadata lists the requested
+#     molecule(s). No API call, so what we already know costs milliseconds.
+#   - snippets: top-k chunks by cosine similarity to the request, for the LLM to
+#     synthesise from (one cached embedding call for the query).
+# An empty or unreadable index yields empty context, and generate_insights falls back
+# to its ungrounded prompt.
+import asyncio
+import os
+import re
+
+from ai.embeddings import embed_query
+from ai.rate_limiter import openai_limiter
+from knowledge.index import knowledge_index
+from metrics import timed
+
+RETRIEVAL_TOP_K = int(os.getenv("KNOWLEDGE_TOP_K", "6"))
+RETRIEVAL_MIN_SCORE = float(os.getenv("KNOWLEDGE_MIN_SCORE", "0.3"))  # Cosine similarity
+SNIPPET_MAX_CHARS = 600
+TRIAL_SUMMARY_MAX_CHARS = 300
+
+_MOLECULE_SEPARATOR_RE = re.compile(r"\s*(?:[,;/+&]|\band\b)\s*", re.IGNORECASE)
+
+def split_molecules(molecule):
+    # "Empagliflozin + Metformin" -> ["Empagliflozin", "Metformin"]
+    return [name for name in _MOLECULE_SEPARATOR_RE.split(molecule or "") if name]
+
+def known_trials(chunks):
+    trials = {}
+    for chunk in chunks:
+        if chunk["kind"] == "trial" and chunk["title"] not in trials:
+            trials[chunk["title"]] = {"name": chunk["title"], "summary": chunk["meta"].get("summary") or chunk["text"][:TRIAL_SUMMARY_MAX_CHARS]}
+    return list(trials.values())
+
+def known_competitors(chunks, molecules):
+    requested = {name.lower() for name in molecules}
+    competitors = {}
+    for chunk in chunks:
+        for name in chunk["meta"].get("competitors") or []:
+            if name.lower() not in requested:
+                competitors.setdefault(name.lower(), name)
+    return list(competitors.values())
+
+async def gather_context(molecule, therapeutic_area, benefits=None, prompt=None):
+    # {"trials": [{"name", "summary"}], "competitors": [str], "snippets": [{"title", "kind", "source", "text", "score"}]}
+    context = {"trials": [], "competitors": [], "snippets": []}
+    # Index reads run in a thread: a refresh after ingestion re-reads chunks.jsonl and
+    # re-maps the vectors, which must not stall the event loop
+    try:
+        if not await asyncio.to_thread(knowledge_index.version):
+            return context
+    except (OSError, ValueError) as e:
+        print(f"Knowledge index unavailable: {e}")
+        return context
+    with timed("retrieval"):
+        molecules = split_molecules(molecule)
+        known = await asyncio.to_thread(knowledge_index.for_molecules, molecules)
+        context["trials"] = known_trials(known)
+        context["competitors"] = known_competitors(known, molecules)
+        query = "\n".join(part for part in (molecule, therapeutic_area, benefits, prompt) if part)
+        if not query:
+            return context
+        try:
+            vector = await embed_query(query)
+            hits = await asyncio.to_thread(knowledge_index.search, vector, RETRIEVAL_TOP_K)
+        except Exception as e:
+            openai_limiter.record_fallback("retrieval", e)
+            return context
+    context["snippets"] = [
+        {"title": chunk["title"], "kind": chunk["kind"], "source": chunk["source"], "text": chunk["text"][:SNIPPET_MAX_CHARS], "score": round(score, 4)}
+        for score, chunk in hits if score >= RETRIEVAL_MIN_SCORE
+    ]
+    return context
@@ -1,20 +1,44 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from typing import Optional
-from ai.insights import generate_insights  # Placeholder
-from ai.brand_package import generate_brand_package  # Placeholder
-from supabase import create_client, Client
-from dotenv import load_dotenv
+from fastapi import FastAPI, Header, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse, FileResponse, Response
+from ai.brand_package import stream_brand_package
+from ai.cache import llm_cache
+from ai.rate_limiter import openai_limiter
+from database.db import supabase, execute
+from postgrest import APIError
+from database.project_cache import project_cache, etag_matches
+from database.elements import by_preference, pick
+from database.pagination import apply_keyset, page, InvalidCursor
+from models import CreateProjectRequest, ProjectResponse, PortfolioExportRequest, RegenerateRequest
+from pipeline import run_insights, run_brand_package, project_row, insight_elements, persist_project, regenerate_elements
+from jobs import job_manager, create_job, JobQueueFull
+from idempotency import idempotency_store, request_key, IdempotencyConflict
+from batch import parse_rows, run_batch, BatchParseError
+from exports.leaflet_pdf import export_pdf, export_portfolio
+from assets.ingest import schedule_logo_ingestion
+from assets.storage import storage
+import metrics
+from compliance.service import load_content as load_compliance_content, run_compliance_check, invalidate as invalidate_compliance, recheck_stale
 import os
-
-load_dotenv()
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+import json
+import csv
+import time
+from typing import Optional
 
 app = FastAPI()
 
+from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
+class ImmutableStaticFiles(StaticFiles):
+    # Asset keys are content hashes, so a given URL never changes and can be cached forever
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
+
+# Ingested logos + thumbnails (see assets/ingest.py)
+os.makedirs(storage.root, exist_ok=True)
+app.mount("/assets", ImmutableStaticFiles(directory=storage.root), name="assets")
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # For local development only
@@ -23,26 +47,44 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Updated Pydantic model to match frontend and Supabase schema
-class CreateProjectRequest(BaseModel):
-    project_name: Optional[str] = None
-    molecule_names: Optional[str] = None
-    therapeutic_area: Optional[str] = None
-    key_differentiating_benefits: Optional[str] = None
-    natural_language_prompt: Optional[str] = None
-
-class ProjectResponse(BaseModel): # Define a response model for clarity
-    id: str # UUID will be string
-    user_id: str
-    project_name: Optional[str] = None
-    molecule_names: Optional[str] = None
-    therapeutic_area: Optional[str] = None
-    key_differentiating_benefits: Optional[str] = None
-    # Add other fields as necessary, e.g., status, created_at
-    # For now, keeping it simple to reflect the created project's core data
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    # Request latency by route template, plus a Server-Timing header with the
+    # per-stage / OpenAI / DB breakdown collected while serving the request
+    metrics.HTTP_IN_FLIGHT.inc()
+    status = 500
+    with metrics.track() as tracker:
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            response.headers["Server-Timing"] = tracker.server_timing()
+            return response
+        finally:
+            route = request.scope.get("route")
+            elapsed = time.perf_counter() - tracker.started
+            metrics.HTTP_SECONDS.labels(request.method, getattr(route, "path", "unmatched"), str(status)).observe(elapsed)
+            metrics.HTTP_IN_FLIGHT.dec()
+
+@app.get("/metrics")
+def get_metrics():
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
+@app.on_event("startup")
+async def start_job_workers():
+    await job_manager.start()
+
+@app.on_event("shutdown")
+async def stop_job_workers():
+    await job_manager.stop()
 
 @app.post("/api/projects/create", response_model=ProjectResponse) # Added response_model
-async def create_project(payload: CreateProjectRequest):
+async def create_project(
+    payload: CreateProjectRequest,
+    response: Response,
+    mode: str = Query("sync", pattern="^(sync|job)$"),
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+):
     # TODO: Extract user_id from authenticated session/token
     user_id = "demo-user-fixme" # IMPORTANT: Replace with real user ID from auth
 
@@ -70,136 +112,50 @@ async def create_project(payload: CreateProjectRequest):
         else:
             raise HTTPException(status_code=400, detail="Molecule names and Therapeutic Area are required if not using a natural language prompt.")
 
-    # --- 2. Call Strategic Insights Engine ---
-    # Placeholder: Assumes generate_insights can handle potentially None inputs
+    # --- Duplicates (double-clicks, client retries) share one generation; see idempotency.py ---
+    key, fingerprint, ttl_seconds = request_key(user_id, mode, payload, idempotency_key)
     try:
-        print(f"Calling generate_insights with: molecule='{payload.molecule_names}', therapeutic_area='{payload.therapeutic_area}', benefits='{payload.key_differentiating_benefits}', prompt='{payload.natural_language_prompt}'")
-        insights = await generate_insights( # Assuming async if it involves I/O
-            molecule=payload.molecule_names, # Corrected parameter name
-            therapeutic_area=payload.therapeutic_area,
-            benefits=payload.key_differentiating_benefits, # Corrected parameter name
-            prompt=payload.natural_language_prompt # Pass prompt
-        )
-        # insights structure expected:
-        # {
-        #   "competitors": ["CompA", "CompB"],
-        #   "brand_positioning": "Focus on X",
-        #   "color_palette": {"primary": "#FFFFFF", "secondary": "#000000", "reasoning": "..."},
-        #   "cited_trials": ["TrialX", "TrialY"]
-        # }
+        result, replayed = await idempotency_store.run(key, fingerprint, ttl_seconds, lambda: generate_project(user_id, payload, mode))
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    headers = {"Idempotent-Replayed": "true"} if replayed else {}
+    if mode == "job":
+        return JSONResponse(status_code=202, content=result, headers=headers)
+    response.headers.update(headers)
+    return result
+
+async def generate_project(user_id: str, payload: CreateProjectRequest, mode: str):
+    # --- Job mode: record the project, queue the pipeline and return 202 immediately ---
+    if mode == "job":
+        return await submit_generation_job(user_id, payload)
+
+    # --- 2. Strategic insights, 3. brand package: the same pipeline stages as job and batch mode ---
+    request = payload.dict()
+    try:
+        insights = await run_insights(request, regenerate=payload.regenerate)
     except Exception as e:
         print(f"Error generating insights: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to generate strategic insights: {e}")
-
-    # --- 3. Call Brand Package Generator ---
-    # Placeholder: Assumes generate_brand_package can handle potentially None inputs
     try:
-        print(f"Calling generate_brand_package with: molecule='{payload.molecule_names}', therapeutic_area='{payload.therapeutic_area}', color_palette='{insights.get('color_palette')}'")
-        brand_package = await generate_brand_package( # Assuming async
-            molecule=payload.molecule_names, # Corrected parameter name
-            therapeutic_area=payload.therapeutic_area,
-            # key_differentiating_benefits is not a direct input for generate_brand_package
-            # natural_language_prompt is not a direct input for generate_brand_package
-            # recommended_positioning is not a direct input for generate_brand_package in insights.py (it's used in the prompt construction)
-            color_palette=insights.get("color_palette")
-        )
-        # brand_package structure from ai/brand_package.py:
-        # {
-        #   "brand_names": ["BrandA", "BrandB"], (List of strings)
-        #   "logo_concepts": [{"url": "dalle_concept1_url"}], (List of dicts)
-        #   "slogans": [{"english": "Slogan EN", "bengali": "স্লোগান বাংলা"}], (List of dicts)
-        #   "color_palette": color_palette, (Passed through)
-        #   "leaflet_json": { ... } (Dict)
-        # }
-    except Exception as e:
-        print(f"Error generating brand package: {e}")
-        #   "brand_name_suggestions": [{"name": "BrandA"}, {"name": "BrandB"}],
-        #   "logo_concepts": [{"name": "Logo1", "prompt": "...", "image_url_placeholder": "dalle_concept1_url"}],
-        #   "slogans": [{"english": "Slogan EN", "bengali": "স্লোগান বাংলা"}],
-        #   "leaflet_draft": {"layout_json": { ... }}
-        # }
+        brand_package = await run_brand_package(request, insights, regenerate=payload.regenerate)
     except Exception as e:
         print(f"Error generating brand package: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to generate brand package: {e}")
 
     # --- 4. Store project and generated elements in Supabase ---
-    project_id = None
     try:
-        # Create the main project entry
-        project_insert_data = {
-            "user_id": user_id,
-            "project_name": payload.project_name,
-            "molecule_names": payload.molecule_names,
-            "therapeutic_area": payload.therapeutic_area,
-            "key_differentiating_benefits": payload.key_differentiating_benefits,
-            # "status": "draft" # Default status from schema
-        }
-        project_res = supabase.table("projects").insert(project_insert_data).execute()
-
-        if not project_res.data:
-            print(f"Supabase project insert error: {project_res.error}")
-            raise HTTPException(status_code=500, detail="Failed to create project record in database.")
-
-        created_project = project_res.data[0]
+        # The project and all of its elements in one transactional RPC call: either
+        # everything is stored or nothing is, so a failure can't leave an orphaned project.
+        try:
+            created_project = await persist_project(user_id, request, insights, brand_package) # status defaults to 'draft' in the schema
+        except Exception as e:
+            print(f"Supabase project insert error: {e}")
+            raise HTTPException(status_code=500, detail="Failed to store project and generated brand elements.")
         project_id = created_project["id"]
+        metrics.record_project_cost("sync")
 
-        # Store brand elements (names, logos, slogans, leaflet, insights)
-        elements_to_insert = []
-
-        # Insights as brand elements
-        if insights.get("competitors"):
-            elements_to_insert.append({
-                "project_id": project_id, "element_type": "insight_competitors",
-                "content": {"competitors": insights["competitors"]}
-            })
-        if insights.get("brand_positioning"):
-            elements_to_insert.append({
-                "project_id": project_id, "element_type": "insight_brand_positioning",
-                "content": {"positioning": insights["brand_positioning"]}
-            })
-        if insights.get("color_palette"):
-            elements_to_insert.append({
-                "project_id": project_id, "element_type": "insight_color_palette",
-                "content": insights["color_palette"] # e.g. {"primary": "#...", "reasoning": "..."}
-            })
-        if insights.get("cited_trials"):
-            elements_to_insert.append({
-                "project_id": project_id, "element_type": "insight_cited_trials",
-                "content": {"trials": insights["cited_trials"]}
-            })
-
-        # Brand package elements
-        # Adjusted to match actual output of generate_brand_package
-        for name_str in brand_package.get("brand_names", []): # brand_names is list of strings
-            elements_to_insert.append({
-                "project_id": project_id, "element_type": "brand_name_suggestion",
-                "content": {"name": name_str} # Store as a dict in content
-            })
-        for logo_url_dict in brand_package.get("logo_concepts", []): # logo_concepts is list of {"url": "..."}
-            elements_to_insert.append({
-                "project_id": project_id, "element_type": "logo_concept",
-                "content": logo_url_dict # Store {"url": "..."}
-            })
-        # Slogans structure: brand_package.get("slogans") is expected to be [{"english": "...", "bengali": "..."}]
-        # The generate_brand_package returns: "slogans": [{"en": slogan_en, "bn": slogan_bn}]
-        # This matches the iteration logic.
-        for slogan_pair in brand_package.get("slogans", []): # slogans is list of dicts {"en": ..., "bn": ...}
-            elements_to_insert.append({
-                "project_id": project_id, "element_type": "slogan_suggestion",
-                "content": slogan_pair
-            })
-        if brand_package.get("leaflet_json"): # Corrected key from "leaflet_draft" to "leaflet_json"
-            elements_to_insert.append({
-                "project_id": project_id, "element_type": "leaflet_draft", # Keep element_type as "leaflet_draft" for consistency
-                "content": brand_package["leaflet_json"] # e.g. {"layout_json": {...}} or the direct JSON content
-            })
-
-        if elements_to_insert:
-            elements_res = supabase.table("brand_elements").insert(elements_to_insert).execute()
-            if elements_res.error:
-                # TODO: Consider cleanup or marking project as incomplete if this fails
-                print(f"Supabase brand_elements insert error: {elements_res.error}")
-                raise HTTPException(status_code=500, detail="Failed to store generated brand elements.")
+        # Download, dedupe and thumbnail the DALL-E logos in the background
+        schedule_logo_ingestion(project_id, created_project.get("brand_elements") or [])
 
         # Prepare and return the main project data as per ProjectResponse model
         return ProjectResponse(
@@ -208,130 +164,343 @@ async def create_project(payload: CreateProjectRequest):
             project_name=created_project.get("project_name"),
             molecule_names=created_project.get("molecule_names"),
             therapeutic_area=created_project.get("therapeutic_area"),
-            key_differentiating_benefits=created_project.get("key_differentiating_benefits")
+            key_differentiating_benefits=created_project.get("key_differentiating_benefits"),
+            fallbacks=(["insights"] if insights.get("fallback") else []) + brand_package.get("fallbacks", [])
         )
 
     except HTTPException as he:
         raise he # Re-raise HTTPExceptions
     except Exception as e:
-        # TODO: If project_id was created but subsequent steps failed,
-        # consider deleting the project or marking it as failed.
         print(f"An unexpected error occurred during project creation: {e}")
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {e}")
 
 
+async def submit_generation_job(user_id: str, payload: CreateProjectRequest):
+    # Refuse before writing anything, so a 503 never leaves a project behind
+    if not job_manager.has_capacity():
+        raise HTTPException(status_code=503, detail="Generation queue is full, please retry shortly.", headers={"Retry-After": "10"})
+    project_res = await execute(supabase.table("projects").insert(project_row(user_id, payload.dict(), status="in_progress")))
+    if not project_res.data:
+        raise HTTPException(status_code=500, detail="Failed to create project record in database.")
+    project_id = project_res.data[0]["id"]
+    try:
+        job = await create_job(project_id, payload.dict())
+    except Exception as e:
+        print(f"Failed to queue generation job for project {project_id}: {e}")
+        await execute(supabase.table("projects").update({"status": "failed"}).eq("id", project_id))
+        raise HTTPException(status_code=500, detail=f"Failed to queue generation job: {e}")
+    try:
+        job_manager.submit(job["id"])
+    except JobQueueFull as e:
+        # The queue filled up since the capacity check. The job row is stored as
+        # 'queued', so the periodic resume scan runs it: the request is still accepted.
+        print(f"Generation job {job['id']} left for the resume scan: {e}")
+    return {
+        "job_id": str(job["id"]),
+        "project_id": str(project_id),
+        "status": "queued",
+        "status_url": f"/api/jobs/{job['id']}",
+    }
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    res = await execute(supabase.table("generation_jobs").select("id, project_id, status, stage, progress, error, attempts, created_at, updated_at").eq("id", job_id).single())
+    if not res.data:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return res.data
+
+
+# --- Streaming (SSE) project creation ---
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def _insert_elements(project_id, elements):
+    # Persist each streamed piece as soon as it arrives; returns the stored rows
+    if not elements:
+        return []
+    res = await execute(supabase.table("brand_elements").insert(elements))
+    if not res.data:
+        raise RuntimeError(f"Failed to store brand elements for project {project_id}: {getattr(res, 'error', None)}")
+    project_cache.invalidate(project_id) # The project page polls while the stream is running
+    return res.data
+
+async def stream_project_events(user_id: str, payload: CreateProjectRequest):
+    project_id = None
+    try:
+        project_res = await execute(supabase.table("projects").insert(project_row(user_id, payload.dict(), status="in_progress")))
+        if not project_res.data:
+            yield sse_event("error", {"detail": "Failed to create project record in database."})
+            return
+        project_id = project_res.data[0]["id"]
+        yield sse_event("project", {"project_id": str(project_id)})
+
+        insights = await run_insights(payload.dict(), regenerate=payload.regenerate)
+        await _insert_elements(project_id, insight_elements(project_id, insights))
+        yield sse_event("insights", insights)
+
+        async for event, data in stream_brand_package(
+            molecule=payload.molecule_names,
+            therapeutic_area=payload.therapeutic_area,
+            color_palette=insights.get("color_palette"),
+            regenerate=payload.regenerate
+        ):
+            if event == "fallback":
+                yield sse_event(event, {"field": data})
+                continue
+            if event == "brand_names":
+                elements = [{"project_id": project_id, "element_type": "brand_name_suggestion", "content": {"name": name}} for name in data]
+            elif event == "slogans":
+                elements = [{"project_id": project_id, "element_type": "slogan_suggestion", "content": pair} for pair in data]
+            elif event == "leaflet":
+                elements = [{"project_id": project_id, "element_type": "leaflet_draft", "content": data}] if data else []
+            else: # logo
+                elements = [{"project_id": project_id, "element_type": "logo_concept", "content": {k: v for k, v in data.items() if k in ("url", "fallback")}}]
+            stored = await _insert_elements(project_id, elements)
+            if event == "logo":
+                schedule_logo_ingestion(project_id, stored)
+            yield sse_event(event, data)
+
+        await execute(supabase.table("projects").update({"status": "completed"}).eq("id", project_id))
+        project_cache.invalidate(project_id)
+        metrics.record_project_cost("stream")
+        yield sse_event("done", {"project_id": str(project_id)})
+    except Exception as e:
+        print(f"Streamed project creation failed: {e}")
+        if project_id:
+            await execute(supabase.table("projects").update({"status": "failed"}).eq("id", project_id))
+            project_cache.invalidate(project_id)
+        yield sse_event("error", {"detail": str(e), "project_id": str(project_id) if project_id else None})
+
+def _stream_failed(events):
+    return bool(events) and events[-1].startswith("event: error")
+
+@app.post("/api/projects/create/stream")
+async def create_project_stream(payload: CreateProjectRequest, idempotency_key: Optional[str] = Header(None, max_length=255)):
+    # Same input as /api/projects/create, but emits Server-Sent Events as each piece
+    # finishes: project, insights, brand_names, slogans, leaflet, logo (one per image), done.
+    # A duplicate request replays the events of the generation already running (or
+    # just finished) for the same project instead of starting another one.
+    user_id = "demo-user-fixme" # TODO: Extract user_id from authenticated session/token
+    if not payload.molecule_names or not payload.therapeutic_area:
+        if not payload.natural_language_prompt:
+            raise HTTPException(status_code=400, detail="Molecule names and Therapeutic Area are required if not using a natural language prompt.")
+    key, fingerprint, ttl_seconds = request_key(user_id, "stream", payload, idempotency_key)
+    try:
+        events = idempotency_store.stream(key, fingerprint, ttl_seconds, lambda: stream_project_events(user_id, payload), failed=_stream_failed)
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"} # Disable proxy buffering
+    )
+
+
+@app.post("/api/projects/batch")
+async def create_projects_batch(request: Request):
+    # Body: JSONL (one CreateProjectRequest object per line) or CSV with the same
+    # column names (Content-Type: text/csv). Streams one NDJSON result per input row:
+    # {"row": 0, "status": "created", "project_id": "..."} or {"row": 3, "status": "error", "detail": "..."}
+    user_id = "demo-user-fixme" # TODO: Extract user_id from authenticated session/token
+    try:
+        rows = parse_rows(await request.body(), request.headers.get("content-type", ""))
+    except (BatchParseError, UnicodeDecodeError, csv.Error) as e:
+        raise HTTPException(status_code=400, detail=f"Could not parse batch: {e}")
+
+    async def results():
+        async for result in run_batch(user_id, rows):
+            yield json.dumps(result) + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+
 # --- Iterative Editing & Compliance/Export Endpoints ---
-# Note: The existing iterative editing and other endpoints below this point
-# will need to be reviewed and updated to align with the new brand_elements structure.
-# For example, updating a brand name might now mean updating a specific 'brand_name_suggestion'
-# element in the 'brand_elements' table and marking it as 'is_selected = true'.
-# This is outside the scope of the current step but important for future work.
-# The Supabase table "insights" and the way "brand_elements" was previously structured
-# (specific columns like brand_name, logo_url) are different from the new schema.
-# These endpoints (update_brand_name, update_slogan, etc.) will need significant rework.
+# An edit is stored like a regeneration: a new brand_elements row of the edited type,
+# marked is_selected (the other rows of that type are unselected), so the generated
+# candidates stay available and the project view, compliance check and PDF export
+# all pick the edited content (see database/elements.py).
 from fastapi import Body
 
+async def _store_edit(project_id, element_type, edit):
+    # edit(current_content) -> new content, where current_content is the selected
+    # (otherwise newest) row's content, or {} if the project has none of this type
+    try:
+        project = await execute(supabase.table("projects").select("id").eq("id", project_id).limit(1))
+        if not project.data:
+            raise HTTPException(404, "Project not found")
+        res = await execute(
+            supabase.table("brand_elements").select("element_type, content, is_selected, created_at")
+            .eq("project_id", project_id).eq("element_type", element_type)
+        )
+        content = edit(pick(res.data or [], element_type))
+        stored = await execute(supabase.table("brand_elements").insert({
+            "project_id": project_id, "element_type": element_type, "content": content, "is_selected": True,
+        }))
+        await execute(
+            supabase.table("brand_elements").update({"is_selected": False})
+            .eq("project_id", project_id).eq("element_type", element_type).neq("id", stored.data[0]["id"])
+        )
+    except APIError as e:
+        raise HTTPException(400, e.message)
+    await invalidate_compliance(project_id) # Stored compliance verdict no longer matches the content
+    project_cache.invalidate(project_id)
+    return stored.data[0]
+
 @app.patch("/api/projects/{project_id}/brand_name")
-def update_brand_name(project_id: str, brand_name: str = Body(...)):
-    res = supabase.table("brand_elements").update({"brand_name": brand_name}).eq("project_id", project_id).execute()
-    if res.error:
-        raise HTTPException(400, res.error.message)
-    return {"success": True}
+async def update_brand_name(project_id: str, brand_name: str = Body(...)):
+    element = await _store_edit(project_id, "brand_name_suggestion", lambda current: {"name": brand_name})
+    return {"success": True, "element": element}
 
 @app.patch("/api/projects/{project_id}/slogan")
-def update_slogan(project_id: str, slogan: str = Body(...)):
-    res = supabase.table("brand_elements").update({"slogan_en": slogan}).eq("project_id", project_id).execute()
-    if res.error:
-        raise HTTPException(400, res.error.message)
-    return {"success": True}
+async def update_slogan(project_id: str, slogan: str = Body(...)):
+    # Replaces the English line; the Bengali one is kept until it is edited or regenerated
+    element = await _store_edit(project_id, "slogan_suggestion", lambda current: {**current, "en": slogan})
+    return {"success": True, "element": element}
+
+def _edit_leaflet(current, text):
+    # The editor shows (and sends back) the first section's text; other sections are kept
+    sections = [dict(section) for section in current.get("sections") or [] if isinstance(section, dict)]
+    if not sections:
+        return {"sections": [{"title": "Leaflet", "content": text}]}
+    sections[0]["content"] = text
+    return {**current, "sections": sections}
 
 @app.patch("/api/projects/{project_id}/leaflet")
-def update_leaflet(project_id: str, leaflet: str = Body(...)):
-    res = supabase.table("brand_elements").update({"leaflet_json": {"sections": [{"title": "Leaflet", "content": leaflet}]}}).eq("project_id", project_id).execute()
-    if res.error:
-        raise HTTPException(400, res.error.message)
-    return {"success": True}
+async def update_leaflet(project_id: str, leaflet: str = Body(...)):
+    element = await _store_edit(project_id, "leaflet_draft", lambda current: _edit_leaflet(current, leaflet))
+    return {"success": True, "element": element}
 
 @app.post("/api/projects/{project_id}/compliance_check")
-def compliance_check(project_id: str):
-    import openai
-    import os
-    openai.api_key = os.getenv("OPENAI_API_KEY")
-    # Fetch leaflet and brand info for this project
-    brand_row = supabase.table("brand_elements").select("brand_name, slogan_en, slogan_bn, leaflet_json").eq("project_id", project_id).single().execute()
-    if not brand_row.data:
+async def compliance_check(project_id: str):
+    # Local DGDA rules run first (microseconds) and reject obvious violations with
+    # per-rule findings; only content the rules can't decide goes to GPT-4o.
+    content = await load_compliance_content(project_id)
+    if content is None:
         raise HTTPException(404, "Brand element not found")
-    brand = brand_row.data
-    leaflet = brand.get("leaflet_json", {})
-    brand_name = brand.get("brand_name", "")
-    slogan_en = brand.get("slogan_en", "")
-    # Compose compliance prompt
-    system_prompt = (
-        "You are a pharmaceutical regulatory compliance expert for Bangladesh DGDA. "
-        "Given the following brand name, slogan, and leaflet sections, check if the content is compliant with DGDA rules for pharmaceutical marketing. "
-        "Respond ONLY with one word: 'approved' or 'rejected'."
+    try:
+        result = await run_compliance_check(project_id, content) # Also invalidates the cached project view
+    except Exception as e:
+        raise HTTPException(400, str(e))
+    return {"success": True, **result}
+
+@app.post("/api/projects/{project_id}/regenerate")
+async def regenerate_project_elements(project_id: str, payload: RegenerateRequest):
+    # Regenerates only the requested element types, using the project's stored insights
+    # as context, and appends the new brand_elements rows next to the existing ones.
+    element_types = list(dict.fromkeys(payload.element_types))
+    if not element_types:
+        raise HTTPException(status_code=400, detail="element_types must not be empty.")
+    res = await execute(
+        supabase.table("projects")
+        .select("id, molecule_names, therapeutic_area, key_differentiating_benefits, brand_elements(element_type, content, is_selected, created_at)")
+        .eq("id", project_id)
+        .order("created_at", foreign_table="brand_elements")
+        .single()
     )
-    user_prompt = f"Brand: {brand_name}\nSlogan: {slogan_en}\nLeaflet: {leaflet}"
+    if not res.data:
+        raise HTTPException(status_code=404, detail="Project not found")
+    project = res.data
+    elements = project.pop("brand_elements", None) or []
     try:
-        response = openai.ChatCompletion.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            temperature=0.0,
-            max_tokens=10
-        )
-        result = response.choices[0].message.content.strip().lower()
-        if "approved" in result:
-            status = "approved"
-        elif "rejected" in result:
-            status = "rejected"
-        else:
-            status = "pending"
-    except Exception:
-        status = "pending"
-    res = supabase.table("brand_elements").update({"compliance_status": status}).eq("project_id", project_id).execute()
-    if res.error:
-        raise HTTPException(400, res.error.message)
-    return {"success": True, "status": status}
+        new_elements = await regenerate_elements(project, elements, element_types)
+    except Exception as e:
+        print(f"Regeneration of {element_types} failed for project {project_id}: {e}")
+        raise HTTPException(status_code=502, detail=f"Failed to regenerate {', '.join(element_types)}: {e}")
+    metrics.record_project_cost("regenerate")
+    stored = await _insert_elements(project_id, new_elements) # Also invalidates the cached project view
+    if set(element_types) & {"brand_name_suggestion", "slogan_suggestion", "leaflet_draft"}:
+        await invalidate_compliance(project_id) # The newest rows are now the checked content
+    schedule_logo_ingestion(project_id, stored)
+    return {"project_id": project_id, "elements": stored}
+
+@app.post("/api/compliance/recheck_stale")
+async def compliance_recheck_stale(limit: int = Query(500, ge=1, le=5000)):
+    # Bulk re-check: only projects whose content hash changed since their last verdict
+    return await recheck_stale(limit=limit)
 
 @app.get("/api/projects/{project_id}/export/pdf")
-def export_leaflet_pdf(project_id: str):
-    # Dummy: return a fake download URL
-    return {"url": f"https://example.com/fake-leaflet-{project_id}.pdf"}
+async def export_leaflet_pdf(project_id: str):
+    # Renders (or reuses the cached render of) the leaflet and streams the file
+    try:
+        exported = await export_pdf(project_id)
+    except Exception as e:
+        print(f"PDF export failed for project {project_id}: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to render leaflet PDF: {e}")
+    if exported is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    path, cached = exported
+    return FileResponse(path, media_type="application/pdf", filename=f"leaflet-{project_id}.pdf", headers={"X-Export-Cache": "hit" if cached else "miss"})
+
+@app.post("/api/projects/export/pdf")
+async def export_portfolio_pdfs(payload: PortfolioExportRequest):
+    # Renders a whole portfolio in parallel across the export process pool
+    if len(payload.project_ids) > 500:
+        raise HTTPException(status_code=400, detail="At most 500 projects per export.")
+    return {"exports": await export_portfolio(payload.project_ids)}
 
 # --- End Iterative Editing & Compliance/Export ---
 
-from fastapi import Request
+@app.get("/api/cache/stats")
+def cache_stats():
+    # Hit/miss counters for the LLM response cache (memory + SQLite tiers)
+    return llm_cache.stats()
+
+@app.get("/api/openai/stats")
+def openai_stats():
+    # Shared OpenAI limiter: calls, retries, 429s, fallbacks and current concurrency limit
+    return openai_limiter.stats()
+
+@app.get("/api/projects/cache/stats")
+def project_cache_stats():
+    # Hit/miss counters for the GET /api/projects/{project_id} read cache
+    return project_cache.stats()
+
+# Columns the dashboard cards need; pass view=full for every column
+PROJECT_CARD_COLUMNS = "id, project_name, molecule_names, therapeutic_area, status, created_at, updated_at"
+PROJECT_PAGE_MAX = 100
 
 @app.get("/api/projects/list")
-def list_projects(request: Request):
-    user_id = request.query_params.get("user_id")
-    query = supabase.table("projects").select("*")
+async def list_projects(
+    user_id: str = Query(None),
+    status: str = Query(None),
+    therapeutic_area: str = Query(None),
+    cursor: str = Query(None),
+    limit: int = Query(20, ge=1, le=PROJECT_PAGE_MAX),
+    view: str = Query("card", pattern="^(card|full)$"),
+):
+    # Newest first, one page at a time: pass the returned next_cursor to get the next page
+    query = supabase.table("projects").select(PROJECT_CARD_COLUMNS if view == "card" else "*")
     if user_id:
         query = query.eq("user_id", user_id)
-    res = query.execute()
-    projects = res.data if res.data else []
-    return {"projects": projects}
-
-@app.get("/api/projects/{project_id}")
-async def get_project(project_id: str): # Changed to async to potentially use async supabase client later if needed
-    # Fetch the main project details
-    project_res = supabase.table("projects").select("*").eq("id", project_id).single().execute()
+    if status:
+        query = query.eq("status", status)
+    if therapeutic_area:
+        query = query.eq("therapeutic_area", therapeutic_area)
+    try:
+        query = apply_keyset(query, cursor, limit)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    res = await execute(query)
+    projects, next_cursor = page(res.data, limit)
+    return {"projects": projects, "next_cursor": next_cursor}
+
+async def load_project_view(project_id: str):
+    # One round trip: the project, its brand elements and its latest compliance check
+    project_res = await execute(
+        supabase.table("projects")
+        .select("*, brand_elements(*), compliance_checks(status, decided_by, stale, created_at)")
+        .eq("id", project_id)
+        .order("created_at", foreign_table="brand_elements")
+        .order("created_at", desc=True, foreign_table="compliance_checks")
+        .limit(1, foreign_table="compliance_checks")
+        .single()
+    )
 
     if not project_res.data:
         raise HTTPException(status_code=404, detail="Project not found")
     project = project_res.data
-
-    # Fetch all associated brand elements for the project
-    brand_elements_res = supabase.table("brand_elements").select("*").eq("project_id", project_id).execute()
-    if brand_elements_res.error:
-        # Log error and potentially raise HTTPException
-        print(f"Error fetching brand elements for project {project_id}: {brand_elements_res.error}")
-        raise HTTPException(status_code=500, detail="Could not fetch brand elements.")
-
-    elements = brand_elements_res.data if brand_elements_res.data else []
+    elements = project.pop("brand_elements", None) or []
+    latest_checks = project.pop("compliance_checks", None) or []
 
     # Reconstruct insights and brand_package from elements
     insights_data = {
@@ -365,19 +534,14 @@ async def get_project(project_id: str): # Changed to async to potentially use as
         elif element_type == "insight_cited_trials":
             insights_data["cited_trials"].extend(content.get("trials", []))
 
-        elif element_type == "brand_name_suggestion":
-            # content is expected to be {"name": "BrandName"}
-            if content.get("name"):
-                brand_package_data["brand_name_suggestions"].append(content)
-        elif element_type == "logo_concept":
-            # content is expected to be {"url": "..."} or similar
-            brand_package_data["logo_concepts"].append(content)
-        elif element_type == "slogan_suggestion":
-            # content is expected to be {"english": "...", "bengali": "..."}
-            brand_package_data["slogans"].append(content)
-        elif element_type == "leaflet_draft":
-            if brand_package_data["leaflet_draft"] is None: # Take the first one
-                brand_package_data["leaflet_draft"] = content # content is the leaflet structure
+    # Regeneration and edits append rows: list the selected (otherwise newest) one first,
+    # which is what the frontend shows, and the compliance check and PDF export use
+    def contents(element_type):
+        return [el.get("content") or {} for el in by_preference(elements, element_type)]
+    brand_package_data["brand_name_suggestions"] = [c for c in contents("brand_name_suggestion") if c.get("name")] # {"name": "BrandName"}
+    brand_package_data["logo_concepts"] = contents("logo_concept") # {"url": "..."}
+    brand_package_data["slogans"] = contents("slogan_suggestion") # {"en": "...", "bn": "..."}
+    brand_package_data["leaflet_draft"] = pick(elements, "leaflet_draft") or None # The leaflet structure
 
     # The frontend page uses `project.name`, `project.molecule`, `project.therapeutic_area`, `project.benefits`
     # These come from the `project` object fetched from the `projects` table.
@@ -412,19 +576,30 @@ async def get_project(project_id: str): # Changed to async to potentially use as
     # Let's rename for frontend compatibility.
     brand_package_data["leaflet_json"] = brand_package_data.pop("leaflet_draft", None)
 
-    # Frontend uses `brand_package.compliance_status`. This needs to be sourced, perhaps from leaflet_json or a separate element.
-    # For now, the `compliance_check` endpoint updates `brand_elements` table, but it was an old structure.
-    # This part needs to be re-thought for the new structure. For now, it will likely be missing or hardcoded.
-    # The old `get_project` took it from `brand_elements[0]["compliance_status"]`.
-    # Let's see if we stored it with leaflet_draft.
-    # No, `create_project` doesn't explicitly store compliance_status.
-    # The `compliance_check` endpoint updates a `compliance_status` field on `brand_elements` table.
-    # We could try to find an element of type 'leaflet_draft' and get a top-level 'compliance_status' from its content if we stored it there.
-    # Or, it could be a separate element_type like 'compliance_info'.
-    # For now, this will be missing from brand_package_data. The frontend will show 'pending'.
+    # Frontend uses `brand_package.compliance_status`: the latest compliance_checks verdict,
+    # unless the content was edited since (stale), in which case it shows 'pending'.
+    latest_check = latest_checks[0] if latest_checks else None
+    if latest_check and not latest_check.get("stale"):
+        brand_package_data["compliance_status"] = latest_check.get("status")
 
     return {
         "project": project,
         "insights": insights_data,
         "brand_package": brand_package_data
     }
+
+@app.get("/api/projects/{project_id}")
+async def get_project(project_id: str, request: Request):
+    # The project page polls this endpoint: serve the assembled view from the read
+    # cache and answer 304 when the client's ETag still matches.
+    cached = project_cache.get(project_id)
+    if cached is None:
+        version = project_cache.version(project_id)
+        body = await load_project_view(project_id)
+        etag = project_cache.set(project_id, body, version)
+    else:
+        etag, body = cached
+    headers = {"ETag": etag, "Cache-Control": "no-cache"} # Always revalidate; unchanged projects cost a 304
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content=body, headers=headers)
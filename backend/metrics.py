@@ -0,0 +1,163 @@
+# Prometheus metrics (GET /metrics) and per-request timing.
+#
+# Stage timers, OpenAI and Supabase calls all record into process-wide Prometheus
+# metrics and, when a Tracker is active (one per HTTP request, job or batch row),
+# into that tracker too. The HTTP middleware in main.py turns the request's tracker
+# into a Server-Timing header, e.g.
+#   Server-Timing: insights;dur=812.4, brand_package;dur=5230.1, openai;dur=5904.2, db;dur=21.7, total;dur=6080.3
+# Durations of overlapping work (e.g. concurrent DALL-E calls) are summed.
+import json
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest
+
+# USD per 1M tokens (prompt / completion) or per image; override with
+# OPENAI_PRICING='{"gpt-4o": {"prompt": 2.5, "completion": 10.0}}'
+DEFAULT_PRICING = {
+    "gpt-4o": {"prompt": 2.50, "completion": 10.00},
+    "dall-e-3": {"image": 0.040},
+    "text-embedding-3-small": {"prompt": 0.02},
+}
+
+def load_pricing():
+    pricing = {model: dict(price) for model, price in DEFAULT_PRICING.items()}
+    try:
+        for model, price in json.loads(os.getenv("OPENAI_PRICING", "{}")).items():
+            pricing.setdefault(model, {}).update(price)
+    except ValueError as e:
+        print(f"Ignoring invalid OPENAI_PRICING: {e}")
+    return pricing
+
+PRICING = load_pricing()
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+COST_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+
+HTTP_SECONDS = Histogram("pharmabrand_http_request_seconds", "HTTP request latency", ["method", "route", "status"], buckets=LATENCY_BUCKETS)
+HTTP_IN_FLIGHT = Gauge("pharmabrand_http_requests_in_flight", "HTTP requests being served")
+STAGE_SECONDS = Histogram("pharmabrand_stage_seconds", "Pipeline stage latency", ["stage"], buckets=LATENCY_BUCKETS)
+STAGE_ERRORS = Counter("pharmabrand_stage_errors_total", "Pipeline stages that raised", ["stage"])
+OPENAI_SECONDS = Histogram("pharmabrand_openai_request_seconds", "OpenAI call latency per attempt (streams: until the last chunk is read)", ["model", "outcome"], buckets=LATENCY_BUCKETS)
+OPENAI_IN_FLIGHT = Gauge("pharmabrand_openai_requests_in_flight", "OpenAI calls in flight", ["model"])
+OPENAI_ERRORS = Counter("pharmabrand_openai_errors_total", "Failed OpenAI call attempts", ["model", "status"])
+OPENAI_RETRIES = Counter("pharmabrand_openai_retries_total", "Retried OpenAI calls", ["model"])
+OPENAI_TOKENS = Counter("pharmabrand_openai_tokens_total", "OpenAI tokens (streamed completions are estimated)", ["model", "kind"])
+OPENAI_IMAGES = Counter("pharmabrand_openai_images_total", "Generated images", ["model"])
+OPENAI_COST = Counter("pharmabrand_openai_cost_usd_total", "Estimated OpenAI spend in USD", ["model"])
+FALLBACKS = Counter("pharmabrand_fallbacks_total", "Placeholder results returned instead of generated content", ["site"])
+DB_SECONDS = Histogram("pharmabrand_db_request_seconds", "Supabase (PostgREST) call latency", ["target", "method"], buckets=LATENCY_BUCKETS)
+DB_IN_FLIGHT = Gauge("pharmabrand_db_requests_in_flight", "Supabase calls in flight")
+DB_ERRORS = Counter("pharmabrand_db_errors_total", "Failed Supabase calls", ["target", "method"])
+IDEMPOTENT_REQUESTS = Counter("pharmabrand_idempotent_requests_total", "Project creations by idempotency outcome (started, coalesced, replayed, conflict)", ["outcome"])
+PROJECT_COST = Histogram("pharmabrand_project_cost_usd", "Estimated OpenAI spend per generated project", ["path"], buckets=COST_BUCKETS)
+
+class Tracker:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.timings = {}  # name -> seconds, in first-recorded order
+        self.cost_usd = 0.0
+
+    def add(self, name, seconds):
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    def server_timing(self):
+        entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.timings.items()]
+        entries.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.1f}")
+        return ", ".join(entries)
+
+_tracker = ContextVar("metrics_tracker", default=None)
+
+@contextmanager
+def track():
+    # Starts a fresh tracker for the enclosed work (and tasks it creates)
+    tracker = Tracker()
+    token = _tracker.set(tracker)
+    try:
+        yield tracker
+    finally:
+        _tracker.reset(token)
+
+def current():
+    return _tracker.get()
+
+def _add(name, seconds):
+    tracker = _tracker.get()
+    if tracker is not None:
+        tracker.add(name, seconds)
+
+@contextmanager
+def timed(stage):
+    # with timed("insights"): ...  (works in sync and async code)
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.labels(stage).inc()
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.labels(stage).observe(elapsed)
+        _add(stage, elapsed)
+
+def cost_of(model, prompt_tokens=0, completion_tokens=0, images=0):
+    price = PRICING.get(model, {})
+    return (
+        prompt_tokens * price.get("prompt", 0.0) / 1e6
+        + completion_tokens * price.get("completion", 0.0) / 1e6
+        + images * price.get("image", 0.0)
+    )
+
+def record_openai_usage(model, prompt_tokens=0, completion_tokens=0, images=0):
+    if prompt_tokens:
+        OPENAI_TOKENS.labels(model, "prompt").inc(prompt_tokens)
+    if completion_tokens:
+        OPENAI_TOKENS.labels(model, "completion").inc(completion_tokens)
+    if images:
+        OPENAI_IMAGES.labels(model).inc(images)
+    cost = cost_of(model, prompt_tokens, completion_tokens, images)
+    if cost:
+        OPENAI_COST.labels(model).inc(cost)
+        tracker = _tracker.get()
+        if tracker is not None:
+            tracker.cost_usd += cost
+
+def record_openai_call(model, seconds, outcome, status=None):
+    OPENAI_SECONDS.labels(model, outcome).observe(seconds)
+    if outcome != "ok":
+        OPENAI_ERRORS.labels(model, str(status or outcome)).inc()
+    _add("openai", seconds)
+
+def record_project_cost(path, tracker=None):
+    tracker = tracker or _tracker.get()
+    if tracker is not None:
+        PROJECT_COST.labels(path).observe(tracker.cost_usd)
+
+def _db_target(query):
+    # "projects", "brand_elements", "rpc/create_projects_with_elements", ...
+    request = getattr(query, "request", None)
+    path = str(getattr(request, "path", "") or "")
+    method = getattr(request, "http_method", None)
+    return path.rsplit("/rest/v1/", 1)[-1] or "unknown", str(getattr(method, "value", method) or "unknown")
+
+@contextmanager
+def timed_db(query):
+    target, method = _db_target(query)
+    DB_IN_FLIGHT.inc()
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        DB_ERRORS.labels(target, method).inc()
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        DB_IN_FLIGHT.dec()
+        DB_SECONDS.labels(target, method).observe(elapsed)
+        _add("db", elapsed)
+
+def render():
+    # (body, content type) for GET /metrics
+    return generate_latest(), CONTENT_TYPE_LATEST
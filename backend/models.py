@@ -0,0 +1,29 @@
+from pydantic import BaseModel
+from typing import List, Literal, Optional
+
+# Updated Pydantic model to match frontend and Supabase schema
+class CreateProjectRequest(BaseModel):
+    project_name: Optional[str] = None
+    molecule_names: Optional[str] = None
+    therapeutic_area: Optional[str] = None
+    key_differentiating_benefits: Optional[str] = None
+    natural_language_prompt: Optional[str] = None
+    regenerate: bool = False # Bypass the LLM response cache and generate fresh content
+
+class ProjectResponse(BaseModel): # Define a response model for clarity
+    id: str # UUID will be string
+    user_id: str
+    project_name: Optional[str] = None
+    molecule_names: Optional[str] = None
+    therapeutic_area: Optional[str] = None
+    key_differentiating_benefits: Optional[str] = None
+    fallbacks: List[str] = [] # Fields that hold placeholder content because generation failed
+    # Add other fields as necessary, e.g., status, created_at
+    # For now, keeping it simple to reflect the created project's core data
+
+class PortfolioExportRequest(BaseModel):
+    project_ids: List[str]
+
+class RegenerateRequest(BaseModel):
+    # Element types to regenerate; new rows are appended next to the existing ones
+    element_types: List[Literal["brand_name_suggestion", "slogan_suggestion", "logo_concept", "leaflet_draft"]]
@@ -0,0 +1,165 @@
+# Shared building blocks for project generation, used by the synchronous
+# /api/projects/create path, the background job workers (jobs.py) and partial
+# regeneration (/api/projects/{project_id}/regenerate).
+from ai.insights import generate_insights
+from ai.brand_package import generate_brand_package
+from ai.regenerate import regenerate_text, regenerate_logos
+from database.db import supabase, execute
+from database.elements import pick
+from metrics import timed
+
+async def run_insights(request, regenerate=False):
+    # request: dict in the shape of CreateProjectRequest
+    with timed("insights"):
+        return await generate_insights(
+            molecule=request.get("molecule_names"),
+            therapeutic_area=request.get("therapeutic_area"),
+            benefits=request.get("key_differentiating_benefits"),
+            prompt=request.get("natural_language_prompt"),
+            regenerate=regenerate
+        )
+
+async def run_brand_package(request, insights, regenerate=False):
+    with timed("brand_package"):
+        return await generate_brand_package(
+            molecule=request.get("molecule_names"),
+            therapeutic_area=request.get("therapeutic_area"),
+            color_palette=insights.get("color_palette"),
+            regenerate=regenerate
+        )
+
+def project_row(user_id, request, status=None):
+    row = {
+        "user_id": user_id,
+        "project_name": request.get("project_name"),
+        "molecule_names": request.get("molecule_names"),
+        "therapeutic_area": request.get("therapeutic_area"),
+        "key_differentiating_benefits": request.get("key_differentiating_benefits"),
+    }
+    if status: # Otherwise the schema default ('draft') applies
+        row["status"] = status
+    return row
+
+def insight_elements(project_id, insights):
+    elements = []
+    if insights.get("competitors"):
+        elements.append({
+            "project_id": project_id, "element_type": "insight_competitors",
+            "content": {"competitors": insights["competitors"]}
+        })
+    if insights.get("brand_positioning"):
+        elements.append({
+            "project_id": project_id, "element_type": "insight_brand_positioning",
+            "content": {"positioning": insights["brand_positioning"]}
+        })
+    if insights.get("color_palette"):
+        elements.append({
+            "project_id": project_id, "element_type": "insight_color_palette",
+            "content": insights["color_palette"] # e.g. {"primary": "#...", "reasoning": "..."}
+        })
+    if insights.get("cited_trials"):
+        elements.append({
+            "project_id": project_id, "element_type": "insight_cited_trials",
+            "content": {"trials": insights["cited_trials"]}
+        })
+    return elements
+
+def brand_package_elements(project_id, brand_package):
+    elements = []
+    for name_str in brand_package.get("brand_names", []): # brand_names is list of strings
+        elements.append({
+            "project_id": project_id, "element_type": "brand_name_suggestion",
+            "content": {"name": name_str} # Store as a dict in content
+        })
+    for logo_url_dict in brand_package.get("logo_concepts", []): # logo_concepts is list of {"url": "..."}
+        elements.append({
+            "project_id": project_id, "element_type": "logo_concept",
+            "content": logo_url_dict # Store {"url": "..."}
+        })
+    # generate_brand_package returns "slogans": [{"en": slogan_en, "bn": slogan_bn}]
+    for slogan_pair in brand_package.get("slogans", []):
+        elements.append({
+            "project_id": project_id, "element_type": "slogan_suggestion",
+            "content": slogan_pair
+        })
+    if brand_package.get("leaflet_json"):
+        elements.append({
+            "project_id": project_id, "element_type": "leaflet_draft", # Keep element_type as "leaflet_draft" for consistency
+            "content": brand_package["leaflet_json"]
+        })
+    return elements
+
+def build_brand_elements(project_id, insights, brand_package):
+    # Store brand elements (names, logos, slogans, leaflet, insights)
+    return insight_elements(project_id, insights) + brand_package_elements(project_id, brand_package)
+
+def stored_insights(elements):
+    # Inverse of insight_elements(): the insights dict rebuilt from stored insight_* rows
+    insights = {"competitors": [], "brand_positioning": None, "color_palette": None, "cited_trials": []}
+    for el in elements:
+        content = el.get("content") or {}
+        element_type = el.get("element_type")
+        if element_type == "insight_competitors":
+            insights["competitors"].extend(content.get("competitors", []))
+        elif element_type == "insight_brand_positioning" and insights["brand_positioning"] is None:
+            insights["brand_positioning"] = content.get("positioning")
+        elif element_type == "insight_color_palette" and insights["color_palette"] is None:
+            insights["color_palette"] = content
+        elif element_type == "insight_cited_trials":
+            insights["cited_trials"].extend(content.get("trials", []))
+    return insights
+
+def existing_suggestions(elements):
+    # What the project already has, so regenerated content doesn't repeat it
+    names = [(el.get("content") or {}).get("name") for el in elements if el.get("element_type") == "brand_name_suggestion"]
+    names = [n for n in names if n]
+    slogans = [(el.get("content") or {}).get("en") or (el.get("content") or {}).get("english")
+               for el in elements if el.get("element_type") == "slogan_suggestion"]
+    return {
+        "brand_name": pick(elements, "brand_name_suggestion").get("name"),
+        "brand_names": names,
+        "slogans": [s for s in slogans if s],
+    }
+
+async def regenerate_elements(project, elements, element_types):
+    # New brand_elements rows (not yet stored) for just the requested types. Text
+    # types share one small LLM call; logos are drawn for the newly generated names
+    # if names were requested too, otherwise for the selected (or first) brand name.
+    insights = stored_insights(elements)
+    existing = existing_suggestions(elements)
+    text_types = [t for t in element_types if t != "logo_concept"]
+    brand_package = {}
+    if text_types:
+        brand_package = await regenerate_text(text_types, project, insights, existing)
+    if "logo_concept" in element_types:
+        names = brand_package.get("brand_names") or ([existing["brand_name"]] if existing["brand_name"] else [])
+        if not names:
+            raise ValueError("Project has no brand name to draw a logo for.")
+        brand_package["logo_concepts"] = await regenerate_logos(names, project.get("therapeutic_area"), insights.get("color_palette"))
+        if not brand_package["logo_concepts"]:
+            raise RuntimeError("Logo generation failed.")
+    return brand_package_elements(project["id"], brand_package)
+
+async def persist_projects(items):
+    # items: list of (project_row, elements). Writes every project and all of their
+    # brand elements in one transaction via the create_projects_with_elements
+    # function (database/supabase_schemas.sql). Returns the stored project rows, in
+    # input order, each with its stored rows under "brand_elements".
+    payload = [
+        {
+            "project": row,
+            "elements": [{"element_type": el["element_type"], "content": el.get("content")} for el in elements],
+        }
+        for row, elements in items
+    ]
+    with timed("persist"):
+        res = await execute(supabase.rpc("create_projects_with_elements", {"p_projects": payload}))
+    created = res.data or []
+    if len(created) != len(items):
+        raise RuntimeError(f"Failed to store projects: {getattr(res, 'error', None)}")
+    return created
+
+async def persist_project(user_id, request, insights, brand_package, status=None):
+    # Elements are built without a project id; the database function assigns it
+    elements = build_brand_elements(None, insights, brand_package)
+    return (await persist_projects([(project_row(user_id, request, status=status), elements)]))[0]
@@ -0,0 +1,54 @@
+# Run from backend/ (python -m pytest) or the repo root: modules import each other
+# as top-level packages (ai.cache, database.pagination, ...), as they do under uvicorn.
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# API tests (test_api.py) run the app against bench/fake_postgrest.py through the real
+# supabase client, which database/db.py creates at import time: point it at the fake
+# before anything imports it, and keep the app's on-disk caches out of the tree.
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+POSTGREST_PORT = _free_port()
+os.environ["SUPABASE_URL"] = f"http://127.0.0.1:{POSTGREST_PORT}"
+os.environ["SUPABASE_SERVICE_ROLE_KEY"] = "test-service-role-key"
+_cache_root = tempfile.mkdtemp(prefix="pharma-tests-")
+os.environ["LLM_CACHE_PATH"] = os.path.join(_cache_root, "llm_cache.sqlite3")
+os.environ["ASSET_ROOT"] = os.path.join(_cache_root, "assets")
+os.environ["EXPORT_CACHE_DIR"] = os.path.join(_cache_root, "exports")
+os.environ["KNOWLEDGE_INDEX_DIR"] = os.path.join(_cache_root, "knowledge")
+
+@pytest.fixture(scope="session")
+def postgrest_server():
+    import uvicorn
+    from bench.fake_postgrest import Store, create_app
+    from bench.profile import Profile
+
+    store = Store()
+    server = uvicorn.Server(uvicorn.Config(create_app(Profile(), store), host="127.0.0.1", port=POSTGREST_PORT, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while not server.started:
+        if time.monotonic() > deadline or not thread.is_alive():
+            raise RuntimeError("fake PostgREST did not start")
+        time.sleep(0.01)
+    yield store
+    server.should_exit = True
+    thread.join(timeout=5)
+
+@pytest.fixture
+def store(postgrest_server):
+    # The fake's tables, emptied for each test
+    postgrest_server.tables.clear()
+    return postgrest_server
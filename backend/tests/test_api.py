@@ -0,0 +1,130 @@
+# HTTP endpoints against the fake PostgREST (see conftest.py). No job workers are
+# started (the TestClient is not used as a context manager) and no OpenAI calls are
+# made: compliance.service.llm_verdict is replaced where a verdict reaches the LLM.
+import pytest
+from fastapi.testclient import TestClient
+
+import compliance.service
+import main
+from compliance.rules import REQUIRED_LEAFLET_SECTIONS
+
+LEAFLET = {"sections": [{"title": title, "content": f"{title} text."} for title in REQUIRED_LEAFLET_SECTIONS]}
+
+@pytest.fixture
+def client():
+    return TestClient(main.app)
+
+@pytest.fixture
+def llm_verdicts(monkeypatch):
+    calls = []
+
+    async def approve(content):
+        calls.append(content)
+        return "approved", False
+
+    monkeypatch.setattr(compliance.service, "llm_verdict", approve)
+    return calls
+
+def create_project(store):
+    project = store.insert("projects", {"user_id": "demo-user-fixme", "project_name": "Test", "molecule_names": "Empagliflozin", "status": "completed"})
+    for element_type, content in (
+        ("brand_name_suggestion", {"name": "Glucora"}),
+        ("brand_name_suggestion", {"name": "Steadia"}),
+        ("slogan_suggestion", {"en": "Steady days, every day.", "bn": "প্রতিদিন স্থির দিন।"}),
+        ("leaflet_draft", LEAFLET),
+    ):
+        store.insert("brand_elements", {"project_id": project["id"], "element_type": element_type, "content": content})
+    return project["id"]
+
+def test_edited_slogan_is_what_the_compliance_check_sees(client, store, llm_verdicts):
+    project_id = create_project(store)
+    assert client.post(f"/api/projects/{project_id}/compliance_check").json()["status"] == "approved"
+
+    res = client.patch(f"/api/projects/{project_id}/slogan", json="The best choice for steady days.")
+
+    assert res.status_code == 200
+    assert res.json()["element"]["content"] == {"en": "The best choice for steady days.", "bn": "প্রতিদিন স্থির দিন।"}
+    assert all(check["stale"] for check in store.rows("compliance_checks"))
+    check = client.post(f"/api/projects/{project_id}/compliance_check").json()
+    assert (check["status"], check["decided_by"], check["cached"]) == ("rejected", "rules", False)
+    assert [finding["rule"] for finding in check["findings"]] == ["superlative_claim"]
+    assert len(llm_verdicts) == 1
+
+def test_edits_are_selected_and_shown(client, store, llm_verdicts):
+    project_id = create_project(store)
+
+    assert client.patch(f"/api/projects/{project_id}/brand_name", json="Glucora Plus").status_code == 200
+    assert client.patch(f"/api/projects/{project_id}/leaflet", json="Edited introduction.").status_code == 200
+
+    package = client.get(f"/api/projects/{project_id}").json()["brand_package"]
+    assert package["brand_name_suggestions"][0] == {"name": "Glucora Plus"}
+    assert len(package["brand_name_suggestions"]) == 3  # The generated names are kept
+    assert package["leaflet_json"]["sections"][0]["content"] == "Edited introduction."
+    assert package["leaflet_json"]["sections"][1:] == LEAFLET["sections"][1:]
+    selected = [el for el in store.rows("brand_elements") if el["is_selected"]]
+    assert sorted(el["element_type"] for el in selected) == ["brand_name_suggestion", "leaflet_draft"]
+    client.post(f"/api/projects/{project_id}/compliance_check")
+    assert llm_verdicts[-1]["brand_name"] == "Glucora Plus"
+
+def test_second_edit_replaces_the_selection(client, store):
+    project_id = create_project(store)
+
+    client.patch(f"/api/projects/{project_id}/brand_name", json="First")
+    client.patch(f"/api/projects/{project_id}/brand_name", json="Second")
+
+    selected = [el["content"] for el in store.rows("brand_elements") if el["is_selected"]]
+    assert selected == [{"name": "Second"}]
+
+def test_edit_of_unknown_project(client, store):
+    res = client.patch("/api/projects/00000000-0000-0000-0000-000000000000/slogan", json="Steady days.")
+
+    assert res.status_code == 404
+    assert store.rows("brand_elements") == []
+
+@pytest.mark.parametrize("path, body", [("brand_name", "Glucora Plus"), ("slogan", "Calm days."), ("leaflet", "Edited introduction.")])
+def test_edit_changes_the_project_etag(client, store, path, body):
+    project_id = create_project(store)
+    etag = client.get(f"/api/projects/{project_id}").headers["etag"]
+    assert client.get(f"/api/projects/{project_id}", headers={"If-None-Match": etag}).status_code == 304
+
+    client.patch(f"/api/projects/{project_id}/{path}", json=body)
+
+    res = client.get(f"/api/projects/{project_id}", headers={"If-None-Match": etag})
+    assert res.status_code == 200
+    assert res.headers["etag"] != etag
+    assert body in str(res.json()["brand_package"])
+
+def job_request(name):
+    # Distinct names, so the idempotency store never replays another test's result
+    return {"project_name": name, "molecule_names": "Empagliflozin", "therapeutic_area": "Diabetes"}
+
+def test_full_queue_refuses_before_writing(client, store, monkeypatch):
+    monkeypatch.setattr(main.job_manager, "has_capacity", lambda: False)
+
+    res = client.post("/api/projects/create?mode=job", json=job_request("Refused"))
+
+    assert res.status_code == 503
+    assert store.rows("projects") == [] and store.rows("generation_jobs") == []
+
+def test_queue_filling_after_the_check_still_accepts_the_job(client, store, monkeypatch):
+    def full(job_id):
+        raise main.JobQueueFull("Generation queue is full")
+    monkeypatch.setattr(main.job_manager, "has_capacity", lambda: True)
+    monkeypatch.setattr(main.job_manager, "submit", full)
+
+    res = client.post("/api/projects/create?mode=job", json=job_request("Raced"))
+
+    assert res.status_code == 202
+    job = store.rows("generation_jobs")[0]
+    assert res.json()["job_id"] == job["id"] and job["status"] == "queued"  # Left for the resume scan
+
+def test_failed_job_insert_marks_the_project_failed(client, store, monkeypatch):
+    async def broken(project_id, request):
+        raise RuntimeError("insert failed")
+    monkeypatch.setattr(main.job_manager, "has_capacity", lambda: True)
+    monkeypatch.setattr(main, "create_job", broken)
+
+    res = client.post("/api/projects/create?mode=job", json=job_request("Broken"))
+
+    assert res.status_code == 500
+    assert [project["status"] for project in store.rows("projects")] == ["failed"]
@@ -0,0 +1,119 @@
+# Batch project creation (batch.py): parsing, duplicate rows, bounded parallelism and
+# flushes, with the pipeline stages and the transactional write replaced by fakes.
+import asyncio
+
+import pytest
+
+import batch
+from batch import BatchParseError, parse_rows, run_batch
+
+class FakePipeline:
+    def __init__(self, fail_molecules=(), fail_names=()):
+        self.fail_molecules = set(fail_molecules)
+        self.fail_names = set(fail_names)
+        self.generated = []  # project_name per generation run
+        self.flushes = []  # project_names per persist_projects call
+        self.active = self.peak = 0
+
+    async def run_insights(self, request, regenerate=False):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(0.01)
+            if request["molecule_names"] in self.fail_molecules:
+                raise RuntimeError("insights failed")
+            self.generated.append(request["project_name"])
+            return {"competitors": ["Dapagliflozin"]}
+        finally:
+            self.active -= 1
+
+    async def run_brand_package(self, request, insights, regenerate=False):
+        return {"brand_names": ["Glucora"]}
+
+    async def persist_projects(self, items):
+        names = [row["project_name"] for row, _ in items]
+        self.flushes.append(names)
+        if self.fail_names & set(names):
+            raise RuntimeError("value too long for type character varying(255)")
+        return [{"id": f"id-{name}", "brand_elements": []} for name in names]
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    fake = FakePipeline()
+    monkeypatch.setattr(batch, "run_insights", fake.run_insights)
+    monkeypatch.setattr(batch, "run_brand_package", fake.run_brand_package)
+    monkeypatch.setattr(batch, "persist_projects", fake.persist_projects)
+    monkeypatch.setattr(batch, "schedule_logo_ingestion", lambda project_id, elements: None)
+    return fake
+
+def row(name, molecule="Empagliflozin", area="Diabetes"):
+    return {"project_name": name, "molecule_names": molecule, "therapeutic_area": area}
+
+def run(rows):
+    async def collect():
+        return [result async for result in run_batch("user-1", rows)]
+    return sorted(asyncio.run(collect()), key=lambda result: result["row"])
+
+def test_parse_jsonl_keeps_bad_lines_in_place():
+    rows = parse_rows(b'{"project_name": "A"}\n\nnot json\n{"project_name": "B"}\n', "application/x-ndjson")
+
+    assert rows[0] == {"project_name": "A"} and rows[2] == {"project_name": "B"}
+    assert isinstance(rows[1], BatchParseError) and "line 3" in str(rows[1])
+
+def test_parse_csv_strips_cells():
+    rows = parse_rows("﻿project_name, molecule_names\n A ,Empagliflozin\nB,\n".encode(), "text/csv")
+
+    assert rows == [{"project_name": "A", "molecule_names": "Empagliflozin"}, {"project_name": "B", "molecule_names": None}]
+
+def test_parse_rejects_oversized_batches(monkeypatch):
+    monkeypatch.setattr(batch, "BATCH_MAX_ROWS", 2)
+
+    with pytest.raises(BatchParseError):
+        parse_rows(b"{}\n{}\n{}\n", "application/x-ndjson")
+
+def test_duplicate_rows_are_generated_and_stored_once(pipeline):
+    results = run([row("Launch"), row("Launch", molecule="  EMPAGLIFLOZIN "), row("Other")])
+
+    assert sorted(pipeline.generated) == ["Launch", "Other"]
+    assert results[0] == {"row": 0, "status": "created", "project_id": "id-Launch"}
+    assert results[1] == {"row": 1, "status": "created", "project_id": "id-Launch", "duplicate_of": 0}
+    assert results[2]["project_id"] == "id-Other"
+
+def test_names_differing_in_case_are_separate_projects(pipeline):
+    results = run([row("Glucora"), row("GLUCORA")])
+
+    assert sorted(pipeline.generated) == ["GLUCORA", "Glucora"]
+    assert [result["project_id"] for result in results] == ["id-Glucora", "id-GLUCORA"]
+
+def test_invalid_rows_fail_alone(pipeline):
+    results = run([row("Good"), {"project_name": "No molecule"}, "not an object"])
+
+    assert [result["status"] for result in results] == ["created", "error", "error"]
+
+def test_generation_is_bounded_and_flushed_in_chunks(pipeline, monkeypatch):
+    monkeypatch.setattr(batch, "BATCH_CONCURRENCY", 2)
+    monkeypatch.setattr(batch, "BATCH_FLUSH_SIZE", 2)
+
+    results = run([row(f"P{n}", molecule=f"mol-{n}") for n in range(5)])
+
+    assert pipeline.peak == 2
+    assert [len(names) for names in pipeline.flushes] == [2, 2, 1]
+    assert all(result["status"] == "created" for result in results)
+
+def test_failed_flush_is_retried_row_by_row(pipeline, monkeypatch):
+    monkeypatch.setattr(batch, "BATCH_FLUSH_SIZE", 3)
+    pipeline.fail_names = {"Bad"}
+
+    results = run([row("A", molecule="a"), row("Bad", molecule="b"), row("C", molecule="c")])
+
+    assert len(pipeline.flushes) == 4  # The failed batch of 3, then each row on its own
+    assert [result["status"] for result in results] == ["created", "error", "created"]
+    assert "Database write failed" in results[1]["detail"]
+
+def test_failed_generation_fails_every_duplicate(pipeline):
+    pipeline.fail_molecules = {"broken"}
+
+    results = run([row("X", molecule="broken"), row("X", molecule="broken"), row("Y")])
+
+    assert [result["status"] for result in results] == ["error", "error", "created"]
+    assert pipeline.flushes == [["Y"]]
@@ -0,0 +1,28 @@
+# Choosing the current brand_elements row (database/elements.py).
+from database.elements import by_preference, chosen, pick
+
+def element(name, created_at, selected=False, element_type="brand_name_suggestion"):
+    return {"element_type": element_type, "content": {"name": name}, "is_selected": selected, "created_at": created_at}
+
+OLD = element("Old", "2026-10-01T08:00:00+00:00")
+NEW = element("New", "2026-10-02T08:00:00+00:00")
+PICKED = element("Picked", "2026-09-30T08:00:00+00:00", selected=True)
+SLOGAN = element("Slogan", "2026-10-03T08:00:00+00:00", element_type="slogan_suggestion")
+
+def test_newest_row_wins_without_a_selection():
+    assert pick([NEW, OLD, SLOGAN], "brand_name_suggestion") == {"name": "New"}
+    assert [el["content"]["name"] for el in by_preference([OLD, SLOGAN, NEW], "brand_name_suggestion")] == ["New", "Old"]
+
+def test_selected_row_wins_over_newer_rows():
+    assert pick([OLD, NEW, PICKED], "brand_name_suggestion") == {"name": "Picked"}
+    assert chosen([OLD, NEW, PICKED], "brand_name_suggestion") == [PICKED]
+    assert chosen([OLD, NEW], "brand_name_suggestion") == [NEW, OLD]
+
+def test_later_rows_win_timestamp_ties():
+    first, second = element("First", None), element("Second", None)
+
+    assert pick([first, second], "brand_name_suggestion") == {"name": "Second"}
+
+def test_missing_type():
+    assert pick([OLD], "leaflet_draft") == {}
+    assert chosen([], "leaflet_draft") == []
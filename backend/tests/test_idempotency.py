@@ -0,0 +1,134 @@
+# Single-flight coalescing and replay of project creation (idempotency.py).
+import asyncio
+
+import pytest
+
+from idempotency import IdempotencyConflict, IdempotencyStore
+
+class Generation:
+    # Counts how often the pipeline actually ran; each run waits until released
+    def __init__(self, result="project-1", error=None):
+        self.result = result
+        self.error = error
+        self.runs = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.runs += 1
+        await self.release.wait()
+        if self.error:
+            raise self.error
+        return self.result
+
+def test_concurrent_duplicates_share_one_generation():
+    async def scenario():
+        store, generation = IdempotencyStore(), Generation()
+        callers = [asyncio.create_task(store.run("key", "payload", 30, generation)) for _ in range(5)]
+        await asyncio.sleep(0)
+        generation.release.set()
+        results = await asyncio.gather(*callers)
+        return generation.runs, results
+
+    runs, results = asyncio.run(scenario())
+
+    assert runs == 1
+    assert [result for result, _ in results] == ["project-1"] * 5
+    assert [replayed for _, replayed in results] == [False, True, True, True, True]
+
+def test_finished_result_is_replayed_until_it_expires():
+    async def scenario():
+        store, generation = IdempotencyStore(), Generation()
+        generation.release.set()
+        first = await store.run("key", "payload", 0.05, generation)
+        replay = await store.run("key", "payload", 0.05, generation)
+        await asyncio.sleep(0.06)
+        after_expiry = await store.run("key", "payload", 0.05, generation)
+        return first, replay, after_expiry, generation.runs
+
+    first, replay, after_expiry, runs = asyncio.run(scenario())
+
+    assert first == ("project-1", False)
+    assert replay == ("project-1", True)
+    assert after_expiry == ("project-1", False)
+    assert runs == 2
+
+def test_failure_is_shared_but_not_kept():
+    async def scenario():
+        store, generation = IdempotencyStore(), Generation(error=RuntimeError("insights failed"))
+        callers = [asyncio.create_task(store.run("key", "payload", 30, generation)) for _ in range(3)]
+        await asyncio.sleep(0)
+        generation.release.set()
+        outcomes = await asyncio.gather(*callers, return_exceptions=True)
+        generation.error = None
+        retry = await store.run("key", "payload", 30, generation)
+        return outcomes, retry, generation.runs
+
+    outcomes, retry, runs = asyncio.run(scenario())
+
+    assert all(isinstance(outcome, RuntimeError) for outcome in outcomes)
+    assert retry == ("project-1", False)
+    assert runs == 2
+
+def test_reused_key_with_a_different_payload_conflicts():
+    async def scenario():
+        store, generation = IdempotencyStore(), Generation()
+        generation.release.set()
+        await store.run("key", "payload", 30, generation)
+        await store.run("key", "other payload", 30, generation)
+
+    with pytest.raises(IdempotencyConflict):
+        asyncio.run(scenario())
+
+def test_cancelled_caller_does_not_cancel_the_shared_generation():
+    async def scenario():
+        store, generation = IdempotencyStore(), Generation()
+        impatient = asyncio.create_task(store.run("key", "payload", 30, generation))
+        patient = asyncio.create_task(store.run("key", "payload", 30, generation))
+        await asyncio.sleep(0)
+        impatient.cancel()
+        generation.release.set()
+        return await patient, generation.runs
+
+    assert asyncio.run(scenario()) == (("project-1", True), 1)
+
+def test_streams_replay_from_the_start_and_follow_live():
+    async def scenario():
+        store = IdempotencyStore()
+        release, runs = asyncio.Event(), []
+
+        async def events():
+            runs.append(1)
+            yield "project"
+            await release.wait()
+            yield "done"
+
+        async def collect():
+            return [event async for event in store.stream("key", "payload", 30, events)]
+
+        first = asyncio.create_task(collect())
+        await asyncio.sleep(0.01)  # The first event has been produced
+        late = asyncio.create_task(collect())
+        await asyncio.sleep(0)
+        release.set()
+        return await first, await late, len(runs)
+
+    first, late, runs = asyncio.run(scenario())
+
+    assert first == late == ["project", "done"]
+    assert runs == 1
+
+def test_eviction_keeps_running_flights():
+    async def scenario():
+        store, running = IdempotencyStore(max_entries=2), Generation()
+        pending = asyncio.create_task(store.run("running", "payload", 30, running))
+        await asyncio.sleep(0)
+        for n in range(3):
+            done = Generation(result=n)
+            done.release.set()
+            await store.run(f"done-{n}", "payload", 30, done)
+        keys = list(store._flights)
+        running.release.set()
+        await pending
+        return keys
+
+    assert asyncio.run(scenario()) == ["running", "done-2"]
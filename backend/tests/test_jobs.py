@@ -0,0 +1,128 @@
+# Generation jobs (jobs.py) against the fake PostgREST: claiming, lease fencing on
+# the attempts count, heartbeats and resuming from a checkpoint.
+import asyncio
+
+import pytest
+
+import jobs
+from jobs import JobLeaseLost, _claim_job, _keep_lease, _now, _update_job, initial_progress, run_job
+
+class FakeStages:
+    def __init__(self):
+        self.ran = []
+        self.during_insights = None  # Called while the insights stage runs
+
+    async def run_insights(self, request, regenerate=False):
+        self.ran.append("insights")
+        if self.during_insights:
+            self.during_insights()
+        return {"competitors": ["Dapagliflozin"]}
+
+    async def run_brand_package(self, request, insights, regenerate=False):
+        self.ran.append("brand_package")
+        return {"brand_names": ["Glucora"], "slogans": [{"en": "Steady days.", "bn": "স্থির দিন।"}]}
+
+@pytest.fixture
+def stages(monkeypatch):
+    fake = FakeStages()
+    monkeypatch.setattr(jobs, "run_insights", fake.run_insights)
+    monkeypatch.setattr(jobs, "run_brand_package", fake.run_brand_package)
+    monkeypatch.setattr(jobs, "schedule_logo_ingestion", lambda project_id, elements: None)
+    return fake
+
+def create_job(store, **fields):
+    project = store.insert("projects", {"user_id": "user-1", "project_name": "Job", "status": "in_progress"})
+    job = store.insert("generation_jobs", {
+        "project_id": project["id"], "request": {"molecule_names": "Empagliflozin"},
+        "progress": initial_progress(), "outputs": {}, **fields,
+    })
+    return job, project
+
+def row(store, table, row_id):
+    return next(r for r in store.rows(table) if r["id"] == row_id)
+
+def test_job_runs_every_stage_and_persists(store, stages):
+    job, project = create_job(store)
+
+    asyncio.run(run_job(job["id"]))
+
+    stored = row(store, "generation_jobs", job["id"])
+    assert (stored["status"], stored["stage"], stored["attempts"], stored["lease_expires_at"]) == ("completed", "persist", 1, None)
+    assert row(store, "projects", project["id"])["status"] == "completed"
+    assert sorted(el["element_type"] for el in store.rows("brand_elements")) == ["brand_name_suggestion", "insight_competitors", "slogan_suggestion"]
+
+def test_concurrent_claims_have_one_winner(store):
+    job, _ = create_job(store)
+
+    async def claim_all():
+        return await asyncio.gather(*(_claim_job(dict(job)) for _ in range(5)))
+
+    attempts = asyncio.run(claim_all())
+
+    assert sorted(attempts, key=lambda a: a or 0) == [None, None, None, None, 1]
+    assert row(store, "generation_jobs", job["id"])["attempts"] == 1
+
+def test_live_lease_is_not_taken_over_but_an_expired_one_is(store):
+    live, _ = create_job(store, status="running", attempts=1, lease_expires_at=_now(60))
+    expired, _ = create_job(store, status="running", attempts=1, lease_expires_at=_now(-1))
+
+    assert asyncio.run(_claim_job(live)) is None
+    assert asyncio.run(_claim_job(expired)) == 2
+    assert row(store, "generation_jobs", expired["id"])["attempts"] == 2
+
+def test_writes_are_fenced_on_attempts(store):
+    job, _ = create_job(store, status="running", attempts=1, lease_expires_at=_now(-1))
+
+    async def scenario():
+        taken_over = await _claim_job(job)  # Another worker claims the expired lease
+        await _update_job(job["id"], {"stage": "insights"}, taken_over)
+        with pytest.raises(JobLeaseLost):
+            await _update_job(job["id"], {"stage": "persist"}, 1)
+
+    asyncio.run(scenario())
+
+    assert row(store, "generation_jobs", job["id"])["stage"] == "insights"
+
+def test_worker_whose_lease_was_taken_over_stops_at_its_next_checkpoint(store, stages):
+    job, project = create_job(store)
+
+    def take_over():
+        row(store, "generation_jobs", job["id"]).update({"attempts": 2, "lease_expires_at": _now(60)})
+    stages.during_insights = take_over
+
+    asyncio.run(run_job(job["id"]))
+
+    stored = row(store, "generation_jobs", job["id"])
+    assert (stored["status"], stored["attempts"], stored.get("stage")) == ("running", 2, None)
+    assert stages.ran == ["insights"]
+    assert store.rows("brand_elements") == []
+    assert row(store, "projects", project["id"])["status"] == "in_progress"
+
+def test_resumes_after_the_last_checkpoint(store, stages):
+    outputs = {"insights": {"competitors": []}, "brand_package": {"brand_names": ["Glucora"]}}
+    job, project = create_job(store, status="running", attempts=1, lease_expires_at=_now(-1), stage="brand_package", outputs=outputs)
+
+    asyncio.run(run_job(job["id"]))
+
+    assert stages.ran == []
+    stored = row(store, "generation_jobs", job["id"])
+    assert (stored["status"], stored["attempts"]) == ("completed", 2)
+    assert [el["content"] for el in store.rows("brand_elements")] == [{"name": "Glucora"}]
+
+def test_heartbeat_renews_until_the_lease_is_lost(store, monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_LEASE_SECONDS", 0.3)
+    job, _ = create_job(store)
+
+    async def scenario():
+        attempt = await _claim_job(job)
+        claimed_until = row(store, "generation_jobs", job["id"])["lease_expires_at"]
+        heartbeat = asyncio.create_task(_keep_lease(job["id"], attempt))
+        await asyncio.sleep(0.25)
+        renewed_until = row(store, "generation_jobs", job["id"])["lease_expires_at"]
+        row(store, "generation_jobs", job["id"])["attempts"] = attempt + 1  # Taken over
+        await asyncio.wait_for(heartbeat, 1)  # Returns on its next renewal
+        return claimed_until, renewed_until
+
+    claimed_until, renewed_until = asyncio.run(scenario())
+
+    assert renewed_until > claimed_until
@@ -0,0 +1,92 @@
+# IncrementalJSONParser (ai/json_stream.py): a streamed completion must parse the same
+# however the API happens to split it into chunks.
+import json
+import random
+
+import pytest
+
+from ai.json_stream import IncrementalJSONParser
+
+DOCUMENT = "```json\n" + json.dumps({
+    "brand_names": ["Glucora", "Empa, XR]", "Sugar \"Zero\"", "Steady[1]"],
+    "slogan_en": "Steady days, {every} day.",
+    "slogan_bn": "স্থির দিন, প্রতিদিন।",
+    "leaflet_json": {"sections": [{"title": "Introduction", "content": "Once daily, with or without food."}]},
+    "dose_mg": 10,
+    "approved": True,
+}, ensure_ascii=False, indent=2) + "\n```"
+
+def feed_in_chunks(text, sizes):
+    parser = IncrementalJSONParser(watch_arrays=("brand_names",))
+    events, pos = [], 0
+    for size in sizes:
+        events += parser.feed(text[pos:pos + size])
+        pos += size
+    events += parser.feed(text[pos:])
+    return parser, events
+
+def random_sizes(seed, total):
+    rng = random.Random(seed)
+    sizes = []
+    while sum(sizes) < total:
+        sizes.append(rng.randint(1, 12))
+    return sizes
+
+def test_whole_document():
+    parser, events = feed_in_chunks(DOCUMENT, [])
+
+    expected = json.loads(DOCUMENT.strip("`").removeprefix("json"))
+    assert parser.complete and not parser.errors
+    assert parser.result == expected
+    assert parser.items == {"brand_names": expected["brand_names"]}
+    assert [event for event in events if event[0] == "item"] == [("item", "brand_names", name) for name in expected["brand_names"]]
+
+@pytest.mark.parametrize("seed", range(20))
+def test_random_chunk_sizes_give_the_same_result(seed):
+    whole, whole_events = feed_in_chunks(DOCUMENT, [])
+
+    parser, events = feed_in_chunks(DOCUMENT, random_sizes(seed, len(DOCUMENT)))
+
+    assert parser.complete and not parser.errors
+    assert parser.result == whole.result
+    assert parser.items == whole.items
+    assert events == whole_events
+
+def test_one_character_at_a_time():
+    whole, _ = feed_in_chunks(DOCUMENT, [])
+
+    parser, _ = feed_in_chunks(DOCUMENT, [1] * len(DOCUMENT))
+
+    assert parser.result == whole.result and parser.items == whole.items
+
+def test_delimiters_inside_strings_do_not_split_items():
+    parser, _ = feed_in_chunks('{"brand_names": ["a, b", "c]", "d\\"], e"], "x": "}, {"}', [3, 5, 7])
+
+    assert parser.items["brand_names"] == ["a, b", "c]", 'd"], e']
+    assert parser.result == {"brand_names": ["a, b", "c]", 'd"], e'], "x": "}, {"}
+    assert parser.complete
+
+def test_truncated_tail_keeps_what_was_completed():
+    cut = DOCUMENT.index('"Steady[1]"') + 4  # Inside the last brand name
+
+    parser, _ = feed_in_chunks(DOCUMENT[:cut], random_sizes(0, cut))
+
+    assert not parser.complete
+    assert parser.items["brand_names"] == ["Glucora", "Empa, XR]", 'Sugar "Zero"']
+    assert parser.result == {}  # brand_names itself never closed
+
+def test_truncated_after_members():
+    cut = DOCUMENT.index('"leaflet_json"')
+
+    parser, _ = feed_in_chunks(DOCUMENT[:cut], [])
+
+    assert not parser.complete
+    assert set(parser.result) == {"brand_names", "slogan_en", "slogan_bn"}
+
+def test_malformed_member_is_reported_and_skipped():
+    parser, events = feed_in_chunks('{"a": 1, "b": nope, "c": "ok"}', [])
+
+    assert parser.complete
+    assert parser.result == {"a": 1, "c": "ok"}
+    assert len(parser.errors) == 1
+    assert [event[1] for event in events] == ["a", "c"]
@@ -0,0 +1,71 @@
+# Local vector index (knowledge/index.py): add, search and reopening from disk.
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from ai.embeddings import EMBEDDING_DIM
+from knowledge.chunking import chunk_record
+from knowledge.index import VectorIndex
+
+def vector(*hot):
+    v = np.zeros(EMBEDDING_DIM, np.float32)
+    for i, weight in hot:
+        v[i] = weight
+    return v
+
+def chunk(title, kind="market", **meta):
+    return chunk_record({"title": title, "text": f"{title} text", **meta}, source="test", kind=kind)[0]
+
+@pytest.fixture
+def index(tmp_path):
+    idx = VectorIndex(root=str(tmp_path))
+    idx.add(
+        [chunk("EMPA-REG", kind="trial", molecules=["Empagliflozin"]), chunk("DECLARE", kind="trial", molecules=["Dapagliflozin"]), chunk("Market 2025")],
+        [vector((0, 1.0)), vector((1, 1.0)), vector((0, 0.6), (2, 0.8))],
+    )
+    return idx
+
+def test_search_ranks_by_cosine_similarity(index):
+    hits = index.search(vector((0, 2.0)), k=2)  # Not normalised; the index normalises queries
+
+    assert [chunk["title"] for _, chunk in hits] == ["EMPA-REG", "Market 2025"]
+    assert hits[0][0] == pytest.approx(1.0)
+    assert hits[1][0] == pytest.approx(0.6)
+
+def test_search_filters_by_kind(index):
+    hits = index.search(vector((0, 1.0)), k=5, kinds={"market"})
+
+    assert [chunk["title"] for _, chunk in hits] == ["Market 2025"]
+
+def test_for_molecules_is_case_insensitive(index):
+    assert [c["title"] for c in index.for_molecules(["  empagliflozin "])] == ["EMPA-REG"]
+    assert index.for_molecules(["Metformin"]) == []
+
+def test_adding_known_chunks_is_a_no_op(index):
+    again = chunk("EMPA-REG", kind="trial", molecules=["Empagliflozin"])
+
+    assert index.add([again], [vector((0, 1.0))]) == 0
+    assert index.add([again, chunk("New")], [vector((0, 1.0)), vector((3, 1.0))]) == 1
+    assert index.count == 4
+
+def test_reopened_index_sees_committed_chunks_only(index, tmp_path):
+    # Leftovers of an add that crashed before writing the manifest
+    with open(os.path.join(tmp_path, "vectors.f32"), "ab") as f:
+        f.write(vector((4, 1.0)).tobytes())
+    with open(os.path.join(tmp_path, "chunks.jsonl"), "ab") as f:
+        f.write(b'{"id": "partial"')
+
+    reopened = VectorIndex(root=str(tmp_path))
+
+    assert reopened.version() == 3
+    assert reopened.search(vector((1, 1.0)), k=1)[0][1]["title"] == "DECLARE"
+    assert reopened.add([chunk("After crash")], [vector((4, 1.0))]) == 1
+    assert VectorIndex(root=str(tmp_path)).version() == 4
+
+def test_empty_index(tmp_path):
+    idx = VectorIndex(root=str(tmp_path / "missing"))
+
+    assert idx.version() == 0
+    assert idx.search(vector((0, 1.0))) == []
@@ -0,0 +1,137 @@
+# Two-tier LLM response cache (ai/cache.py): LRU in memory over SQLite on disk.
+import asyncio
+import sqlite3
+import threading
+
+import pytest
+
+from ai.cache import LLMCache, make_key
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "llm_cache.sqlite3")
+
+def disk_keys(path):
+    with sqlite3.connect(path) as conn:
+        return sorted(key for (key,) in conn.execute("SELECT key FROM llm_cache"))
+
+def test_keys_ignore_case_and_whitespace():
+    assert make_key("insights", molecule="  Empagliflozin ", area="Type 2\n diabetes") == make_key("insights", area="type 2 diabetes", molecule="empagliflozin")
+    assert make_key("insights", molecule="Empagliflozin") != make_key("logo", molecule="Empagliflozin")
+
+def test_memory_then_disk_hits(path):
+    async def scenario():
+        cache = LLMCache(path=path)
+        await cache.set("k", {"names": ["Glucora"]})
+        first = await cache.get("k")
+        restarted = LLMCache(path=path)  # Another worker, or the next process
+        second = await restarted.get("k")
+        third = await restarted.get("k")
+        return first, second, third, cache.stats(), restarted.stats()
+
+    first, second, third, stats, restarted_stats = asyncio.run(scenario())
+
+    assert first == second == third == {"names": ["Glucora"]}
+    assert stats["memory_hits"] == 1
+    assert (restarted_stats["disk_hits"], restarted_stats["memory_hits"]) == (1, 1)
+
+def test_lru_evicts_from_memory_only(path):
+    async def scenario():
+        cache = LLMCache(path=path, max_entries=2)
+        for key in ("a", "b", "c"):
+            await cache.set(key, key.upper())
+        evicted = await cache.get("a")
+        return evicted, cache.stats()
+
+    evicted, stats = asyncio.run(scenario())
+
+    assert evicted == "A"
+    assert stats["disk_hits"] == 1 and stats["memory_entries"] == 2
+
+def test_expired_entries_miss_in_both_tiers(path):
+    async def scenario():
+        cache = LLMCache(path=path)
+        await cache.set("short", "value", ttl_seconds=0.05)
+        await asyncio.sleep(0.06)
+        from_memory = await cache.get("short")
+        from_disk = await LLMCache(path=path).get("short")
+        return from_memory, from_disk, cache.stats()
+
+    from_memory, from_disk, stats = asyncio.run(scenario())
+
+    assert from_memory is None and from_disk is None
+    assert stats["misses"] == 1 and stats["memory_entries"] == 0
+
+def test_regenerate_bypasses_lookups_but_not_writes(path):
+    async def scenario():
+        cache = LLMCache(path=path)
+        await cache.set("k", "old")
+        bypassed = await cache.get("k", regenerate=True)
+        await cache.set("k", "new")
+        return bypassed, await cache.get("k"), cache.stats()["bypassed"]
+
+    assert asyncio.run(scenario()) == (None, "new", 1)
+
+def test_purge_drops_expired_rows(path):
+    async def scenario():
+        cache = LLMCache(path=path, purge_every=0)
+        await cache.set("gone", 1, ttl_seconds=0.01)
+        await cache.set("kept", 2)
+        await asyncio.sleep(0.02)
+        removed = await cache.purge_expired()
+        return removed, cache.stats()
+
+    removed, stats = asyncio.run(scenario())
+
+    assert removed == 1 and stats["purged"] == 1
+    assert disk_keys(path) == ["kept"]
+    assert stats["memory_entries"] == 1
+
+def test_writes_trigger_a_periodic_purge(path):
+    async def scenario():
+        cache = LLMCache(path=path, purge_every=3)
+        await cache.set("gone-1", 1, ttl_seconds=0.01)
+        await cache.set("gone-2", 2, ttl_seconds=0.01)
+        await asyncio.sleep(0.02)
+        await cache.set("kept", 3)  # Third write
+        return cache.stats()["purged"]
+
+    assert asyncio.run(scenario()) == 2
+    assert disk_keys(path) == ["kept"]
+
+def test_concurrent_callers(path):
+    async def scenario():
+        cache = LLMCache(path=path, max_entries=16)
+
+        async def write_then_read(n):
+            await cache.set(f"k{n}", {"n": n})
+            return await cache.get(f"k{n}")
+
+        return await asyncio.gather(*(write_then_read(n) for n in range(100)))
+
+    assert asyncio.run(scenario()) == [{"n": n} for n in range(100)]
+    assert len(disk_keys(path)) == 100
+
+def test_worker_threads_share_one_file(path):
+    # Each thread runs its own event loop and cache instance, like separate workers
+    errors = []
+
+    def worker(w):
+        async def run():
+            cache = LLMCache(path=path)
+            for n in range(25):
+                await cache.set(f"w{w}-{n}", n)
+            return [await LLMCache(path=path).get(f"w{(w + 1) % 4}-{n}") for n in range(25)]
+        try:
+            asyncio.run(run())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(w,)) for w in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(disk_keys(path)) == 100
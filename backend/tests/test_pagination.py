@@ -0,0 +1,63 @@
+# Keyset pagination helpers (database/pagination.py).
+import pytest
+
+from database.pagination import InvalidCursor, apply_keyset, decode_cursor, encode_cursor, page
+
+class RecordingQuery:
+    # Stands in for a postgrest query builder: records the calls apply_keyset makes
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, name):
+        def method(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+            return self
+        return method
+
+def row(n, created_at="2026-10-17T09:30:00.123456+00:00"):
+    return {"id": f"00000000-0000-0000-0000-{n:012d}", "created_at": created_at}
+
+def test_cursor_round_trip():
+    last = row(7)
+
+    cursor = encode_cursor(last)
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (last["created_at"], last["id"])
+
+@pytest.mark.parametrize("cursor", ["", "not-base64!", encode_cursor({"created_at": 5, "id": "x"}), "WzFd"])
+def test_invalid_cursor(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor)
+
+def test_page_returns_next_cursor_only_when_more_rows_exist():
+    rows = [row(n) for n in range(4)]
+
+    assert page(rows[:3], 3) == (rows[:3], None)
+    assert page(None, 3) == ([], None)
+    first, cursor = page(rows, 3)
+    assert first == rows[:3]
+    assert decode_cursor(cursor) == (rows[2]["created_at"], rows[2]["id"])
+
+def test_apply_keyset_first_page():
+    query = RecordingQuery()
+
+    apply_keyset(query, None, 20)
+
+    assert query.calls == [
+        ("order", ("created_at",), {"desc": True}),
+        ("order", ("id",), {"desc": True}),
+        ("limit", (21,), {}),
+    ]
+
+def test_apply_keyset_continues_after_cursor():
+    last = row(3)
+    query = RecordingQuery()
+
+    apply_keyset(query, encode_cursor(last), 20)
+
+    name, (tree,), _ = query.calls[0]
+    assert name == "or_"
+    # Timestamps contain ':' and '+', so values are quoted for PostgREST's logic tree
+    assert tree == f'created_at.lt."{last["created_at"]}",and(created_at.eq."{last["created_at"]}",id.lt."{last["id"]}")'
+    assert query.calls[-1] == ("limit", (21,), {})
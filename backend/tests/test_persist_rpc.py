@@ -0,0 +1,126 @@
+# create_projects_with_elements (database/supabase_schemas.sql) against a real
+# Postgres: the transactional write behind pipeline.persist_projects(), used by the
+# synchronous create path and batch flushes.
+#
+#   DATABASE_URL=postgresql://postgres@localhost:5432/postgres python -m pytest tests/test_persist_rpc.py
+#
+# Each test loads the schema into a throwaway schema and drops it afterwards.
+import json
+import os
+import uuid
+
+import pytest
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+pytestmark = pytest.mark.skipif(not DATABASE_URL, reason="DATABASE_URL not set")
+psycopg = pytest.importorskip("psycopg")
+
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), "..", "database", "supabase_schemas.sql")
+
+# What Supabase provides and a plain Postgres may not: auth.uid() (used by the RLS
+# policies) and uuid_generate_v4() (uuid-ossp, used by the column defaults)
+SUPABASE_PRELUDE = """
+CREATE SCHEMA IF NOT EXISTS auth;
+CREATE OR REPLACE FUNCTION auth.uid() RETURNS UUID LANGUAGE sql STABLE AS $$ SELECT NULL::UUID $$;
+"""
+UUID_FALLBACK = "CREATE FUNCTION uuid_generate_v4() RETURNS UUID LANGUAGE sql AS $$ SELECT gen_random_uuid() $$;"
+
+@pytest.fixture
+def db():
+    schema = f"persist_rpc_{uuid.uuid4().hex[:12]}"
+    with psycopg.connect(DATABASE_URL, autocommit=True) as conn:
+        if not conn.execute("SELECT to_regprocedure('auth.uid()')").fetchone()[0]:
+            conn.execute(SUPABASE_PRELUDE)
+        conn.execute(f"CREATE SCHEMA {schema}")
+        conn.execute(f"SET search_path TO {schema}, public")
+        if not conn.execute("SELECT to_regprocedure('uuid_generate_v4()')").fetchone()[0]:
+            try:
+                conn.execute('CREATE EXTENSION IF NOT EXISTS "uuid-ossp"')
+            except psycopg.Error:
+                conn.execute(UUID_FALLBACK)
+        with open(SCHEMA_PATH) as f:
+            conn.execute(f.read())
+        try:
+            yield conn
+        finally:
+            conn.execute(f"DROP SCHEMA {schema} CASCADE")
+
+def create_user(conn):
+    return conn.execute("INSERT INTO users (email) VALUES (%s) RETURNING id", (f"{uuid.uuid4().hex}@example.com",)).fetchone()[0]
+
+def call_rpc(conn, payload):
+    # Same payload shape as pipeline.persist_projects() sends
+    return conn.execute("SELECT create_projects_with_elements(%s::jsonb)", (json.dumps(payload),)).fetchone()[0]
+
+def project_item(user_id, name, elements):
+    return {
+        "project": {"user_id": str(user_id), "project_name": name, "molecule_names": "Empagliflozin", "therapeutic_area": "Type 2 diabetes"},
+        "elements": elements,
+    }
+
+def test_creates_projects_with_elements_in_input_order(db):
+    user_id = create_user(db)
+    payload = [
+        project_item(user_id, "First", [
+            {"element_type": "insight_competitors", "content": {"competitors": ["Dapagliflozin"]}},
+            {"element_type": "brand_name_suggestion", "content": {"name": "Glucora"}},
+        ]),
+        project_item(user_id, "Second", [
+            {"element_type": "slogan_suggestion", "content": {"en": "Steady days", "bn": "স্থির দিন"}},
+        ]),
+    ]
+
+    created = call_rpc(db, payload)
+
+    assert [project["project_name"] for project in created] == ["First", "Second"]
+    for project, item in zip(created, payload):
+        assert project["id"] and project["status"] == "draft" and project["user_id"] == str(user_id)
+        assert isinstance(project["brand_elements"], list)
+        assert sorted(el["element_type"] for el in project["brand_elements"]) == sorted(el["element_type"] for el in item["elements"])
+        assert all(el["project_id"] == project["id"] for el in project["brand_elements"])
+    assert created[1]["brand_elements"][0]["content"] == {"en": "Steady days", "bn": "স্থির দিন"}
+    assert db.execute("SELECT count(*) FROM brand_elements").fetchone()[0] == 3
+
+def test_project_without_elements_gets_empty_list(db):
+    user_id = create_user(db)
+
+    created = call_rpc(db, [project_item(user_id, "Bare", [])])
+
+    assert created[0]["brand_elements"] == []
+
+def test_failed_element_rolls_back_every_project(db):
+    user_id = create_user(db)
+    payload = [
+        project_item(user_id, "Good", [{"element_type": "brand_name_suggestion", "content": {"name": "Glucora"}}]),
+        project_item(user_id, "Bad", [{"element_type": None, "content": {"name": "Broken"}}]),
+    ]
+
+    with pytest.raises(psycopg.errors.NotNullViolation):
+        call_rpc(db, payload)
+
+    assert db.execute("SELECT count(*) FROM projects").fetchone()[0] == 0
+    assert db.execute("SELECT count(*) FROM brand_elements").fetchone()[0] == 0
+
+def test_existing_project_gets_its_elements_replaced(db):
+    user_id = create_user(db)
+    project = call_rpc(db, [{**project_item(user_id, "Job", [{"element_type": "brand_name_suggestion", "content": {"name": "Stale"}}]), "project": {"user_id": str(user_id), "status": "in_progress"}}])[0]
+    item = {"project": {"id": project["id"], "status": "completed"}, "elements": [{"element_type": "brand_name_suggestion", "content": {"name": "Glucora"}}]}
+
+    call_rpc(db, [item])
+    updated = call_rpc(db, [item])[0]  # A persist stage re-run after a restart
+
+    assert updated["id"] == project["id"] and updated["status"] == "completed"
+    assert [el["content"] for el in updated["brand_elements"]] == [{"name": "Glucora"}]
+    assert db.execute("SELECT content FROM brand_elements").fetchall() == [({"name": "Glucora"},)]
+
+def test_unknown_project_id_rolls_back(db):
+    user_id = create_user(db)
+    payload = [
+        project_item(user_id, "Good", []),
+        {"project": {"id": str(uuid.uuid4()), "status": "completed"}, "elements": []},
+    ]
+
+    with pytest.raises(psycopg.errors.RaiseException):
+        call_rpc(db, payload)
+
+    assert db.execute("SELECT count(*) FROM projects").fetchone()[0] == 0
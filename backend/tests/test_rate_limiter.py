@@ -0,0 +1,178 @@
+# OpenAI limiter (ai/rate_limiter.py): token buckets, the AIMD concurrency limit,
+# retries and stream slots, with fake API functions in place of openai.*.acreate.
+import asyncio
+import time
+
+import openai
+import pytest
+
+import ai.rate_limiter as rate_limiter
+from ai import brand_package
+from ai.rate_limiter import AdaptiveConcurrency, OpenAILimiter, TokenBucket
+
+UNLIMITED = {"test-model": {"rpm": 0, "tpm": 0}}
+
+def rate_limited():
+    return openai.error.RateLimitError("Rate limit reached", http_status=429, headers={"retry-after": "0"})
+
+def bad_request():
+    return openai.error.InvalidRequestError("Bad prompt", None, http_status=400)
+
+class FakeAPI:
+    # Raises the queued errors in turn, then answers; records the peak concurrency
+    def __init__(self, *errors, delay=0.0):
+        self.errors = list(errors)
+        self.delay = delay
+        self.calls = 0
+        self.active = self.peak = 0
+
+    async def __call__(self, **kwargs):
+        self.calls += 1
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.errors:
+                raise self.errors.pop(0)
+            return {"choices": [{"message": {"content": "ok"}}]}
+        finally:
+            self.active -= 1
+
+def test_token_bucket_queues_callers_in_order():
+    async def scenario():
+        bucket = TokenBucket(per_minute=600)  # 10 per second
+        bucket.tokens = 0
+        started, done = time.monotonic(), []
+
+        async def take(n):
+            await bucket.acquire(1)
+            done.append((n, time.monotonic() - started))
+
+        await asyncio.gather(*(take(n) for n in range(3)))
+        return done
+
+    done = asyncio.run(scenario())
+
+    assert [n for n, _ in done] == [0, 1, 2]
+    assert done[0][1] == pytest.approx(0.1, abs=0.05)
+    assert done[2][1] == pytest.approx(0.3, abs=0.08)
+
+def test_oversized_request_is_capped_at_capacity_and_debits_later_callers():
+    async def scenario():
+        bucket = TokenBucket(per_minute=600)
+        await asyncio.wait_for(bucket.acquire(10_000), 0.1)  # Would never fit otherwise
+        bucket.tokens = 10
+        bucket.debit(15)
+        return bucket.tokens
+
+    assert asyncio.run(scenario()) == pytest.approx(-5, abs=0.1)
+
+def test_aimd_grows_slowly_and_backs_off():
+    limit = AdaptiveConcurrency(initial=8, minimum=2, maximum=9)
+
+    limit.on_success("m", 1.0)
+    limit.on_success("m", 1.0)
+    assert limit.limit == pytest.approx(8 + 1 / 8 + 1 / 8.125)
+    limit.on_success("m", 10.0)  # Latency spike against the ~1s baseline
+    assert limit.limit == pytest.approx((8 + 1 / 8 + 1 / 8.125) * 0.9)
+    for _ in range(20):
+        limit.on_error()
+    assert limit.limit == 2
+    for _ in range(200):
+        limit.on_success("m", 1.0)
+    assert limit.limit == 9
+
+def test_concurrency_limit_bounds_calls_in_flight():
+    async def scenario():
+        limiter, api = OpenAILimiter(UNLIMITED), FakeAPI(delay=0.02)
+        limiter.concurrency.limit = 3
+        limiter.concurrency.maximum = 3
+        await asyncio.gather(*(limiter.call(api, model="test-model") for _ in range(10)))
+        return api, limiter.concurrency.in_flight
+
+    api, in_flight = asyncio.run(scenario())
+
+    assert api.calls == 10 and api.peak == 3 and in_flight == 0
+
+def test_rate_limit_is_retried_and_shrinks_the_limit():
+    async def scenario():
+        limiter, api = OpenAILimiter(UNLIMITED), FakeAPI(rate_limited(), rate_limited())
+        response = await limiter.call(api, model="test-model")
+        return limiter, api, response
+
+    limiter, api, response = asyncio.run(scenario())
+
+    assert response["choices"][0]["message"]["content"] == "ok"
+    assert api.calls == 3
+    assert limiter.counters["retries"] == 2 and limiter.counters["rate_limited"] == 2
+    assert limiter.concurrency.limit < 8
+
+def test_client_error_is_not_retried_and_leaves_the_limit_alone():
+    async def scenario():
+        limiter, api = OpenAILimiter(UNLIMITED), FakeAPI(bad_request())
+        with pytest.raises(openai.error.InvalidRequestError):
+            await limiter.call(api, model="test-model")
+        return limiter, api
+
+    limiter, api = asyncio.run(scenario())
+
+    assert api.calls == 1
+    assert limiter.counters["errors"] == 1
+    assert limiter.concurrency.limit == 8
+
+def test_timeout_bounds_each_attempt(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "OPENAI_BACKOFF_BASE_SECONDS", 0)
+
+    async def scenario():
+        limiter = OpenAILimiter(UNLIMITED)
+        attempts = []
+
+        async def hangs_once(**kwargs):
+            attempts.append(1)
+            if len(attempts) == 1:
+                await asyncio.sleep(10)
+            return {"ok": True}
+
+        response = await asyncio.wait_for(limiter.call(hangs_once, model="test-model", timeout=0.05), 2)
+        return response, len(attempts), limiter.concurrency.limit
+
+    response, attempts, limit = asyncio.run(scenario())
+
+    assert response == {"ok": True}
+    assert attempts == 2
+    assert limit < 8  # A timeout is a congestion signal
+
+def test_stream_holds_its_slot_until_read():
+    async def scenario():
+        limiter = OpenAILimiter(UNLIMITED)
+
+        async def chunks():
+            for n in range(3):
+                yield n
+
+        async def stream(**kwargs):
+            return chunks()
+
+        response = await limiter.call(stream, model="test-model", stream=True)
+        held = limiter.concurrency.in_flight
+        received = [chunk async for chunk in response]
+        return held, received, limiter.concurrency.in_flight
+
+    assert asyncio.run(scenario()) == (1, [0, 1, 2], 0)
+
+def test_logo_deadline_falls_back_and_frees_the_slot(monkeypatch):
+    async def never_answers(**kwargs):
+        await asyncio.sleep(10)
+
+    monkeypatch.setattr(openai.Image, "acreate", never_answers)
+    monkeypatch.setattr(brand_package, "openai_limiter", OpenAILimiter(UNLIMITED))
+
+    async def scenario():
+        started = time.monotonic()
+        logo = await brand_package.generate_logo("Glucora", "Diabetes", None, timeout=5, deadline=0.1, regenerate=True)
+        return logo, time.monotonic() - started, brand_package.openai_limiter.concurrency.in_flight
+
+    logo, elapsed, in_flight = asyncio.run(scenario())
+
+    assert logo["fallback"] is True
+    assert elapsed < 1 and in_flight == 0
@@ -0,0 +1,52 @@
+# Local DGDA pre-screen (compliance/rules.py).
+import unicodedata
+
+from compliance.rules import evaluate, scan_claims, check_leaflet_sections, REQUIRED_LEAFLET_SECTIONS
+
+COMPLETE_LEAFLET = {"sections": [{"title": title, "content": "..."} for title in REQUIRED_LEAFLET_SECTIONS]}
+
+def rules(findings):
+    return [finding["rule"] for finding in findings]
+
+def test_english_claims_match_whole_words_only():
+    assert rules(scan_claims("slogan_en", "The BEST choice, clinically proven.")) == ["superlative_claim", "unqualified_endorsement"]
+    assert scan_claims("slogan_en", "Bestow steady care; procured locally.") == []
+
+def test_bengali_claims_match_as_substrings():
+    findings = scan_claims("slogan_bn", "ডায়াবেটিসের সেরা সমাধান")
+
+    assert rules(findings) == ["superlative_claim"]
+    assert findings[0]["match"] == "সেরা"
+
+def test_precomposed_and_decomposed_bengali_match_alike():
+    decomposed = "নিরাময়"  # য + nukta
+    precomposed = decomposed.replace("\u09af\u09bc", "\u09df")
+    assert precomposed != decomposed and unicodedata.normalize("NFC", precomposed) == unicodedata.normalize("NFC", decomposed)
+
+    assert rules(scan_claims("slogan_bn", precomposed)) == ["cure_claim"]
+    assert rules(scan_claims("slogan_bn", decomposed)) == ["cure_claim"]
+
+def test_missing_leaflet_sections():
+    leaflet = {"sections": [{"title": "Introduction"}, {"title": "benefits"}, {"title": "Patient Info"}]}
+
+    missing = [finding["message"] for finding in check_leaflet_sections(leaflet)]
+
+    assert missing == ["Mandatory leaflet section 'Clinical References' is missing.", "Mandatory leaflet section 'Compliance' is missing."]
+
+def test_leaflet_shapes():
+    as_list = [{"title": title} for title in REQUIRED_LEAFLET_SECTIONS]
+    keyed = {title: "..." for title in REQUIRED_LEAFLET_SECTIONS}
+
+    assert check_leaflet_sections(as_list) == []
+    assert check_leaflet_sections(keyed) == []
+    assert len(check_leaflet_sections(None)) == len(REQUIRED_LEAFLET_SECTIONS)
+
+def test_error_rejects_and_warning_leaves_undecided():
+    clean = evaluate("Glucora", "Steady days.", "স্থির দিন", COMPLETE_LEAFLET)
+    warned = evaluate("Glucora", "Doctors recommend it.", "স্থির দিন", COMPLETE_LEAFLET)
+    rejected = evaluate("Glucora", "Steady days.", "স্থির দিন", {"sections": COMPLETE_LEAFLET["sections"] + [{"title": "Note", "content": "No side effects."}]})
+
+    assert clean["verdict"] == "undecided" and clean["findings"] == []
+    assert warned["verdict"] == "undecided" and rules(warned["findings"]) == ["unqualified_endorsement"]
+    assert rejected["verdict"] == "rejected"
+    assert rejected["findings"][0]["field"] == "leaflet_json"
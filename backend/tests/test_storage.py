@@ -0,0 +1,29 @@
+# Local asset storage (assets/storage.py).
+import os
+import threading
+
+from assets.storage import LocalFilesystemStorage
+
+def test_concurrent_writes_of_one_key(tmp_path):
+    storage = LocalFilesystemStorage(root=str(tmp_path), base_url="http://assets.test/")
+    data = os.urandom(256 * 1024)
+    errors = []
+
+    def put():
+        try:
+            for _ in range(20):
+                storage.put("logos/abc.png", data)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=put) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    with open(storage.path("logos/abc.png"), "rb") as f:
+        assert f.read() == data
+    assert os.listdir(tmp_path / "logos") == ["abc.png"]  # No temp files left behind
+    assert storage.url("logos/abc.png") == "http://assets.test/logos/abc.png"
@@ -25,13 +25,18 @@ export default function NewProjectModal({ onClose, onProjectCreated }: NewProjec
   });
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
+  // One key per form state: double submits and retries of the same form reuse it, so
+  // the backend returns the same project; editing the form starts a new key.
+  const [idempotencyKey, setIdempotencyKey] = useState(() => crypto.randomUUID());
 
   const handleChange = (e: React.ChangeEvent<HTMLInputElement | HTMLTextAreaElement>) => {
     setForm({ ...form, [e.target.name]: e.target.value });
+    setIdempotencyKey(crypto.randomUUID());
   };
 
   const handleSubmit = async (e: React.FormEvent<HTMLFormElement>) => {
     e.preventDefault();
+    if (loading) return; // Already submitting
     setLoading(true);
     setError(null);
 
@@ -53,7 +58,7 @@ export default function NewProjectModal({ onClose, onProjectCreated }: NewProjec
         key_differentiating_benefits: form.key_differentiating_benefits,
         natural_language_prompt: form.natural_language_prompt,
       };
-      const projectData = await createProject(payload); // createProject should return the created project data
+      const projectData = await createProject(payload, idempotencyKey); // createProject should return the created project data
       setLoading(false);
       if (projectData) { // Assuming createProject returns null or throws error on failure
         onProjectCreated(projectData); // Pass project object from backend
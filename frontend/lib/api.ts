@@ -7,10 +7,14 @@ interface CreateProjectPayload {
   natural_language_prompt?: string;
 }
 
-export async function createProject(data: CreateProjectPayload) {
+// Pass the same idempotencyKey when retrying a submission: the backend then returns
+// the project it already created (or is creating) instead of generating another one.
+export async function createProject(data: CreateProjectPayload, idempotencyKey?: string) {
+  const headers: Record<string, string> = { "Content-Type": "application/json" };
+  if (idempotencyKey) headers["Idempotency-Key"] = idempotencyKey;
   const res = await fetch("http://localhost:5040/api/projects/create", { // TODO: Use environment variable for API base URL
     method: "POST",
-    headers: { "Content-Type": "application/json" },
+    headers,
     body: JSON.stringify(data)
   });
   if (!res.ok) {
@@ -20,11 +24,48 @@ export async function createProject(data: CreateProjectPayload) {
   return await res.json();
 }
 
-export async function fetchProjects(userId?: string) {
-  let url = "http://localhost:5040/api/projects/list";
-  if (userId) {
-    url += `?user_id=${userId}`;
+// Streams project creation as Server-Sent Events. `onEvent` is called for each
+// event as it arrives: project, insights, brand_names, slogans, leaflet, logo, done, error.
+export async function createProjectStream(
+  data: CreateProjectPayload,
+  onEvent: (event: string, data: any) => void
+) {
+  const res = await fetch("http://localhost:5040/api/projects/create/stream", { // TODO: Use environment variable for API base URL
+    method: "POST",
+    headers: { "Content-Type": "application/json", "Accept": "text/event-stream" },
+    body: JSON.stringify(data)
+  });
+  if (!res.ok || !res.body) throw new Error(`Failed to create project. Status: ${res.status}`);
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let boundary;
+    while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+      const raw = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      let event = "message";
+      let payload = "";
+      for (const line of raw.split("\n")) {
+        if (line.startsWith("event: ")) event = line.slice(7);
+        else if (line.startsWith("data: ")) payload += line.slice(6);
+      }
+      onEvent(event, payload ? JSON.parse(payload) : null);
+    }
   }
+}
+
+// Returns one page of projects, newest first: { projects, next_cursor }.
+// Pass next_cursor back as `cursor` to load the following page (null when there are no more).
+export async function fetchProjects(userId?: string, cursor?: string | null) {
+  const params = new URLSearchParams();
+  if (userId) params.set("user_id", userId);
+  if (cursor) params.set("cursor", cursor);
+  const query = params.toString();
+  const url = `http://localhost:5040/api/projects/list${query ? `?${query}` : ""}`;
   const res = await fetch(url);
   if (!res.ok) throw new Error("Failed to fetch projects");
   return await res.json();
@@ -66,6 +107,21 @@ export async function updateLeaflet(projectId: string, leaflet: string) {
   return await res.json();
 }
 
+// Regenerates only the given element types for an existing project; the new
+// elements are appended and returned as { project_id, elements }.
+export async function regenerateElements(
+  projectId: string,
+  elementTypes: ("brand_name_suggestion" | "slogan_suggestion" | "logo_concept" | "leaflet_draft")[]
+) {
+  const res = await fetch(`http://localhost:5040/api/projects/${projectId}/regenerate`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ element_types: elementTypes })
+  });
+  if (!res.ok) throw new Error("Failed to regenerate elements");
+  return await res.json();
+}
+
 export async function requestCompliance(projectId: string) {
   const res = await fetch(`http://localhost:5040/api/projects/${projectId}/compliance_check`, {
     method: "POST"
@@ -75,7 +131,6 @@ export async function requestCompliance(projectId: string) {
 }
 
 export async function exportLeafletPDF(projectId: string) {
-  const res = await fetch(`http://localhost:5040/api/projects/${projectId}/export/pdf`);
-  if (!res.ok) throw new Error("Failed to export PDF");
-  return await res.json();
+  // The backend streams the rendered PDF directly; open this URL to download it.
+  return { url: `http://localhost:5040/api/projects/${projectId}/export/pdf` };
 }
@@ -9,6 +9,7 @@ export default function Dashboard() {
   const [projects, setProjects] = useState<any[]>([]);
   const [loading, setLoading] = useState(true);
   const [user, setUser] = useState<any>(null);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const router = useRouter();
 
   useEffect(() => {
@@ -18,12 +19,21 @@ export default function Dashboard() {
       } else {
         setUser(data.session.user);
         fetchProjects(data.session.user.id)
-          .then((data) => setProjects(data.projects || []))
+          .then((data) => {
+            setProjects(data.projects || []);
+            setNextCursor(data.next_cursor || null);
+          })
           .finally(() => setLoading(false));
       }
     });
   }, []);
 
+  const loadMore = async () => {
+    const data = await fetchProjects(user?.id, nextCursor);
+    setProjects((prev) => [...prev, ...(data.projects || [])]);
+    setNextCursor(data.next_cursor || null);
+  };
+
   const handleLogout = async () => {
     await supabase.auth.signOut();
     router.replace("/login");
@@ -56,12 +66,13 @@ export default function Dashboard() {
           {projects.map((project) => (
             <li key={project.id}>
               <a href={`/project/${project.id}`} style={{ textDecoration: 'underline', color: 'blue' }}>
-                {project.name || project.molecule || "Untitled Project"} - {project.therapeutic_area}
+                {project.project_name || project.molecule_names || "Untitled Project"} - {project.therapeutic_area}
               </a>
             </li>
           ))}
         </ul>
       )}
+      {nextCursor && <button onClick={loadMore}>Load more</button>}
     </div>
   );
 }
@@ -140,7 +140,7 @@ export default function ProjectPage() {
         <div style={{ display: 'flex', gap: 16, marginBottom: 8 }}>
           {brand_package?.logo_concepts?.map((logo: any, idx: number) => (
             <div key={idx} style={{ border: '1px solid #eee', padding: 8, borderRadius: 8 }}>
-              <img src={logo.url} alt={`Logo concept ${idx + 1}`} style={{ width: 100, height: 100, objectFit: 'contain', background: '#f9f9f9' }} />
+              <img src={logo.thumbnail_url || logo.url} alt={`Logo concept ${idx + 1}`} style={{ width: 100, height: 100, objectFit: 'contain', background: '#f9f9f9' }} />
               <button onClick={() => handleExportLogo(logo.url)}>Export Logo</button>
             </div>
           ))}
@@ -54,3 +54,8 @@ create table assets (
   created_at timestamp with time zone default timezone('utc', now())
 );
 
+-- Indexes for the paginated project list (keyset on created_at, id).
+-- This legacy schema has no projects.status column; see backend/database/supabase_schemas.sql.
+create index idx_projects_user_created on projects(user_id, created_at desc, id desc);
+create index idx_projects_user_area_created on projects(user_id, therapeutic_area, created_at desc, id desc);
+create index idx_projects_created on projects(created_at desc, id desc);